@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI and Anthropic HTTP APIs.
+
+Serves the OpenAI chat completions endpoint (/v1/chat/completions), the
+Anthropic messages endpoint (/v1/messages) and the custom provider's
+/v1/completions, streamed or not, with a configurable time to first token,
+jitter, token rate and rate of injected errors. Point smartman at it with
+BASE_URL (http://127.0.0.1:PORT/v1 for OpenAI, http://127.0.0.1:PORT for
+Anthropic) to exercise the real request path without the network.
+
+Usage:
+    python benchmarks/llm_server.py [--port N] [--latency S] [--jitter S]
+                                    [--token-rate N] [--tokens N] [--error-rate P]
+
+benchmarks/suite.py starts one in-process with StandInLLM.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the", "command", "lists", "files", "in", "a", "directory", "with", "options", "for",
+         "sorting", "and", "filtering", "output", "use", "-l", "to", "show", "details")
+
+
+class StandInLLM:
+    """
+    A stand-in LLM API server running on a background thread.
+
+    Args:
+        latency: Seconds before the first byte of every response
+        jitter: Up to this many extra seconds, uniformly distributed, on top of latency
+        token_rate: Tokens generated per second (0 answers instantly)
+        tokens: Tokens in every answer
+        error_rate: Fraction of requests answered with error_status instead
+        error_status: HTTP status of injected errors
+        seed: Seed of the jitter and error draws, so runs are repeatable
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.0, token_rate=500.0, tokens=60,
+                 error_rate=0.0, error_status=503, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_url(self, provider):
+        """The BASE_URL for a provider: OpenAI's includes /v1, Anthropic's doesn't."""
+        return self.url if provider == "anthropic" else self.url + "/v1"
+
+    def settings(self):
+        return {"latency": self.latency, "jitter": self.jitter, "token_rate": self.token_rate,
+                "tokens": self.tokens, "error_rate": self.error_rate, "error_status": self.error_status}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def draw(self):
+        """Count a request and return (delay before the first byte, whether it fails)."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self.jitter * self._random.random()
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        return delay, failed
+
+    def token_delay(self):
+        return 1.0 / self.token_rate if self.token_rate else 0.0
+
+
+def answer_tokens(count):
+    """The tokens of every answer; joined, they are the response text."""
+    return [WORDS[0]] + [" " + WORDS[i % len(WORDS)] for i in range(1, count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        api = {"/v1/chat/completions": "openai", "/v1/messages": "anthropic",
+               "/v1/completions": "custom"}.get(self.path.split("?")[0])
+        if api is None:
+            self._json(404, {"error": {"message": f"No such endpoint: {self.path}"}})
+            return
+
+        delay, failed = stand_in.draw()
+        time.sleep(delay)
+        if failed:
+            self._error(api, stand_in.error_status)
+        elif request.get("stream"):
+            self._stream(api, request, stand_in)
+        else:
+            time.sleep(stand_in.token_delay() * stand_in.tokens)
+            self._json(200, _completion(api, request, "".join(answer_tokens(stand_in.tokens))))
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, api, status):
+        message = "Injected error from the stand-in server"
+        if api == "anthropic":
+            kind = "rate_limit_error" if status == 429 else "overloaded_error" if status == 529 else "api_error"
+            self._json(status, {"type": "error", "error": {"type": kind, "message": message}})
+        else:
+            self._json(status, {"error": {"message": message, "type": "server_error", "code": None}})
+
+    def _stream(self, api, request, stand_in):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event, payload, is_token in _stream_events(api, request, answer_tokens(stand_in.tokens)):
+            if is_token:
+                time.sleep(stand_in.token_delay())
+            lines = (f"event: {event}\n" if event else "") + "data: " + \
+                (json.dumps(payload) if payload is not None else "[DONE]") + "\n\n"
+            self._chunk(lines.encode("utf-8"))
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _completion(api, request, text):
+    """Non-streamed response body in the API's format."""
+    model = request.get("model", "stand-in")
+    prompt_tokens = len(json.dumps(request.get("messages", request.get("prompt", "")))) // 4
+    completion_tokens = len(text.split())
+    if api == "openai":
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+    if api == "anthropic":
+        return {
+            "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens},
+        }
+    return {"text": text}
+
+
+def _stream_events(api, request, tokens):
+    """Yield (event name or None, payload or None for [DONE], whether it carries a token) of a stream."""
+    model = request.get("model", "stand-in")
+    if api == "openai":
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        yield None, dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                         "finish_reason": None}]), False
+        for token in tokens:
+            yield None, dict(base, choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}]), True
+        yield None, dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]), False
+        if (request.get("stream_options") or {}).get("include_usage"):
+            yield None, dict(base, choices=[], usage=_completion(api, request, "".join(tokens))["usage"]), False
+        yield None, None, False
+    elif api == "anthropic":
+        message = {"id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": model,
+                   "content": [], "stop_reason": None, "stop_sequence": None,
+                   "usage": {"input_tokens": 1, "output_tokens": 1}}
+        yield "message_start", {"type": "message_start", "message": message}, False
+        yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}}, False
+        for token in tokens:
+            yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": token}}, True
+        yield "content_block_stop", {"type": "content_block_stop", "index": 0}, False
+        yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": len(tokens)}}, False
+        yield "message_stop", {"type": "message_stop"}, False
+    else:
+        # The custom API has no streaming protocol
+        yield None, {"text": "".join(tokens)}, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds per request")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="tokens per second (0 = instant)")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors")
+    args = parser.parse_args()
+
+    server = StandInLLM(args.host, args.port, args.latency, args.jitter, args.token_rate, args.tokens,
+                        args.error_rate, args.error_status)
+    print(f"Serving on {server.url} (OpenAI BASE_URL {server.base_url('openai')}, "
+          f"Anthropic BASE_URL {server.base_url('anthropic')}); Ctrl-C to stop")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Lookup benchmark for the `generate` intent similarity index.
+
+Fills a throwaway index with synthetic intents and measures lookups of
+paraphrased intents (hits) and unrelated ones (misses).
+
+Usage:
+    python benchmarks/similarity.py [--entries N] [--lookups N] [--budget-ms MS]
+
+Exits with status 1 when the median lookup exceeds the budget.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from smartman.similarity import SimilarityIndex  # noqa: E402
+
+VERBS = ("find", "list", "delete", "copy", "move", "compress", "extract", "count",
+         "show", "search", "sort", "kill", "archive", "sync")
+SCOPE = "benchmark"
+
+
+def make_intents(count, rng):
+    """Random intents: a verb followed by words from a few-thousand-word vocabulary."""
+    vocabulary = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+                  for _ in range(3000)]
+    return [f"{rng.choice(VERBS)} " + " ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 7)))
+            for _ in range(count)]
+
+
+def measure(index, intents):
+    """Return (lookup times in ms, number of hits)."""
+    samples = []
+    hits = 0
+    for intent in intents:
+        start = time.perf_counter()
+        hits += index.lookup(SCOPE, intent) is not None
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000, help="intents in the index")
+    parser.add_argument("--lookups", type=int, default=500, help="lookups of each kind")
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="maximum median lookup time")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    stored = make_intents(args.entries, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        index = SimilarityIndex(os.path.join(directory, "intents.db"), max_entries=args.entries)
+        start = time.perf_counter()
+        index.add_many(SCOPE, [(intent, f"command {i}") for i, intent in enumerate(stored)])
+        print(f"indexed {len(index)} intents in {time.perf_counter() - start:.1f} s")
+
+        paraphrases = [f"please {intent}s" for intent in rng.sample(stored, args.lookups)]
+        results = {"hit": measure(index, paraphrases), "miss": measure(index, make_intents(args.lookups, rng))}
+        index.close()
+
+    failures = []
+    for name, (samples, hits) in results.items():
+        samples.sort()
+        median = statistics.median(samples)
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        print(f"{name:5} median {median:6.3f} ms   p99 {p99:6.3f} ms   hits {hits}/{len(samples)}")
+        if median > args.budget_ms:
+            failures.append(f"{name}: median {median:.3f} ms > budget {args.budget_ms} ms")
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the smartman entry point.
+
+Measures wall time and `python -X importtime` import cost for:
+
+- ``smartman help``
+- a cache-hit ``smartman summary ls``
+
+and compares them against the budget recorded in ``startup_budget.json``.
+Each scenario runs in a throwaway HOME with a stub ``man`` on PATH so the
+numbers reflect interpreter startup, imports and cache I/O rather than the
+local groff installation or the network.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--json] [--update-budget]
+
+Exits with status 1 when a scenario exceeds its budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(HERE, "startup_budget.json")
+REPO_ROOT = os.path.dirname(HERE)
+
+# Same entry point as the `smartman` console script
+ENTRY = "import sys; from smartman.main import cli; sys.exit(cli())"
+
+# Modules each scenario must not import. A cache hit still renders Markdown,
+# but must never load the provider SDKs, requests or asyncio.
+SCENARIOS = {
+    "help": (["help"], ("openai", "anthropic", "requests", "rich.markdown", "asyncio")),
+    "summary_cache_hit": (["summary", "ls"], ("openai", "anthropic", "requests", "asyncio")),
+}
+
+STUB_MAN_PAGE = "LS(1)  User Commands  LS(1)\nNAME\n       ls - list directory contents\n"
+
+
+def make_environment(home):
+    """Create an isolated HOME with a stub man, a warm cache and no first-run banner."""
+    bin_dir = os.path.join(home, "bin")
+    os.makedirs(bin_dir)
+    man_source = os.path.join(home, "ls.1")
+    with open(man_source, "w") as f:
+        f.write(STUB_MAN_PAGE)
+    stub_man = os.path.join(bin_dir, "man")
+    with open(stub_man, "w") as f:
+        f.write(f"#!/bin/sh\nif [ \"$1\" = -w ]; then echo {man_source}; exit 0; fi\n"
+                "cat <<'EOF'\n" + STUB_MAN_PAGE + "EOF\n")
+    os.chmod(stub_man, 0o755)
+
+    config_dir = os.path.join(home, ".smartman")
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, ".first_run_complete"), "w") as f:
+        f.write("First run completed")
+
+    env = dict(os.environ)
+    env.update({
+        "HOME": home,
+        "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+        "OPENAI_API_KEY": "benchmark-key",
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    env.pop("ANTH_API_KEY", None)
+    env.pop("LLM_API_KEY", None)
+    return env
+
+
+def seed_cache(env):
+    """Store and index a summary for the stub `ls` page so `summary ls` is a cache hit."""
+    script = (
+        "from smartman import man_retriever, main\n"
+        "text = man_retriever.get_man_page('ls')\n"
+        "config = main.load_config()\n"
+        "llm = main.create_llm(config)\n"
+        "llm.set_cached('summary', llm.prompt_for('summary', text), 'Cached summary of ls')\n"
+        "main.index_answers(llm, config, ('summary',), 'ls', text)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], env=env, check=True, capture_output=True)
+
+
+def import_profile(argv, env, runs):
+    """Return (median smartman.main cumulative import ms, set of imported modules)."""
+    samples = []
+    modules = set()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", ENTRY] + argv,
+                              env=env, capture_output=True, text=True)
+        total_us = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+            if not cumulative.isdigit():
+                continue
+            modules.add(name)
+            if name == "smartman.main":
+                total_us = int(cumulative)
+        samples.append(total_us / 1000.0)
+    return statistics.median(samples), modules
+
+
+def wall_time(argv, env, runs):
+    """Return the median wall time in ms of running smartman with the given arguments."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", ENTRY] + argv,
+                              env=env, capture_output=True, text=True)
+        samples.append((time.perf_counter() - start) * 1000.0)
+        if proc.returncode != 0:
+            raise RuntimeError(f"smartman {' '.join(argv)} failed:\n{proc.stdout}{proc.stderr}")
+    return statistics.median(samples)
+
+
+def run(runs):
+    """Run every scenario and return a dict of measurements."""
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        env = make_environment(home)
+        seed_cache(env)
+        for name, (argv, forbidden) in SCENARIOS.items():
+            import_ms, modules = import_profile(argv, env, runs)
+            results[name] = {
+                "wall_ms": round(wall_time(argv, env, runs), 1),
+                "import_ms": round(import_ms, 1),
+                "heavy_imports": sorted(m for m in forbidden if m in modules),
+            }
+    return results
+
+
+def check_budget(results, budget):
+    """Return a list of human-readable budget violations."""
+    failures = []
+    for name, measured in results.items():
+        limits = budget.get(name, {})
+        for metric in ("wall_ms", "import_ms"):
+            if metric in limits and measured[metric] > limits[metric]:
+                failures.append(f"{name}: {metric} {measured[metric]} > budget {limits[metric]}")
+        if measured["heavy_imports"]:
+            failures.append(f"{name}: imported {', '.join(measured['heavy_imports'])}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="wall-time samples per scenario")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--update-budget", action="store_true",
+                        help="record the measured numbers (+50%% headroom) as the new budget")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+
+    if args.update_budget:
+        budget = {name: {metric: round(values[metric] * 1.5) for metric in ("wall_ms", "import_ms")}
+                  for name, values in results.items()}
+        with open(BUDGET_FILE, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+    failures = check_budget(results, budget)
+
+    if args.json:
+        print(json.dumps({"results": results, "budget": budget, "failures": failures}, indent=2))
+    else:
+        for name, values in results.items():
+            limits = budget.get(name, {})
+            print(f"{name:20} wall {values['wall_ms']:8.1f} ms (budget {limits.get('wall_ms', '-')})"
+                  f"   import {values['import_ms']:8.1f} ms (budget {limits.get('import_ms', '-')})")
+        for failure in failures:
+            print(f"OVER BUDGET: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite against a local stand-in LLM server.
+
+Starts benchmarks/llm_server.py in-process and drives the real request
+path -- no mocks -- through these scenarios:
+
+- requests:  LLMInterface calls and streams for OpenAI and Anthropic, through
+             the official SDK (when installed) and the requests fallback
+- errors:    calls routed with retries while the server fails a share of requests
+- cache_hit: in-process answers served from the response cache
+- cli:       `smartman summary ls` as a subprocess, cold (empty cache) and warm
+- retrieval: man page retrieval and prompt condensing over a corpus of pages
+- batch:     `generate` throughput of run_batch at several worker counts
+
+Everything runs under a throwaway HOME. Results are written as JSON with
+--output; --compare checks them against an earlier file and exits with
+status 1 when a metric regressed by more than --tolerance.
+
+Usage:
+    python benchmarks/suite.py [--scenario NAME ...] [--requests N] [--latency S]
+                               [--output FILE] [--compare FILE] [--tolerance F]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, HERE)
+
+from llm_server import StandInLLM, answer_tokens  # noqa: E402
+from startup import ENTRY, make_environment  # noqa: E402
+
+SCENARIOS = ("requests", "errors", "cache_hit", "cli", "retrieval", "batch")
+# Pages measured by the retrieval scenario when the manpath is empty
+FALLBACK_CORPUS = ("ls", "cp", "mv", "tar", "grep", "find", "sed", "awk", "sort", "ps", "ssh", "curl", "git")
+AVAILABILITY_FLAGS = {"openai": "OPENAI_AVAILABLE", "anthropic": "ANTHROPIC_AVAILABLE"}
+
+
+def percentiles(samples_ms):
+    """median and p95 of a list of milliseconds, rounded for the results file."""
+    samples_ms = sorted(samples_ms)
+    return {"median_ms": round(statistics.median(samples_ms), 3),
+            "p95_ms": round(samples_ms[math.ceil(len(samples_ms) * 0.95) - 1], 3)}
+
+
+@contextlib.contextmanager
+def transport(provider, use_sdk):
+    """Make LLMInterface use the provider's SDK or the requests fallback."""
+    from smartman import llm_interface
+
+    flag = AVAILABILITY_FLAGS[provider]
+    saved = getattr(llm_interface, flag)
+    setattr(llm_interface, flag, use_sdk and saved)
+    try:
+        yield
+    finally:
+        setattr(llm_interface, flag, saved)
+
+
+def make_llm(server, provider="openai", **kwargs):
+    """An LLMInterface pointed at the stand-in server, without its startup chatter."""
+    from smartman.llm_interface import LLMInterface
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return LLMInterface(api_key="benchmark-key", provider=provider, base_url=server.base_url(provider),
+                            **kwargs)
+
+
+def bench_requests(server, count):
+    """Latency of calls and streams per provider and transport; time to first chunk for streams."""
+    from smartman import llm_interface
+
+    expected = "".join(answer_tokens(server.tokens))
+    results = {}
+    for provider in ("openai", "anthropic"):
+        transports = ["requests"]
+        if getattr(llm_interface, AVAILABILITY_FLAGS[provider]):
+            transports.insert(0, "sdk")
+        for name in transports:
+            with transport(provider, name == "sdk"):
+                llm = make_llm(server, provider, use_cache=False)
+                llm.generate_command("warm up the connection")
+                calls, streams, first_chunks = [], [], []
+                for i in range(count):
+                    start = time.perf_counter()
+                    answer = llm.generate_command(f"list files {i}")
+                    calls.append((time.perf_counter() - start) * 1000.0)
+                    if answer != expected:
+                        raise RuntimeError(f"{provider}/{name} returned an unexpected answer: {answer!r}")
+
+                    start = time.perf_counter()
+                    first = None
+                    for _ in llm.stream_command(f"list directories {i}"):
+                        if first is None:
+                            first = time.perf_counter()
+                    streams.append((time.perf_counter() - start) * 1000.0)
+                    first_chunks.append((first - start) * 1000.0)
+                llm.close()
+            results[f"{provider}_{name}_call"] = percentiles(calls)
+            results[f"{provider}_{name}_stream"] = dict(percentiles(streams),
+                                                        first_chunk_ms=round(statistics.median(first_chunks), 3))
+    return results
+
+
+def bench_errors(server, count, error_rate):
+    """Success rate and latency of routed calls (with retries) while the server fails requests."""
+    from smartman.llm_interface import LLMAPIError
+
+    server.error_rate = error_rate
+    try:
+        with transport("openai", False):
+            llm = make_llm(server, use_cache=False, routes=[],
+                           routing_options={"retries": 3, "backoff": 0.01, "failure_threshold": count + 1})
+            samples, failures = [], 0
+            requests_before = server.requests
+            for i in range(count):
+                start = time.perf_counter()
+                try:
+                    llm.generate_command(f"show disk usage {i}")
+                except LLMAPIError:
+                    failures += 1
+                samples.append((time.perf_counter() - start) * 1000.0)
+            llm.close()
+    finally:
+        server.error_rate = 0.0
+    return {"routed_retries": dict(percentiles(samples), error_rate=error_rate,
+                                   success_rate=round(1 - failures / count, 3),
+                                   attempts_per_request=round((server.requests - requests_before) / count, 2))}
+
+
+def bench_cache_hit(server, home, count):
+    """Latency of answers served from the sqlite and file response caches."""
+    results = {}
+    for backend in ("sqlite", "file"):
+        cache_dir = os.path.join(home, f"cache-{backend}")
+        llm = make_llm(server, cache_options={"cache_dir": cache_dir, "backend": backend})
+        man_text = "LS(1)\nNAME\n       ls - list directory contents\n"
+        llm.generate_summary(man_text)
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            llm.generate_summary(man_text)
+            samples.append((time.perf_counter() - start) * 1000.0)
+        llm.close()
+        results[f"summary_{backend}"] = percentiles(samples)
+    return results
+
+
+def bench_cli(server, count):
+    """Wall time of `smartman summary ls` with an empty cache (cold) and a warm one."""
+    with tempfile.TemporaryDirectory() as home:
+        env = make_environment(home)
+        with open(os.path.join(home, ".smartman", "config.yaml"), "w") as f:
+            json.dump({"PROVIDER": "openai", "LLM_API_KEY": "benchmark-key",
+                       "BASE_URL": server.base_url("openai")}, f)
+        env["SMARTMAN_NO_DAEMON"] = "1"
+        argv = [sys.executable, "-c", ENTRY, "summary", "ls"]
+        cache_dir = os.path.join(home, ".smartman", "cache")
+
+        def run():
+            start = time.perf_counter()
+            proc = subprocess.run(argv, env=env, capture_output=True, text=True)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if proc.returncode != 0:
+                raise RuntimeError(f"smartman summary ls failed:\n{proc.stdout}{proc.stderr}")
+            return elapsed
+
+        cold = []
+        for _ in range(count):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(run())
+        warm = [run() for _ in range(count)]
+    return {"summary_cold": percentiles(cold), "summary_warm": percentiles(warm)}
+
+
+def corpus(pages):
+    """Names of up to `pages` man pages to retrieve, from the manpath or a list of common commands."""
+    from smartman import warm
+
+    names = warm.list_pages(warm.DEFAULT_SECTIONS)
+    if not names:
+        names = [name for name in FALLBACK_CORPUS if shutil.which(name)]
+    return names[:pages]
+
+
+def bench_retrieval(pages):
+    """Cost of retrieving pages uncached and from the retrieval cache, and of condensing them."""
+    from smartman import man_retriever
+
+    names = corpus(pages)
+    if not names:
+        return {}
+    uncached, cached, condense, sizes = [], [], [], []
+    for name in names:
+        start = time.perf_counter()
+        text = man_retriever.get_man_page(name, use_cache=False)
+        uncached.append((time.perf_counter() - start) * 1000.0)
+        man_retriever.get_man_page(name)
+        start = time.perf_counter()
+        man_retriever.get_man_page(name)
+        cached.append((time.perf_counter() - start) * 1000.0)
+        start = time.perf_counter()
+        man_retriever.build_prompt_context(text)
+        condense.append((time.perf_counter() - start) * 1000.0)
+        sizes.append(len(text))
+    return {"uncached": dict(percentiles(uncached), pages=len(names), mean_chars=round(statistics.mean(sizes))),
+            "cached": percentiles(cached),
+            "condense": percentiles(condense)}
+
+
+def bench_batch(server, count, worker_counts):
+    """Throughput of `generate` batches with the response cache off."""
+    from smartman.batch import run_batch
+
+    results = {}
+    for workers in worker_counts:
+        llm = make_llm(server, use_cache=False, pool_size=max(10, workers))
+        items = [f"find files named report {workers}-{i}" for i in range(count)]
+        start = time.perf_counter()
+        outcomes = list(run_batch(llm, "generate", items, workers))
+        elapsed = time.perf_counter() - start
+        llm.close()
+        results[f"workers_{workers}"] = {"items_per_s": round(len(items) / elapsed, 2),
+                                         "failed": sum(not outcome["ok"] for outcome in outcomes)}
+    return results
+
+
+def environment():
+    """Versions the results were measured with."""
+    from smartman import __version__
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"smartman": __version__, "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of results against baseline, as human-readable lines."""
+    regressions = []
+    for scenario, entries in results.items():
+        for name, metrics in entries.items():
+            before = baseline.get(scenario, {}).get(name, {})
+            for metric, value in metrics.items():
+                old = before.get(metric)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                    continue
+                if metric.endswith("_ms") and value > old * (1 + tolerance) or \
+                        metric.endswith("_per_s") and value < old * (1 - tolerance):
+                    regressions.append(f"{scenario}.{name}.{metric}: {old} -> {value}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these (repeatable)")
+    parser.add_argument("--requests", type=int, default=20, help="samples per request and cache measurement")
+    parser.add_argument("--cli-runs", type=int, default=5, help="samples per CLI measurement")
+    parser.add_argument("--pages", type=int, default=50, help="pages in the retrieval corpus")
+    parser.add_argument("--batch-items", type=int, default=40, help="items per batch run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8], help="batch worker counts")
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in server time to first byte, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="stand-in server latency jitter, seconds")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="stand-in server tokens per second")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per stand-in answer")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="failed share of requests in the errors scenario")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+    scenarios = args.scenario or SCENARIOS
+
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        # Keep caches, stats and indexes of the in-process scenarios out of the real ~/.smartman
+        os.environ["HOME"] = home
+        with StandInLLM(latency=args.latency, jitter=args.jitter, token_rate=args.token_rate,
+                        tokens=args.tokens) as server:
+            runners = {
+                "requests": lambda: bench_requests(server, args.requests),
+                "errors": lambda: bench_errors(server, args.requests, args.error_rate),
+                "cache_hit": lambda: bench_cache_hit(server, home, args.requests * 10),
+                "cli": lambda: bench_cli(server, args.cli_runs),
+                "retrieval": lambda: bench_retrieval(args.pages),
+                "batch": lambda: bench_batch(server, args.batch_items, args.workers),
+            }
+            for scenario in scenarios:
+                results[scenario] = runners[scenario]()
+                for name, metrics in results[scenario].items():
+                    print(f"{scenario:10} {name:24} " + "   ".join(f"{key} {value}" for key, value in metrics.items()))
+            settings = server.settings()
+
+    report = {"environment": environment(), "server": settings, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f).get("results", {}), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,9 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=read_requirements(),
+    extras_require={
+        "zstd": ["zstandard>=0.21"],
+    },
     long_description=read_long_description(),
     long_description_content_type="text/markdown",
     url="https://github.com/sajid-karim/smartman",
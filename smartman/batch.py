@@ -0,0 +1,95 @@
+"""
+Concurrent bulk generation for `smartman batch`.
+
+Every item runs documentation retrieval and its LLM request on a worker
+thread sharing one LLMInterface, so a whole batch pays interpreter startup,
+config loading and connection setup once and reuses the response cache.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from smartman import man_retriever
+
+BATCH_ACTIONS = ('summary', 'example', 'generate')
+
+SOURCE_MARKERS = {
+    'SHELL BUILTIN COMMAND:': 'builtin',
+    'COMMAND HELP OUTPUT:': 'help',
+    'NO_DOCUMENTATION:': 'none',
+}
+
+def read_items(lines):
+    """Return the non-empty lines of an input file, skipping # comments."""
+    items = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            items.append(line)
+    return items
+
+def documentation_source(doc_text):
+    """Name the kind of documentation get_man_page returned: man, builtin, help or none."""
+    for marker, kind in SOURCE_MARKERS.items():
+        if doc_text.startswith(marker):
+            return kind
+    return 'man'
+
+def run_item(llm, action, index, item):
+    """
+    Process one batch item and return its result record.
+
+    Errors are captured in the record instead of raised so one failing
+    item never stops the rest of the batch.
+    """
+    start = time.perf_counter()
+    result = {'index': index, 'item': item, 'action': action}
+    try:
+        if action == 'generate':
+            output = llm.generate_command(item)
+        else:
+            doc_text = man_retriever.get_man_page(item)
+            result['retrieval_ms'] = round((time.perf_counter() - start) * 1000.0, 1)
+            result['source'] = documentation_source(doc_text)
+            if action == 'summary':
+                output = llm.generate_summary(doc_text)
+            else:
+                output = llm.generate_example(doc_text)
+        result['ok'] = True
+        result['output'] = output
+    except Exception as e:
+        result['ok'] = False
+        result['error'] = str(e)
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000.0, 1)
+    return result
+
+def run_batch(llm, action, items, workers=4):
+    """Process items concurrently with at most `workers` in flight, yielding results as they complete."""
+    if action not in BATCH_ACTIONS:
+        raise ValueError(f"Unknown batch action: {action}")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_item, llm, action, index, item) for index, item in enumerate(items)]
+        for future in as_completed(futures):
+            yield future.result()
+
+def output_filename(result):
+    """File name for an item's output in --output-dir mode, e.g. "0003-tar.summary.md"."""
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', result['item']).strip('_')[:80] or 'item'
+    return f"{result['index']:04d}-{slug}.{result['action']}.md"
+
+def write_result(result, output_dir):
+    """
+    Write an item's output to its own file in output_dir.
+
+    Returns the metadata record for results.jsonl, which references the
+    file instead of repeating the output.
+    """
+    record = dict(result)
+    if result['ok']:
+        filename = output_filename(result)
+        with open(os.path.join(output_dir, filename), 'w') as f:
+            f.write(record.pop('output'))
+        record['file'] = filename
+    return record
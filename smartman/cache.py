@@ -2,46 +2,454 @@
 
 import os
 import json
+import time
+import zlib
 import hashlib
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from importlib.util import find_spec
+from smartman import profiling
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on this platform: coalescing then only works between threads
+    fcntl = None
+
+# zstd compresses cache entries faster and smaller than zlib when installed
+ZSTD_AVAILABLE = find_spec("zstandard") is not None
 
 class ResponseCache:
-    def __init__(self, cache_dir=None, ttl_hours=24):
+    def __init__(self, cache_dir=None, ttl_hours=24, backend="sqlite", max_entries=10000, max_bytes=64 * 1024 * 1024,
+                 compression=None):
+        """
+        Initialize the response cache.
+
+        Args:
+            cache_dir: Directory holding the cache (defaults to ~/.smartman/cache)
+            ttl_hours: Hours a cached response stays valid
+            backend: "sqlite" (single indexed database with LRU eviction) or "file" (one JSON file per entry)
+            max_entries: Maximum number of entries kept by the sqlite backend
+            max_bytes: Maximum total response size in bytes kept by the sqlite backend
+            compression: "zstd" or "zlib" for entries of the file backend (defaults to zstd when installed)
+        """
         if cache_dir is None:
             cache_dir = os.path.expanduser('~/.smartman/cache')
         self.cache_dir = cache_dir
         self.ttl = timedelta(hours=ttl_hours)
-        
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
-    
+
+        # Other processes may be creating it at the same moment
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        if backend == "sqlite":
+            self.storage = SQLiteCacheStorage(os.path.join(self.cache_dir, 'cache.db'), max_entries, max_bytes)
+            self.storage.import_file_cache(self.cache_dir, self.ttl)
+        elif backend == "file":
+            self.storage = FileCacheStorage(self.cache_dir, compression)
+        else:
+            raise ValueError(f"Unknown cache backend: {backend}")
+
+        self.flights = SingleFlight(os.path.join(self.cache_dir, 'locks'))
+
     def get_cache_key(self, text):
         """Generate a unique cache key for the text."""
         return hashlib.md5(text.encode('utf-8')).hexdigest()
-        
+
+    @profiling.timed('cache')
     def get_cached_response(self, prompt_text, action_type):
         """Get cached response if available and not expired."""
         cache_key = self.get_cache_key(f"{action_type}:{prompt_text}")
-        cache_file = os.path.join(self.cache_dir, cache_key)
-        
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r') as f:
-                data = json.load(f)
-                
-            # Check if cache is valid
-            cached_time = datetime.fromisoformat(data['timestamp'])
-            if datetime.now() - cached_time < self.ttl:
-                return data['response']
-                
-        return None
-        
+        return self.storage.get(cache_key, self.ttl)
+
+    @profiling.timed('cache')
     def cache_response(self, prompt_text, action_type, response):
         """Cache the response for future use."""
         cache_key = self.get_cache_key(f"{action_type}:{prompt_text}")
-        cache_file = os.path.join(self.cache_dir, cache_key)
-        
-        with open(cache_file, 'w') as f:
-            json.dump({
-                'timestamp': datetime.now().isoformat(),
-                'response': response
-            }, f)
\ No newline at end of file
+        self.storage.set(cache_key, response, self.ttl)
+
+    def link(self, index_text, prompt_text, action_type):
+        """
+        Point an index entry at the cached response for a prompt.
+
+        A caller that knows what a prompt would be built from can then find
+        the response without building the prompt (see get_linked_response).
+        The index entry is stored like a response, so it expires and is
+        evicted the same way.
+        """
+        index_key = self.get_cache_key(f"index:{index_text}")
+        self.storage.set(index_key, self.get_cache_key(f"{action_type}:{prompt_text}"), self.ttl)
+
+    @profiling.timed('cache')
+    def get_linked_response(self, index_text):
+        """Get the response an index entry points at, if both are present and not expired."""
+        cache_key = self.storage.get(self.get_cache_key(f"index:{index_text}"), self.ttl)
+        return self.storage.get(cache_key, self.ttl) if cache_key else None
+
+    def coalesce(self, prompt_text, action_type, timeout):
+        """
+        Context manager serializing work on one cache entry across threads and processes.
+
+        The first caller proceeds at once; others wait until it leaves (or
+        `timeout` seconds pass) and should then check the cache again
+        before doing the work themselves.
+        """
+        return self.flights.hold(self.get_cache_key(f"{action_type}:{prompt_text}"), timeout)
+
+    def close(self):
+        """Release any resources held by the storage backend."""
+        self.storage.close()
+
+
+class FileCacheStorage:
+    """
+    Stores each cache entry as a compressed file named after its key.
+
+    Entries are sharded into subdirectories named after the first two hex
+    digits of the key, so no directory holds more than a few thousand
+    files. Each entry is written to a temporary file in its shard and
+    renamed into place, so a reader in another process sees the old entry
+    or the new one, never a partial file. Anything unreadable counts as a
+    miss. Entries written in the old flat layout (plain JSON directly in
+    cache_dir) are still read.
+    """
+
+    MAGIC = b'SMC1'
+    CODECS = {'zlib': b'z', 'zstd': b's'}
+
+    def __init__(self, cache_dir, compression=None):
+        if compression is None:
+            compression = 'zstd' if ZSTD_AVAILABLE else 'zlib'
+        if compression not in self.CODECS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        if compression == 'zstd' and not ZSTD_AVAILABLE:
+            raise ValueError("zstd cache compression needs the zstandard package (pip install smartman[zstd])")
+        self.cache_dir = cache_dir
+        self.compression = compression
+
+    def path(self, cache_key):
+        """Where the entry for a key is stored."""
+        return os.path.join(self.cache_dir, cache_key[:2], cache_key)
+
+    def get(self, cache_key, ttl):
+        """Return the stored response for the key, or None if missing, expired or unreadable."""
+        data = self._read(self.path(cache_key))
+        if data is None:
+            data = self._read_legacy(os.path.join(self.cache_dir, cache_key))
+        if data is None:
+            return None
+        cached_time, response = data
+        if datetime.now() - cached_time < ttl:
+            return response
+        return None
+
+    def set(self, cache_key, response, ttl):
+        """Store the response under the key, atomically replacing any previous entry."""
+        path = self.path(cache_key)
+        payload = json.dumps({'timestamp': datetime.now().isoformat(), 'response': response}).encode('utf-8')
+        blob = self.MAGIC + self.CODECS[self.compression] + _compress(self.compression, payload)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{cache_key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def entries(self):
+        """
+        Yield (key, path, (timestamp, response) or None) for every stored entry,
+        in both the sharded and the old flat layout.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            if len(name) == 32 and os.path.isfile(path):
+                yield name, path, self._read_legacy(path)
+            elif len(name) == 2 and os.path.isdir(path):
+                for key in os.listdir(path):
+                    if len(key) == 32 and key.startswith(name):
+                        yield key, os.path.join(path, key), self._read(os.path.join(path, key))
+
+    def _read(self, path):
+        """Return (timestamp, response) from a sharded entry, or None if missing or corrupt."""
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+        except OSError:
+            return None
+        if blob[:len(self.MAGIC)] != self.MAGIC:
+            return None
+        codec = {marker: name for name, marker in self.CODECS.items()}.get(blob[len(self.MAGIC):len(self.MAGIC) + 1])
+        try:
+            return _parse_entry(_decompress(codec, blob[len(self.MAGIC) + 1:]))
+        except (ValueError, KeyError, TypeError, zlib.error):
+            return None
+
+    def _read_legacy(self, path):
+        """Return (timestamp, response) from a flat-layout JSON entry, or None."""
+        try:
+            with open(path, 'rb') as f:
+                return _parse_entry(f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def close(self):
+        pass
+
+
+def _parse_entry(payload):
+    data = json.loads(payload)
+    return datetime.fromisoformat(data['timestamp']), data['response']
+
+def _compress(codec, payload):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(payload)
+    return zlib.compress(payload)
+
+def _decompress(codec, blob):
+    """Decompress an entry; raises ValueError if it can't be (corrupt, or zstd not installed)."""
+    if codec == 'zlib':
+        return zlib.decompress(blob)
+    if codec == 'zstd' and ZSTD_AVAILABLE:
+        import zstandard
+        try:
+            return zstandard.ZstdDecompressor().decompress(blob)
+        except zstandard.ZstdError as e:
+            raise ValueError(str(e))
+    raise ValueError(f"Unsupported cache entry codec: {codec}")
+
+
+class SQLiteCacheStorage:
+    """
+    Stores cache entries in a single SQLite database in WAL mode.
+
+    Keys are the primary key, expiry is a separate indexed column so TTL
+    checks never touch the payload, and the least recently used entries are
+    evicted once the entry or byte limits are exceeded. Reads don't write:
+    the access times of hits are kept in memory and stored with the next
+    write (or on close). A locked or corrupt database counts as a miss and
+    writes to it are dropped, so the cache never fails a command.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+        CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Access times of hits not yet written, by key
+        self._touched = {}
+        # Autocommit mode; writers wait for each other across processes
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def get(self, cache_key, ttl):
+        """Return the stored response for the key, or None if missing, expired or unreadable."""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT response FROM entries WHERE key = ? AND expires_at > ?", (cache_key, now)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            self._touched[cache_key] = now
+        return row[0]
+
+    def set(self, cache_key, response, ttl):
+        """Store the response under the key and evict entries beyond the limits."""
+        now = time.time()
+        with self._lock:
+            try:
+                self._flush_touched()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, response, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (cache_key, response, len(response.encode('utf-8')), now + ttl.total_seconds(), now)
+                )
+                self._evict(now)
+            except sqlite3.Error:
+                pass
+
+    def _flush_touched(self):
+        """Write the access times recorded by get() since the last write."""
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            self._conn.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in touched.items()])
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until under the limits."""
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def import_file_cache(self, cache_dir, ttl):
+        """
+        One-time migration of entries written by the file backend.
+
+        Valid entries are imported with their original expiry in a single
+        transaction; every legacy file (valid, expired or unreadable) is
+        removed only once that transaction has committed, so a failed import
+        loses nothing and is retried next time.
+        """
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                row = self._conn.execute("SELECT value FROM meta WHERE name = 'file_cache_imported'").fetchone()
+                if row is not None:
+                    self._conn.execute("COMMIT")
+                    return
+
+                imported = []
+                for key, path, entry in FileCacheStorage(cache_dir).entries():
+                    if entry is not None:
+                        created, response = entry[0].timestamp(), entry[1]
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO entries (key, response, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                            (key, response, len(response.encode('utf-8')), created + ttl.total_seconds(), created)
+                        )
+                    imported.append(path)
+
+                self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('file_cache_imported', ?)",
+                                   (datetime.now().isoformat(),))
+                self._evict(time.time())
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                return
+
+        for path in imported:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_touched()
+            except sqlite3.Error:
+                pass
+            self._conn.close()
+
+
+class SingleFlight:
+    """
+    Per-key locks shared by the threads of this process and, through flock()
+    on a lock file per key, by every process using the same cache directory.
+
+    A holder unlinks its lock file on release; a waiter that locked a file
+    which was unlinked in the meantime retries on the new one, so lock files
+    never accumulate.
+    """
+
+    def __init__(self, lock_dir):
+        self.lock_dir = lock_dir
+        self._guard = threading.Lock()
+        self._locks = {}  # key -> [threading.Lock, number of users]
+
+    @contextmanager
+    def hold(self, key, timeout):
+        """Hold the lock for key, or give up waiting after timeout seconds and proceed unlocked."""
+        deadline = time.monotonic() + timeout
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(timeout=max(deadline - time.monotonic(), 0)):
+                yield
+                return
+            try:
+                fd = self._lock_file(key, deadline)
+                try:
+                    yield
+                finally:
+                    if fd is not None:
+                        self._unlock_file(key, fd)
+            finally:
+                entry[0].release()
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def _lock_file(self, key, deadline):
+        """flock() the key's lock file, polling until the deadline; returns the fd or None."""
+        if fcntl is None:
+            return None
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        delay = 0.005
+        while True:
+            try:
+                os.makedirs(self.lock_dir, exist_ok=True)
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            except OSError:
+                return None
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.1)
+                continue
+            # The previous holder may have unlinked the file after we opened it
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd
+            except OSError:
+                pass
+            os.close(fd)
+
+    def _unlock_file(self, key, fd):
+        try:
+            os.unlink(os.path.join(self.lock_dir, f"{key}.lock"))
+        except OSError:
+            pass
+        os.close(fd)
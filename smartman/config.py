@@ -1,9 +1,13 @@
 import os
-import yaml
+from smartman import profiling
 
+CONFIG_PATH = '~/.smartman/config.yaml'
+
+@profiling.timed('config')
 def load_config():
-    config_path = os.path.expanduser('~/.smartman/config.yaml')
+    config_path = os.path.expanduser(CONFIG_PATH)
     if os.path.exists(config_path):
+        import yaml
         with open(config_path, 'r') as file:
             config = yaml.safe_load(file) or {}
     else:
@@ -0,0 +1,216 @@
+"""
+Optional background server for smartman (`smartman serve`).
+
+The server keeps one LLMInterface (SDK client, pooled connections, open
+cache database) and the retrieval cache warm, and answers requests from
+the CLI over a Unix domain socket, so an invocation no longer pays for
+loading the config, importing provider SDKs and opening new HTTPS
+connections. The CLI falls back to in-process execution whenever no
+server is listening.
+
+Documentation is retrieved by the client, so the command is looked up in
+the client's PATH, MANPATH and working directory rather than in those the
+server happened to be started with; only the text is sent.
+
+Protocol: the client sends one JSON line {"action", "argument", "stream"},
+where argument is the intent for generate and the documentation text for
+the other actions. The server replies with JSON lines: any number of
+{"chunk": text}, then {"done": true} or {"error": message}.
+"""
+
+import os
+import json
+import socket
+import threading
+import socketserver
+from contextlib import contextmanager
+
+from smartman.config import CONFIG_PATH
+
+DEFAULT_SOCKET_PATH = '~/.smartman/daemon.sock'
+CONNECT_TIMEOUT = 0.5  # seconds; a server that cannot accept by then is treated as absent
+DAEMON_ACTIONS = ('summary', 'example', 'describe', 'generate')
+
+def socket_path():
+    """Socket path from SMARTMAN_SOCKET, defaulting to ~/.smartman/daemon.sock."""
+    return os.path.expanduser(os.environ.get('SMARTMAN_SOCKET', DEFAULT_SOCKET_PATH))
+
+def connect(path=None):
+    """Return a socket connected to a running server, or None if none is listening."""
+    if os.environ.get('SMARTMAN_NO_DAEMON'):
+        return None
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    # Answers may take as long as the provider does
+    sock.settimeout(None)
+    return sock
+
+def forward(action, argument, stream=False, path=None, sock=None):
+    """
+    Send a request to the running server.
+
+    argument is the intent for generate and the documentation text for the
+    other actions. sock is a socket already returned by connect(), if any.
+
+    Returns None when no server is listening, otherwise an iterator over
+    the response text. The iterator raises an Exception carrying the
+    server's message if the request failed.
+    """
+    sock = sock or connect(path)
+    if sock is None:
+        return None
+    reader = sock.makefile('r', encoding='utf-8')
+    try:
+        sock.sendall((json.dumps({'action': action, 'argument': argument, 'stream': stream}) + '\n').encode('utf-8'))
+        first = _read_message(reader)
+    except Exception:
+        reader.close()
+        sock.close()
+        raise
+
+    def chunks():
+        message = first
+        try:
+            while True:
+                if 'error' in message:
+                    raise Exception(message['error'])
+                if 'chunk' in message:
+                    yield message['chunk']
+                if message.get('done'):
+                    return
+                message = _read_message(reader)
+        finally:
+            reader.close()
+            sock.close()
+
+    return chunks()
+
+def _read_message(reader):
+    line = reader.readline()
+    if not line:
+        raise Exception("smartman server closed the connection")
+    return json.loads(line)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Answers one request per connection."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            action, argument = request['action'], request['argument']
+            if action not in DAEMON_ACTIONS:
+                raise ValueError(f"Unknown action: {action}")
+            with self.server.llm() as llm:
+                if action == 'generate':
+                    stream, call = llm.stream_command, llm.generate_command
+                elif action == 'summary':
+                    stream, call = llm.stream_summary, llm.generate_summary
+                elif action == 'describe':
+                    stream, call = llm.stream_description, llm.generate_description
+                else:
+                    stream, call = llm.stream_example, llm.generate_example
+                if request.get('stream') and self.server.config.get('STREAM', True):
+                    for chunk in stream(argument):
+                        self.send({'chunk': chunk})
+                else:
+                    self.send({'chunk': call(argument)})
+            self.send({'done': True})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away, e.g. Ctrl-C during a streamed answer
+            pass
+        except Exception as e:
+            try:
+                self.send({'error': str(e)})
+            except OSError:
+                pass
+
+    def send(self, message):
+        self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+
+class SmartmanServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded Unix socket server sharing one LLMInterface between requests.
+
+    The config is reloaded with load_config() and the interface rebuilt with
+    create_llm(config) whenever the config file changes, so edits to
+    ~/.smartman/config.yaml apply without a restart. The replaced interface
+    is closed once the last request using it has finished.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, load_config, create_llm):
+        self.path = path
+        self.load_config = load_config
+        self.create_llm = create_llm
+        self.config = {}
+        self._llm = None
+        self._users = {}  # LLMInterface -> requests using it
+        self._config_stamp = None
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            probe = connect(path)
+            if probe is not None:
+                probe.close()
+                raise RuntimeError(f"A smartman server is already listening on {path}")
+            # Left behind by a server that did not shut down cleanly
+            os.unlink(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Only the owner may connect: requests are billed to their API key
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    @contextmanager
+    def llm(self):
+        """Use the shared LLMInterface for one request, rebuilding it first if the config file changed."""
+        try:
+            stat = os.stat(os.path.expanduser(CONFIG_PATH))
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        with self._lock:
+            if self._llm is None or stamp != self._config_stamp:
+                old = self._llm
+                self.config = self.load_config()
+                self._llm = self.create_llm(self.config)
+                self._config_stamp = stamp
+                if old is not None and not self._users.get(old):
+                    self._users.pop(old, None)
+                    old.close()
+            llm = self._llm
+            self._users[llm] = self._users.get(llm, 0) + 1
+        try:
+            yield llm
+        finally:
+            with self._lock:
+                self._users[llm] -= 1
+                retired = llm is not self._llm and not self._users[llm]
+                if retired:
+                    del self._users[llm]
+            if retired:
+                # The last request using an interface replaced after a config change
+                llm.close()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        if self._llm is not None:
+            self._llm.close()
+            self._llm = None
@@ -0,0 +1,211 @@
+"""
+Hedged requests across two providers.
+
+When the primary provider has not answered (or started streaming) within
+the hedge delay, the same prompt is sent to the secondary provider and the
+first answer wins. Every request made in hedging mode is appended to a
+stats file so the delay can be tuned from real win rates and latencies (`smartman hedge-stats`).
+Once the file grows past MAX_STATS_BYTES it is rotated to a single `.1`
+backup, so it never takes more than about twice that.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_STATS_PATH = '~/.smartman/hedge_stats.jsonl'
+MAX_STATS_BYTES = 1024 * 1024
+
+
+class Hedger:
+    """
+    Races a primary LLMInterface against a secondary one.
+
+    The secondary request is only sent once the primary has been silent for
+    `delay` seconds, or as soon as the primary fails. The losing request is
+    cancelled: a streamed response is closed once it has produced its first
+    chunk, and a request that has not started is never sent. A blocking
+    non-streamed call already on the wire cannot be interrupted from another
+    thread, so its answer is simply discarded.
+    """
+
+    def __init__(self, primary, secondary, delay, stats_path=DEFAULT_STATS_PATH):
+        self.primary = primary
+        self.secondary = secondary
+        self.delay = delay
+        self.stats_path = os.path.expanduser(stats_path) if stats_path else None
+        self.stats = {llm.provider: {'wins': 0, 'hedged_wins': 0, 'latency': 0.0} for llm in (primary, secondary)}
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def call(self, prompt):
+        """Return the first complete answer from either provider."""
+        _, winner = self._race(lambda llm, call: call(prompt),
+                               self.primary._call_direct, self.secondary._call_provider)
+        return winner.result()
+
+    def stream(self, prompt):
+        """Yield the stream of whichever provider starts answering first."""
+        generators = {}
+
+        def first_chunk(llm, open_stream):
+            generators[llm.provider] = generator = open_stream(prompt)
+            return next(generator, None)
+
+        futures, winner = self._race(first_chunk, self.primary._stream_direct, self.secondary._stream_provider)
+        generator = generators[futures[winner].provider]
+        for future, llm in futures.items():
+            if future is not winner:
+                # Closes the loser's HTTP response once its first chunk (or error) arrives
+                future.add_done_callback(lambda f, provider=llm.provider: _close(generators.get(provider)))
+        first = winner.result()
+        if first is None:
+            return
+        yield first
+        yield from generator
+
+    def _race(self, run, primary_call, secondary_call):
+        """
+        Run run(llm, call) for the primary, hedging to the secondary after the delay.
+
+        Returns ({future: llm}, winning future). Raises the primary's error if
+        both fail.
+        """
+        start = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=2)
+        futures = {}
+        errors = []
+        hedged = False
+        try:
+            futures[pool.submit(run, self.primary, primary_call)] = self.primary
+            pending = set(futures)
+            while True:
+                timeout = None if hedged else max(self.delay - (time.monotonic() - start), 0)
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self.record(futures[future], time.monotonic() - start, hedged)
+                        return futures, future
+                    errors.append(future.exception())
+                if not hedged and (not done or not pending):
+                    # The primary is slow or failed: hedge to the secondary
+                    hedged = True
+                    with self._lock:
+                        self.hedges += 1
+                    future = pool.submit(run, self.secondary, secondary_call)
+                    futures[future] = self.secondary
+                    pending.add(future)
+                elif not pending:
+                    raise errors[0]
+        finally:
+            # Cancelled by hand: shutdown(cancel_futures=True) needs Python 3.9
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    async def acall(self, prompt):
+        """Async variant of call() for AsyncLLMInterface; the loser is cancelled outright."""
+        # Only async callers need asyncio, so the sync CLI doesn't pay for importing it
+        import asyncio
+
+        start = time.monotonic()
+        tasks = {asyncio.ensure_future(self.primary._call_direct(prompt)): self.primary}
+        errors = []
+        hedged = False
+        try:
+            pending = set(tasks)
+            while True:
+                timeout = None if hedged else max(self.delay - (time.monotonic() - start), 0)
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.record(tasks[task], time.monotonic() - start, hedged)
+                        return task.result()
+                    errors.append(task.exception())
+                if not hedged and (not done or not pending):
+                    hedged = True
+                    with self._lock:
+                        self.hedges += 1
+                    task = asyncio.ensure_future(self.secondary._call_provider(prompt))
+                    tasks[task] = self.secondary
+                    pending.add(task)
+                elif not pending:
+                    raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def record(self, llm, latency, hedged):
+        """Count a win for llm and append it to the stats file."""
+        with self._lock:
+            stats = self.stats[llm.provider]
+            stats['wins'] += 1
+            stats['hedged_wins'] += int(hedged)
+            stats['latency'] += latency
+        if self.stats_path is None:
+            return
+        line = json.dumps({'time': time.time(), 'winner': llm.provider, 'model': llm.model,
+                           'latency': round(latency, 3), 'hedged': hedged, 'delay': self.delay})
+        try:
+            os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+            # One short O_APPEND write per record, so concurrent writers don't interleave
+            with open(self.stats_path, 'a') as f:
+                f.write(line + '\n')
+                size = f.tell()
+            if size > MAX_STATS_BYTES:
+                os.replace(self.stats_path, self.stats_path + '.1')
+        except OSError:
+            pass
+
+
+def _close(generator):
+    if generator is not None:
+        generator.close()
+
+def summarize_stats(stats_path=DEFAULT_STATS_PATH):
+    """
+    Aggregate the stats file into per-provider win counts and latency percentiles.
+
+    The rotated `.1` backup is read too. Returns {'requests': n, 'hedged': n,
+    'providers': {provider: {'wins', 'hedged_wins', 'mean', 'p50', 'p95'}}};
+    latencies are in seconds.
+    """
+    latencies = {}
+    hedged_wins = {}
+    requests = hedged = 0
+    stats_path = os.path.expanduser(stats_path)
+    lines = []
+    for path in (stats_path + '.1', stats_path):
+        try:
+            with open(path) as f:
+                lines.extend(f.read().splitlines())
+        except OSError:
+            pass
+    for line in lines:
+        try:
+            record = json.loads(line)
+            provider, latency = record['winner'], float(record['latency'])
+        except (ValueError, KeyError, TypeError):
+            continue
+        requests += 1
+        hedged += bool(record.get('hedged'))
+        latencies.setdefault(provider, []).append(latency)
+        hedged_wins[provider] = hedged_wins.get(provider, 0) + bool(record.get('hedged'))
+
+    providers = {}
+    for provider, values in latencies.items():
+        values.sort()
+        providers[provider] = {
+            'wins': len(values),
+            'hedged_wins': hedged_wins[provider],
+            'mean': sum(values) / len(values),
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+        }
+    return {'requests': requests, 'hedged': hedged, 'providers': providers}
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
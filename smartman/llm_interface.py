@@ -1,26 +1,213 @@
 import os
-import requests
+import sys
 import json
-from typing import Optional, Dict, Any
+import functools
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator, AsyncIterator, TYPE_CHECKING
 
-# Import official clients when available
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+if TYPE_CHECKING:
+    import httpx
+    import requests
 
-try:
-    import anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
+# Official clients are used when installed. They (and requests) are only
+# imported on first use so that cache hits and `smartman help` stay fast;
+# likewise asyncio, which only AsyncLLMInterface needs.
+OPENAI_AVAILABLE = find_spec("openai") is not None
+ANTHROPIC_AVAILABLE = find_spec("anthropic") is not None
+# Async HTTP client for AsyncLLMInterface's direct API calls; without it they
+# run the pooled requests session on the default executor instead
+HTTPX_AVAILABLE = find_spec("httpx") is not None
 
 # Modify llm_interface.py to use caching
+from smartman import profiling
 from smartman.cache import ResponseCache
+from smartman.man_retriever import build_prompt_context, split_man_page, estimate_tokens, DEFAULT_TOKEN_BUDGET
+
+# Bump whenever a template below changes so stale cached answers are not reused
+PROMPT_VERSION = 3
+
+# Lines separating the two parts of a `describe` answer
+SUMMARY_MARKER = "[SUMMARY]"
+EXAMPLES_MARKER = "[EXAMPLES]"
+# Actions answered together by describe, in the order of their parts
+DESCRIPTION_ACTIONS = ('summary', 'example')
+_DESCRIPTION_PARTS = (f"in two parts. First write the line {SUMMARY_MARKER} followed by a concise summary "
+                      f"highlighting its core functionality, main options, and typical use cases. Then write the "
+                      f"line {EXAMPLES_MARKER} followed by 3-5 practical, real-world usage examples with "
+                      f"explanations, including both simple and advanced use cases.")
+
+# Instructions for man page text. They follow the page, so that a summary and
+# examples of the same page share a prompt prefix the provider can cache.
+DOCUMENT_INSTRUCTIONS = {
+    'summary': "Summarize the man page above concisely highlighting its core functionality, main options, and typical use cases.",
+    'example': "Based on the man page above, provide 3-5 practical, real-world usage examples with explanations. Include both simple and advanced use cases.",
+    'chunk': "The text above is one part of a longer man page. Write concise notes on the functionality, options and usage examples it describes, keeping exact option names and command syntax.",
+    'describe': "Describe the man page above " + _DESCRIPTION_PARTS,
+}
+
+# Reduce step of chunked mode: combine the per-chunk notes into the final answer
+REDUCE_INSTRUCTIONS = {
+    'summary': "The notes above cover consecutive parts of one man page. Combine them into a concise summary highlighting its core functionality, main options, and typical use cases.",
+    'example': "The notes above cover consecutive parts of one man page. Based on them, provide 3-5 practical, real-world usage examples with explanations. Include both simple and advanced use cases.",
+    'describe': "The notes above cover consecutive parts of one man page. Describe the page " + _DESCRIPTION_PARTS,
+}
+
+# Separates the man page (or notes) from the instruction that follows it
+INSTRUCTION_SEPARATOR = "\n\n---\n\n"
+
+PROMPT_TEMPLATES = {
+    'summary': "{text}" + INSTRUCTION_SEPARATOR + DOCUMENT_INSTRUCTIONS['summary'],
+    'example': "{text}" + INSTRUCTION_SEPARATOR + DOCUMENT_INSTRUCTIONS['example'],
+    'generate': "Generate the most appropriate command line syntax for this intent. Include a brief explanation of what each part does:\n\n{text}",
+    'chunk': "{text}" + INSTRUCTION_SEPARATOR + DOCUMENT_INSTRUCTIONS['chunk'],
+}
+
+REDUCE_TEMPLATES = {action: "{text}" + INSTRUCTION_SEPARATOR + instruction
+                    for action, instruction in REDUCE_INSTRUCTIONS.items()}
+
+# Intent for `generate` with man page excerpts found by the local index
+REFERENCE_TEMPLATE = "{intent}\n\nRelevant excerpts from the man pages installed on this system (prefer the options they list):\n{references}"
+
+CHUNKED_MODES = ('auto', 'always', 'never')
+
+# Every cacheable action; describe's combined answer is cached too, besides its parts
+ACTIONS = (*PROMPT_TEMPLATES, 'describe')
+
+SYSTEM_PROMPT = "You are a helpful CLI assistant that explains man pages and generates commands."
+
+# Environment variable holding each provider's API key
+API_KEY_ENV = {"openai": "OPENAI_API_KEY", "anthropic": "ANTH_API_KEY"}
+
+# API root of each provider, in the form its SDK's base_url takes, and the
+# endpoint under it that the requests fallback posts to
+DEFAULT_BASE_URLS = {"openai": "https://api.openai.com/v1", "anthropic": "https://api.anthropic.com",
+                     "custom": "https://api.example.com/v1"}
+ENDPOINT_PATHS = {"openai": "/chat/completions", "anthropic": "/v1/messages", "custom": "/completions"}
+
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server-side failures
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 429})
+# SDK and httpx exception classes (by name, so the libraries stay lazily imported) for
+# requests that never got an answer: connection failures and timeouts
+TRANSIENT_ERROR_NAMES = frozenset({"APIConnectionError", "TransportError"})
+
+
+class LLMAPIError(Exception):
+    """
+    An error returned by (or on the way to) an LLM provider.
+
+    Attributes:
+        provider: The provider the request was sent to
+        status_code: HTTP status of the failed response, or None if there was none
+        transient: Whether the same request may succeed if retried
+    """
+
+    def __init__(self, message: str, provider: Optional[str] = None, status_code: Optional[int] = None,
+                 transient: Optional[bool] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        if transient is None:
+            transient = status_code is not None and (status_code in TRANSIENT_STATUS_CODES or status_code >= 500)
+        self.transient = transient
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed provider call is worth retrying (429, 5xx, timeouts, dropped connections)."""
+    if isinstance(error, LLMAPIError):
+        return error.transient
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in TRANSIENT_STATUS_CODES or status_code >= 500
+    # requests' Timeout and ConnectionError are OSErrors
+    if isinstance(error, OSError):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def build_prompt(action: str, text: str) -> str:
+    """Fill in the prompt template for an action."""
+    return PROMPT_TEMPLATES[action].format(text=text)
+
+def split_prompt(prompt: str) -> Tuple[Optional[str], str]:
+    """
+    Split a man page prompt into (document, instruction).
+
+    The document is the part shared between requests for the same page;
+    prompts without one (generate) come back as (None, prompt).
+    """
+    for instruction in (*DOCUMENT_INSTRUCTIONS.values(), *REDUCE_INSTRUCTIONS.values()):
+        if prompt.endswith(INSTRUCTION_SEPARATOR + instruction):
+            return prompt[:-len(INSTRUCTION_SEPARATOR + instruction)], instruction
+    return None, prompt
+
+def description_prompt(summary_prompt: str) -> str:
+    """The prompt asking for summary and examples at once, built on the same page (or notes) as a summary prompt."""
+    document, instruction = split_prompt(summary_prompt)
+    describe = (REDUCE_INSTRUCTIONS if instruction == REDUCE_INSTRUCTIONS['summary'] else DOCUMENT_INSTRUCTIONS)['describe']
+    return document + INSTRUCTION_SEPARATOR + describe
+
+def split_description(text: str) -> Tuple[str, str]:
+    """
+    Split a `describe` answer into (summary, examples).
+
+    Works on a partly streamed answer too: examples is "" until the
+    examples marker has arrived, and a marker cut off mid-stream is hidden.
+    """
+    text = text.lstrip()
+    if text.startswith(SUMMARY_MARKER):
+        text = text[len(SUMMARY_MARKER):]
+    elif SUMMARY_MARKER.startswith(text):
+        return "", ""
+    summary, found, examples = text.partition(EXAMPLES_MARKER)
+    if not found:
+        for length in range(len(EXAMPLES_MARKER) - 1, 0, -1):
+            if summary.endswith(EXAMPLES_MARKER[:length]):
+                summary = summary[:-length]
+                break
+    return summary.strip(), examples.strip()
+
+def format_description(summary: str, examples: str) -> str:
+    """Join a summary and examples into the form of a `describe` answer."""
+    return f"{SUMMARY_MARKER}\n{summary}\n\n{EXAMPLES_MARKER}\n{examples}"
+
+def usage_counts(provider: str, usage: Any) -> Dict[str, int]:
+    """
+    Token counts from the usage block of an API response (a dict or SDK object).
+
+    "input" includes the "cached input" read from the provider's prompt cache
+    and, for Anthropic, the "cache write" tokens added to it.
+    """
+    if hasattr(usage, "model_dump"):
+        usage = usage.model_dump()
+    if not isinstance(usage, dict):
+        return {}
+    if provider == "anthropic":
+        cached = usage.get("cache_read_input_tokens") or 0
+        written = usage.get("cache_creation_input_tokens") or 0
+        return {"input tokens": (usage.get("input_tokens") or 0) + cached + written,
+                "cached input tokens": cached, "cache write tokens": written,
+                "output tokens": usage.get("output_tokens") or 0}
+    details = usage.get("prompt_tokens_details") or {}
+    return {"input tokens": usage.get("prompt_tokens") or 0,
+            "cached input tokens": details.get("cached_tokens") or 0,
+            "output tokens": usage.get("completion_tokens") or 0}
 
 class LLMInterface:
-    def __init__(self, api_key: Optional[str] = None, provider: Optional[str] = None, model: Optional[str] = None, use_cache: bool = True):
+    def __init__(self, api_key: Optional[str] = None, provider: Optional[str] = None, model: Optional[str] = None, use_cache: bool = True,
+                 pool_size: int = 10, connect_timeout: float = 10.0, read_timeout: float = 120.0,
+                 cache_options: Optional[Dict[str, Any]] = None, cache_actions: Optional[Iterable[str]] = None,
+                 temperature: float = 0.2, max_tokens: int = 500,
+                 context_token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+                 chunked: str = "auto", chunk_tokens: int = 3000, max_parallel_chunks: int = 4,
+                 coalesce_timeout: float = 120.0, hedge_delay: Optional[float] = None,
+                 hedge_model: Optional[str] = None, routes: Optional[List[Dict[str, str]]] = None,
+                 routing_options: Optional[Dict[str, Any]] = None, similarity_threshold: Optional[float] = 0.9,
+                 reference_snippets: int = 0, man_index_path: str = '~/.smartman/man_index.db',
+                 base_url: Optional[str] = None):
         """
         Initialize the LLM interface with an API key, provider, and model.
         If api_key is not provided, will look for OPENAI_API_KEY or ANTH_API_KEY in environment.
@@ -30,6 +217,33 @@ class LLMInterface:
             provider: "openai", "anthropic", or "custom" (optional if env vars are set)
             model: API-specific model name. If None, uses provider-specific defaults
             use_cache: Whether to cache responses
+            pool_size: Maximum number of pooled keep-alive connections per host
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of a response
+            cache_options: Keyword arguments for ResponseCache (backend, ttl_hours, size limits)
+            cache_actions: Actions whose responses are cached ("summary", "example", "generate"); defaults to all
+            temperature: Sampling temperature sent to the provider
+            max_tokens: Maximum number of tokens in a response
+            context_token_budget: Approximate token budget for man page text in a prompt; None sends the full page
+            chunked: "auto" (map-reduce pages larger than the token budget), "always" or "never"
+            chunk_tokens: Approximate size of each man page chunk in chunked mode
+            max_parallel_chunks: Maximum number of chunk requests in flight at once
+            coalesce_timeout: Seconds to wait for another thread or process making the identical
+                request before making it anyway
+            hedge_delay: If set and keys for both OpenAI and Anthropic are in the environment, send the
+                request to the other provider too when this one has not answered within this many seconds
+            hedge_model: Model for the hedge provider. If None, uses its default
+            routes: Extra backends ({"provider", "model", optional "api_key" and "base_url"}) to route requests
+                between, together with this one, by measured latency and health, failing over on errors.
+                Keys default to this interface's key for its own provider, else OPENAI_API_KEY/ANTH_API_KEY
+            routing_options: Keyword arguments for Router (retries, backoff, failure_threshold, cooldown)
+            similarity_threshold: Minimum similarity (0-1) of a new intent to a previously answered one for
+                generate_command to reuse its cached command; None only reuses exact matches
+            reference_snippets: Number of option snippets from the local man page index (built by
+                `smartman index`) attached to generate prompts; 0 disables
+            man_index_path: Path of the man page index
+            base_url: API root to send requests to instead of the provider's, e.g. a proxy or
+                "http://localhost:8000/v1" for OpenAI (with /v1) or "http://localhost:8000" for Anthropic
         """
         # Auto-detect provider and API key if not explicitly provided
         if api_key is None:
@@ -66,58 +280,482 @@ class LLMInterface:
             self.model = model
             
         print(f"Using {self.provider} with model {self.model}")
+
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._client = None
+        self._session = None
+        # Chunk requests run on worker threads that may race to build the client
+        self._connect_lock = threading.Lock()
             
-        # Initialize clients based on provider
+        # Select the transport based on provider; SDK clients are built lazily
+        self.base_url = base_url.rstrip("/") if base_url else None
+        api = self.provider if self.provider in ("openai", "anthropic") else "custom"
+        self.api_url = (self.base_url or DEFAULT_BASE_URLS[api]) + ENDPOINT_PATHS[api]
         if self.provider == "openai":
-            if OPENAI_AVAILABLE:
-                self.client = openai.OpenAI(api_key=self.api_key)
-            else:
-                self.api_url = "https://api.openai.com/v1/chat/completions"
-                print("Warning: OpenAI Python library not installed. Using requests instead.")
+            if not OPENAI_AVAILABLE:
+                print("Warning: OpenAI Python library not installed. Using requests instead.", file=sys.stderr)
         
         elif self.provider == "anthropic":
-            if ANTHROPIC_AVAILABLE:
-                self.client = anthropic.Anthropic(api_key=self.api_key)
-            else:
-                self.api_url = "https://api.anthropic.com/v1/messages"
-                print("Warning: Anthropic Python library not installed. Using requests instead.")
-        
-        else:
-            # Custom provider
-            self.api_url = "https://api.example.com/v1/completions"
+            if not ANTHROPIC_AVAILABLE:
+                print("Warning: Anthropic Python library not installed. Using requests instead.", file=sys.stderr)
+
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.context_token_budget = context_token_budget
+
+        if chunked not in CHUNKED_MODES:
+            raise ValueError(f"Unknown chunked mode: {chunked}")
+        self.chunked = chunked
+        self.chunk_tokens = chunk_tokens
+        self.max_parallel_chunks = max_parallel_chunks
+        self.coalesce_timeout = coalesce_timeout
+
+        self.router = None
+        if routes is not None:
+            self.router = self._build_router(routes, routing_options or {})
+
+        self.hedger = None
+        if hedge_delay is not None and self.router is not None:
+            print("Warning: Hedging is not combined with routing. Hedging disabled.", file=sys.stderr)
+        elif hedge_delay is not None:
+            self.hedger = self._build_hedger(hedge_delay, hedge_model)
 
         self.use_cache = use_cache
+        self.cache_actions = set(ACTIONS if cache_actions is None else cache_actions)
         if self.use_cache:
-            self.cache = ResponseCache()
+            self.cache = ResponseCache(**(cache_options or {}))
+        self.similarity_threshold = similarity_threshold
+        self._intents = None
+        self.reference_snippets = reference_snippets
+        self.man_index_path = os.path.expanduser(man_index_path)
+        self._man_index = None
+
+    def _build_hedger(self, delay: float, model: Optional[str]):
+        """Create the Hedger racing this interface against the other provider, if it has a key."""
+        from smartman.hedging import Hedger
+
+        other = {"openai": "anthropic", "anthropic": "openai"}.get(self.provider)
+        api_key = os.environ.get(API_KEY_ENV[other]) if other else None
+        if not api_key:
+            print("Warning: Hedging needs both OPENAI_API_KEY and ANTH_API_KEY set. Hedging disabled.", file=sys.stderr)
+            return None
+        secondary = type(self)(api_key=api_key, provider=other, model=model, use_cache=False,
+                               pool_size=self.pool_size, connect_timeout=self.connect_timeout,
+                               read_timeout=self.read_timeout, temperature=self.temperature,
+                               max_tokens=self.max_tokens)
+        return Hedger(self, secondary, delay)
+
+    def _build_router(self, routes: List[Dict[str, str]], options: Dict[str, Any]):
+        """Create the Router over this interface and the configured extra backends that have a key."""
+        from smartman.routing import Router, backend_key
+
+        backends = [self]
+        for route in routes:
+            provider = (route.get("provider") or self.provider).lower()
+            api_key = route.get("api_key") or (self.api_key if provider == self.provider
+                                               else os.environ.get(API_KEY_ENV.get(provider, "")))
+            if not api_key:
+                print(f"Warning: No API key for {provider}. Skipping its route.", file=sys.stderr)
+                continue
+            backend = type(self)(api_key=api_key, provider=provider, model=route.get("model"),
+                                 base_url=route.get("base_url"), use_cache=False,
+                                 pool_size=self.pool_size, connect_timeout=self.connect_timeout,
+                                 read_timeout=self.read_timeout, temperature=self.temperature,
+                                 max_tokens=self.max_tokens)
+            if backend_key(backend) not in map(backend_key, backends):
+                backends.append(backend)
+        return Router(backends, **options)
+
+    def _extra_backends(self) -> List["LLMInterface"]:
+        """The other interfaces this one sends requests through when routing or hedging."""
+        if self.router is not None:
+            return [llm for llm in self.router.backends if llm is not self]
+        if self.hedger is not None:
+            return [self.hedger.secondary]
+        return []
+
+    @property
+    def client(self):
+        """Official SDK client for the provider, constructed on first use."""
+        with self._connect_lock, profiling.phase('client setup'):
+            if self._client is None:
+                if self.provider == "openai" and OPENAI_AVAILABLE:
+                    import openai
+                    self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                                 timeout=self._sdk_timeout())
+                elif self.provider == "anthropic" and ANTHROPIC_AVAILABLE:
+                    import anthropic
+                    self._client = anthropic.Anthropic(api_key=self.api_key, base_url=self.base_url,
+                                                       timeout=self._sdk_timeout())
+        return self._client
+
+    def _sdk_timeout(self) -> "httpx.Timeout":
+        """Connect and read timeouts for the SDK clients (both are built on httpx)."""
+        import httpx
+
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    @property
+    def intents(self):
+        """Similarity index of answered generate intents, opened on first use."""
+        with self._connect_lock:
+            if self._intents is None:
+                from smartman.similarity import SimilarityIndex
+
+                self._intents = SimilarityIndex(os.path.join(self.cache.cache_dir, 'intents.db'),
+                                                self.similarity_threshold, self.cache.ttl.total_seconds())
+        return self._intents
+
+    @property
+    def man_index(self):
+        """The local man page index, opened on first use; None if it hasn't been built."""
+        with self._connect_lock:
+            if self._man_index is None and os.path.exists(self.man_index_path):
+                from smartman.man_index import ManIndex
+
+                try:
+                    self._man_index = ManIndex(self.man_index_path)
+                except RuntimeError as e:
+                    print(f"Warning: {e}", file=sys.stderr)
+                    self.reference_snippets = 0
+        return self._man_index
+
+    @property
+    def session(self) -> "requests.Session":
+        """Pooled keep-alive HTTP session shared by all requests-based provider paths."""
+        with self._connect_lock, profiling.phase('client setup'):
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+        return self._session
+
+    def close(self) -> None:
+        """Release pooled connections held by the HTTP session and SDK client."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._client is not None and hasattr(self._client, "close"):
+            self._client.close()
+            self._client = None
+        if self._intents is not None:
+            self._intents.close()
+            self._intents = None
+        if self._man_index is not None:
+            self._man_index.close()
+            self._man_index = None
+        for llm in self._extra_backends():
+            llm.close()
+
+    def __enter__(self) -> "LLMInterface":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
     def generate_summary(self, man_text: str) -> str:
         """Generate a concise summary of the given man page."""
-        prompt = f"Summarize this man page concisely highlighting its core functionality, main options, and typical use cases:\n\n{man_text}"
-        
-        if self.use_cache:
-            cached = self.cache.get_cached_response(man_text, 'summary')
-            if cached:
-                return cached
-                
-        result = self._send_request(prompt)
-        
-        if self.use_cache:
-            self.cache.cache_response(man_text, 'summary', result)
-            
-        return result
+        return self._send_request(self.document_prompt('summary', man_text), action='summary')
 
     def generate_example(self, man_text: str) -> str:
         """Generate practical usage examples based on the man page."""
-        prompt = f"Based on this man page, provide 3-5 practical, real-world usage examples with explanations. Include both simple and advanced use cases:\n\n{man_text}"
-        return self._send_request(prompt)
+        return self._send_request(self.document_prompt('example', man_text), action='example')
 
     def generate_command(self, intent: str) -> str:
         """Generate a command based on the user's natural language intent."""
-        prompt = f"Generate the most appropriate command line syntax for this intent. Include a brief explanation of what each part does:\n\n{intent}"
-        return self._send_request(prompt)
+        similar = self.similar_command(intent)
+        if similar is not None:
+            return similar
+        command = self._send_request(self.prompt_for('generate', intent), action='generate')
+        self.remember_command(intent, command)
+        return command
+
+    def stream_summary(self, man_text: str) -> Iterator[str]:
+        """Stream a concise summary of the given man page chunk by chunk."""
+        return self._stream_request(self.document_prompt('summary', man_text), action='summary')
+
+    def stream_example(self, man_text: str) -> Iterator[str]:
+        """Stream practical usage examples based on the man page."""
+        return self._stream_request(self.document_prompt('example', man_text), action='example')
+
+    def stream_command(self, intent: str) -> Iterator[str]:
+        """Stream a command generated from the user's natural language intent."""
+        similar = self.similar_command(intent)
+        if similar is not None:
+            yield similar
+            return
+        chunks = []
+        for chunk in self._stream_request(self.prompt_for('generate', intent), action='generate'):
+            chunks.append(chunk)
+            yield chunk
+        self.remember_command(intent, "".join(chunks))
+
+    def generate_description(self, man_text: str) -> str:
+        """
+        Generate a summary and usage examples of the man page with one request.
+
+        The answer holds both parts (see split_description), and each is
+        cached under the key of the corresponding single-action request, so
+        a later summary or example of the page is a cache hit. Parts already
+        cached are not asked for again.
+        """
+        prompts = {action: self.document_prompt(action, man_text) for action in DESCRIPTION_ACTIONS}
+        parts = {action: self.get_cached(action, prompts[action]) for action in DESCRIPTION_ACTIONS}
+        missing = [action for action in DESCRIPTION_ACTIONS if not parts[action]]
+        if len(missing) == 2:
+            text = self._send_request(description_prompt(prompts['summary']), action='describe')
+            if self.remember_description(prompts, text):
+                return text
+        # One part is cached, or the answer could not be split: ask for each remaining part on its own
+        for action in missing:
+            parts[action] = self._send_request(prompts[action], action=action)
+        return format_description(parts['summary'], parts['example'])
 
-    def _send_request(self, prompt: str) -> str:
-        """Send request to the LLM API and return the response text."""
+    def stream_description(self, man_text: str) -> Iterator[str]:
+        """Stream a summary and usage examples of the man page from one request (see generate_description)."""
+        prompts = {action: self.document_prompt(action, man_text) for action in DESCRIPTION_ACTIONS}
+        parts = {action: self.get_cached(action, prompts[action]) for action in DESCRIPTION_ACTIONS}
+        if not any(parts.values()):
+            chunks = []
+            for chunk in self._stream_request(description_prompt(prompts['summary']), action='describe'):
+                chunks.append(chunk)
+                yield chunk
+            # Only reached when the stream ran to completion
+            self.remember_description(prompts, "".join(chunks))
+            return
+        for action, marker in zip(DESCRIPTION_ACTIONS, (SUMMARY_MARKER, EXAMPLES_MARKER)):
+            yield f"{marker}\n" if action == 'summary' else f"\n\n{marker}\n"
+            if parts[action]:
+                yield parts[action]
+            else:
+                yield from self._stream_request(prompts[action], action=action)
+
+    def remember_description(self, prompts: Dict[str, str], text: str) -> bool:
+        """Cache both parts of a `describe` answer under their single-action prompts; False if it has no examples part."""
+        summary, examples = split_description(text)
+        if not (summary and examples):
+            return False
+        self.set_cached('summary', prompts['summary'], summary)
+        self.set_cached('example', prompts['example'], examples)
+        return True
+
+    @profiling.timed('cache')
+    def similar_command(self, intent: str) -> Optional[str]:
+        """Return the cached command of a previously answered intent similar enough to this one, or None."""
+        if self.similarity_threshold is None or not self._caches('generate'):
+            return None
+        return self.intents.lookup(self._intent_scope(), intent)
+
+    @profiling.timed('cache')
+    def remember_command(self, intent: str, command: str) -> None:
+        """Index an answered intent so similar ones can reuse its command."""
+        if self.similarity_threshold is not None and self._caches('generate'):
+            self.intents.add(self._intent_scope(), intent, command)
+
+    def _intent_scope(self) -> str:
+        """Commands are only reused under the provider, model and settings that produced them."""
+        return self.cache.get_cache_key(self._cache_text(PROMPT_TEMPLATES['generate']))
+
+    def prompt_for(self, action: str, text: str) -> str:
+        """
+        Build the exact prompt sent for an action.
+
+        Man page text is condensed to the token budget; a generate intent
+        gets the most relevant snippets from the local man page index, if any.
+        """
+        if action == 'generate':
+            references = self.references_for(text)
+            if references:
+                text = REFERENCE_TEMPLATE.format(intent=text, references=references)
+        elif self.context_token_budget:
+            text = build_prompt_context(text, self.context_token_budget)
+        return build_prompt(action, text)
+
+    def references_for(self, intent: str) -> str:
+        """The man page snippets most relevant to an intent, as prompt text ("" if none)."""
+        if self.reference_snippets <= 0 or self.man_index is None:
+            return ""
+        from smartman.man_index import format_snippets
+
+        return format_snippets(self.man_index.search(intent, self.reference_snippets))
+
+    def document_prompt(self, action: str, man_text: str) -> str:
+        """
+        Build the prompt for a man page action, map-reducing pages too large for one request.
+
+        In chunked mode the page is split along section boundaries, every
+        chunk is turned into notes concurrently (at most max_parallel_chunks
+        requests in flight), and the returned prompt asks for the final answer
+        from the combined notes. Chunk notes are cached by chunk content and
+        shared between summaries and examples of the same page.
+        """
+        chunks = self._chunks_for(man_text)
+        if chunks is None:
+            return self.prompt_for(action, man_text)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallel_chunks, len(chunks)))) as executor:
+            notes = list(executor.map(
+                lambda chunk: self._send_request(build_prompt('chunk', chunk), action='chunk'), chunks))
+        return self._reduce_prompt(action, notes)
+
+    def _chunks_for(self, man_text: str) -> Optional[List[str]]:
+        """The chunks to map over in chunked mode, or None when one prompt suffices."""
+        if not self.should_chunk(man_text):
+            return None
+        chunks = split_man_page(man_text, self.chunk_tokens)
+        return chunks if len(chunks) > 1 else None
+
+    def _reduce_prompt(self, action: str, notes: List[str]) -> str:
+        """Prompt asking for the final answer from the notes on every chunk."""
+        combined = "\n\n".join(f"Part {index} of {len(notes)}:\n{note}" for index, note in enumerate(notes, 1))
+        return REDUCE_TEMPLATES[action].format(text=combined)
+
+    def should_chunk(self, man_text: str) -> bool:
+        """
+        Whether man_text is answered in chunked mode rather than from one condensed prompt.
+
+        In "auto" mode a page is chunked as soon as its condensed text exceeds
+        the token budget, i.e. whenever a single prompt would have to trim it,
+        however far the page is below the model's context window.
+        """
+        if self.chunked == "never":
+            return False
+        if self.chunked == "always":
+            return True
+        if not self.context_token_budget:
+            return False
+        return estimate_tokens(build_prompt_context(man_text, None)) > self.context_token_budget
+
+    def get_cached(self, action: str, prompt: str) -> Optional[str]:
+        """Return the cached response for this prompt, or None if absent or caching is off for the action."""
+        if not self._caches(action):
+            return None
+        return self.cache.get_cached_response(self._cache_text(prompt), action)
+
+    def set_cached(self, action: str, prompt: str, response: str) -> None:
+        """Store a response for this prompt if caching is enabled for the action."""
+        if self._caches(action) and response:
+            self.cache.cache_response(self._cache_text(prompt), action, response)
+
+    def index_answer(self, index_text: str, action: str, man_text: str) -> None:
+        """
+        Make the cached answer to a man page action reachable through index_text.
+
+        The CLI indexes answers by the file the page was rendered from and
+        its settings, so a later hit is served without building the prompt
+        or an LLMInterface (see ResponseCache.link).
+        """
+        if not self._caches(action):
+            return
+        if self._chunks_for(man_text) is not None and not self._caches('chunk'):
+            # The prompt of a chunked page can't be rebuilt without requesting the notes again
+            return
+        self.cache.link(index_text, self._cache_text(self.document_prompt(action, man_text)), action)
+
+    def _caches(self, action: Optional[str]) -> bool:
+        return self.use_cache and action is not None and action in self.cache_actions
+
+    def _cache_text(self, prompt: str) -> str:
+        """
+        Material the cache key is derived from.
+
+        Includes everything that changes the answer, so switching provider or
+        model, tuning sampling, or editing a prompt template never returns a
+        response produced under different settings.
+        """
+        material = {
+            "provider": self.provider,
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "prompt_version": PROMPT_VERSION,
+            "prompt": prompt,
+        }
+        if self.base_url is not None:
+            # A proxy or self-hosted endpoint may serve something else under the same model name
+            material["base_url"] = self.base_url
+        if self.hedger is not None:
+            # Hedged answers may come from the other provider, so they get their own keys
+            material["hedge"] = [self.hedger.secondary.provider, self.hedger.secondary.model]
+        if self.router is not None and len(self.router.backends) > 1:
+            # Likewise for routed answers
+            material["routes"] = [[llm.provider, llm.model] for llm in self.router.backends]
+        return json.dumps(material, sort_keys=True)
+
+    def _coalesced(self, action: Optional[str], prompt: str):
+        """
+        Single-flight guard for a cacheable request.
+
+        Identical requests from other threads or processes wait here until
+        the first one has cached its answer, so only one of them is paid for.
+        """
+        if not self._caches(action):
+            return contextlib.nullcontext()
+        return self.cache.coalesce(self._cache_text(prompt), action, self.coalesce_timeout)
+
+    @profiling.timed('llm request')
+    def _send_request(self, prompt: str, action: Optional[str] = None) -> str:
+        """Send request to the LLM API and return the response text, consulting the cache for the action."""
+        cached = self.get_cached(action, prompt)
+        if cached:
+            return cached
+
+        with self._coalesced(action, prompt):
+            # Answered by another thread or process while we waited
+            cached = self.get_cached(action, prompt)
+            if cached:
+                return cached
+
+            result = self._call_provider(prompt)
+            self.set_cached(action, prompt, result)
+            return result
+
+    def _stream_request(self, prompt: str, action: Optional[str] = None) -> Iterator[str]:
+        """Stream the response text chunk by chunk, consulting the cache for the action."""
+        cached = self.get_cached(action, prompt)
+        if cached:
+            yield cached
+            return
+
+        with self._coalesced(action, prompt):
+            cached = self.get_cached(action, prompt)
+            if cached:
+                yield cached
+                return
+
+            chunks = []
+            for chunk in self._stream_provider(prompt):
+                chunks.append(chunk)
+                yield chunk
+
+            # Only reached when the stream ran to completion
+            self.set_cached(action, prompt, "".join(chunks))
+
+    def _call_provider(self, prompt: str) -> str:
+        """Send request to the configured provider (routed or hedged, if enabled) and return the response text."""
+        if self.router is not None:
+            return self.router.call(prompt)
+        if self.hedger is not None:
+            return self.hedger.call(prompt)
+        return self._call_direct(prompt)
+
+    def _stream_provider(self, prompt: str) -> Iterator[str]:
+        """Send a streaming request to the configured provider (routed or hedged, if enabled) and yield text chunks."""
+        if self.router is not None:
+            return self.router.stream(prompt)
+        if self.hedger is not None:
+            return self.hedger.stream(prompt)
+        return self._stream_direct(prompt)
+
+    def _call_direct(self, prompt: str) -> str:
+        """Send request to this interface's provider and return the response text."""
         if self.provider == "openai":
             return self._call_openai(prompt)
         elif self.provider == "anthropic":
@@ -125,96 +763,205 @@ class LLMInterface:
         else:
             return self._call_custom_api(prompt)
 
-    def _call_openai(self, prompt: str) -> str:
-        """Call OpenAI API using either the official client or requests."""
-        if OPENAI_AVAILABLE:
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful CLI assistant that explains man pages and generates commands."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.2,
-                    max_tokens=500
-                )
-                return response.choices[0].message.content
-            except Exception as e:
-                raise Exception(f"OpenAI API error: {str(e)}")
+    def _stream_direct(self, prompt: str) -> Iterator[str]:
+        """Send a streaming request to this interface's provider and yield text chunks as they arrive."""
+        if self.provider == "openai":
+            return self._stream_openai(prompt)
+        elif self.provider == "anthropic":
+            return self._stream_anthropic(prompt)
+        else:
+            # The custom endpoint has no streaming protocol; emit the whole answer at once
+            return iter([self._call_custom_api(prompt)])
+
+    def _sdk_request(self, prompt: str) -> Dict[str, Any]:
+        """
+        Keyword arguments for the official SDK's create call.
+
+        Man page prompts start with the page, so OpenAI's automatic prompt
+        caching can reuse it between actions; for Anthropic the page is a
+        separate content block ending in a cache breakpoint.
+        """
+        if self.provider == "anthropic":
+            document, instruction = split_prompt(prompt)
+            content = prompt if document is None else [
+                {"type": "text", "text": document, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": instruction},
+            ]
+            return {
+                "model": self.model,
+                "system": SYSTEM_PROMPT,
+                "max_tokens": self.max_tokens,
+                "messages": [{"role": "user", "content": content}],
+            }
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+
+    def _fallback_request(self, prompt: str, stream: bool = False):
+        """Headers and JSON payload for calling the provider's HTTP API directly."""
+        if self.provider == "anthropic":
+            headers = {
+                "x-api-key": self.api_key,
+                "anthropic-version": "2023-06-01",
+                "content-type": "application/json"
+            }
+            data = self._sdk_request(prompt)
+        elif self.provider == "openai":
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+            data = self._sdk_request(prompt)
         else:
-            # Fallback to requests
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
             }
             data = {
                 "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful CLI assistant that explains man pages and generates commands."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.2,
-                "max_tokens": 500
+                "prompt": prompt,
+                "max_tokens": self.max_tokens
             }
-            
-            response = requests.post(self.api_url, headers=headers, json=data)
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
-            else:
-                self._handle_error(response)
+        if stream:
+            data["stream"] = True
+            if self.provider == "openai":
+                data["stream_options"] = {"include_usage": True}
+        return headers, data
+
+    def _fallback_text(self, response) -> str:
+        """Extract the answer from a direct HTTP API response, raising on error statuses."""
+        if response.status_code != 200:
+            self._handle_error(response)
+        payload = response.json()
+        self.record_usage(payload.get("usage"))
+        if self.provider == "openai":
+            return payload["choices"][0]["message"]["content"]
+        elif self.provider == "anthropic":
+            return payload["content"][0]["text"]
+        # Custom API response handling
+        return payload.get("text", "")
+
+    def _call_openai(self, prompt: str) -> str:
+        """Call OpenAI API using either the official client or requests."""
+        if OPENAI_AVAILABLE:
+            try:
+                response = self.client.chat.completions.create(**self._sdk_request(prompt))
+                self.record_usage(response.usage)
+                return response.choices[0].message.content
+            except Exception as e:
+                raise self._api_error("OpenAI", e) from e
+        else:
+            # Fallback to requests
+            return self._fallback_text(self._post(*self._fallback_request(prompt)))
 
     def _call_anthropic(self, prompt: str) -> str:
         """Call Anthropic API using either the official client or requests."""
         if ANTHROPIC_AVAILABLE:
             try:
-                message = self.client.messages.create(
-                    model=self.model,
-                    system="You are a helpful CLI assistant that explains man pages and generates commands.",
-                    max_tokens=500,
-                    messages=[{"role": "user", "content": prompt}]
-                )
+                message = self.client.messages.create(**self._sdk_request(prompt))
+                self.record_usage(message.usage)
                 return message.content[0].text
             except Exception as e:
-                raise Exception(f"Anthropic API error: {str(e)}")
+                raise self._api_error("Anthropic", e) from e
         else:
             # Fallback to requests
-            headers = {
-                "x-api-key": self.api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            }
-            data = {
-                "model": self.model,
-                "system": "You are a helpful CLI assistant that explains man pages and generates commands.",
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 500
-            }
-            
-            response = requests.post(self.api_url, headers=headers, json=data)
-            if response.status_code == 200:
-                return response.json()["content"][0]["text"]
-            else:
+            return self._fallback_text(self._post(*self._fallback_request(prompt)))
+
+    def _stream_openai(self, prompt: str) -> Iterator[str]:
+        """Stream from the OpenAI API using either the official client or requests (SSE)."""
+        if OPENAI_AVAILABLE:
+            try:
+                stream = self.client.chat.completions.create(**self._sdk_request(prompt), stream=True,
+                                                             stream_options={"include_usage": True})
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None):
+                        self.record_usage(chunk.usage)
+            except Exception as e:
+                raise self._api_error("OpenAI", e) from e
+        else:
+            # Fallback to requests with server-sent events
+            yield from self._stream_fallback(prompt)
+
+    def _stream_anthropic(self, prompt: str) -> Iterator[str]:
+        """Stream from the Anthropic API using either the official client or requests (SSE)."""
+        if ANTHROPIC_AVAILABLE:
+            try:
+                with self.client.messages.stream(**self._sdk_request(prompt)) as stream:
+                    for text in stream.text_stream:
+                        yield text
+                    self.record_usage(stream.get_final_message().usage)
+            except Exception as e:
+                raise self._api_error("Anthropic", e) from e
+        else:
+            # Fallback to requests with server-sent events
+            yield from self._stream_fallback(prompt)
+
+    def _stream_fallback(self, prompt: str) -> Iterator[str]:
+        """Stream from the provider's HTTP API directly, over the pooled session (SSE)."""
+        response = self._post(*self._fallback_request(prompt, stream=True), stream=True)
+        usage = {}
+        with response:
+            if response.status_code != 200:
                 self._handle_error(response)
+            for event in _iter_sse(response):
+                text, finished = self._stream_event(event, usage)
+                if text:
+                    yield text
+                if finished:
+                    break
+        if usage:
+            self.record_usage(usage)
+
+    def _stream_event(self, event: str, usage: Dict[str, Any]) -> Tuple[Optional[str], bool]:
+        """
+        Parse one server-sent event of a streamed direct API response.
+
+        Returns (text delta or None, whether the stream is finished), adds any
+        token usage it reports to usage, and raises LLMAPIError on error events.
+        """
+        if self.provider == "openai":
+            if event == "[DONE]":
+                return None, True
+            payload = json.loads(event)
+            if payload.get("usage"):
+                usage.update(payload["usage"])
+            choices = payload.get("choices") or []
+            return (choices[0].get("delta", {}).get("content") if choices else None), False
+
+        payload = json.loads(event)
+        if payload.get("type") == "message_start":
+            usage.update(payload.get("message", {}).get("usage") or {})
+        elif payload.get("type") == "message_delta":
+            usage.update(payload.get("usage") or {})
+        elif payload.get("type") == "content_block_delta":
+            delta = payload.get("delta", {})
+            if delta.get("type") == "text_delta":
+                return delta.get("text", ""), False
+        elif payload.get("type") == "message_stop":
+            return None, True
+        elif payload.get("type") == "error":
+            error = payload.get("error", {})
+            message = error.get("message", "Unknown error")
+            raise LLMAPIError(f"LLM API error ({self.provider}): {message}", self.provider,
+                              transient=error.get("type") in ("overloaded_error", "api_error", "rate_limit_error"))
+        return None, False
 
     def _call_custom_api(self, prompt: str) -> str:
         """Call a custom LLM API endpoint."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "prompt": prompt,
-            "max_tokens": 500
-        }
-        
-        response = requests.post(self.api_url, headers=headers, json=data)
-        if response.status_code == 200:
-            # Custom API response handling
-            return response.json().get("text", "")
-        else:
-            self._handle_error(response)
+        return self._fallback_text(self._post(*self._fallback_request(prompt)))
+
+    def _post(self, headers: Dict[str, str], data: Dict[str, Any], stream: bool = False) -> "requests.Response":
+        """POST a JSON payload to the provider endpoint over the pooled session."""
+        return self.session.post(self.api_url, headers=headers, json=data, stream=stream,
+                                 timeout=(self.connect_timeout, self.read_timeout))
 
     def _handle_error(self, response) -> None:
         """Handle API error responses."""
@@ -224,4 +971,411 @@ class LLMInterface:
         except (ValueError, KeyError):
             error_message = f"HTTP error {response.status_code}: {response.text}"
             
-        raise Exception(f"LLM API error ({self.provider}): {error_message}")
\ No newline at end of file
+        raise LLMAPIError(f"LLM API error ({self.provider}): {error_message}", self.provider, response.status_code)
+
+    def record_usage(self, usage: Any) -> None:
+        """Add the token usage reported by the API, including prompt cache hits, to the --profile counters."""
+        if usage is not None and profiling.is_enabled():
+            for name, tokens in usage_counts(self.provider, usage).items():
+                profiling.count(name, tokens)
+
+    def _api_error(self, label: str, error: Exception) -> LLMAPIError:
+        """Wrap an SDK exception, keeping its status code and whether it is worth retrying."""
+        status_code = getattr(error, "status_code", None)
+        return LLMAPIError(f"{label} API error: {str(error)}", self.provider,
+                           status_code if isinstance(status_code, int) else None, is_transient(error))
+
+
+
+class AsyncLLMInterface(LLMInterface):
+    """
+    asyncio counterpart of LLMInterface.
+
+    Takes the same arguments and exposes the same generate_summary,
+    generate_example and generate_command surface as coroutines, so many
+    requests can be in flight on one event loop without a thread per call.
+    Provider calls use openai.AsyncOpenAI / anthropic.AsyncAnthropic, direct
+    HTTP calls use a pooled httpx.AsyncClient, and cache lookups and writes
+    run on the default executor so SQLite I/O never blocks the loop.
+    Requests are cached, coalesced and profiled as in LLMInterface, and the
+    stream_* methods are async generators yielding text as it arrives.
+
+    Close it with `await llm.aclose()` or use it as `async with`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._http = None
+        self._flights = {}  # (action, prompt) -> Future done when its request on this loop finished
+        super().__init__(*args, **kwargs)
+
+    @property
+    def client(self):
+        """Official async SDK client for the provider, constructed on first use."""
+        if self._client is None:
+            if self.provider == "openai" and OPENAI_AVAILABLE:
+                import openai
+                self._client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                                  timeout=self._sdk_timeout())
+            elif self.provider == "anthropic" and ANTHROPIC_AVAILABLE:
+                import anthropic
+                self._client = anthropic.AsyncAnthropic(api_key=self.api_key, base_url=self.base_url,
+                                                        timeout=self._sdk_timeout())
+        return self._client
+
+    @property
+    def http(self) -> "httpx.AsyncClient":
+        """Pooled async HTTP client shared by all direct API calls."""
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Release pooled connections held by the HTTP clients and SDK client."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._client is not None and hasattr(self._client, "close"):
+            await self._client.close()
+            self._client = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._intents is not None:
+            self._intents.close()
+            self._intents = None
+        if self._man_index is not None:
+            self._man_index.close()
+            self._man_index = None
+        for llm in self._extra_backends():
+            await llm.aclose()
+
+    def close(self) -> None:
+        raise TypeError("AsyncLLMInterface must be closed with 'await aclose()' or 'async with'")
+
+    async def __aenter__(self) -> "AsyncLLMInterface":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def generate_summary(self, man_text: str) -> str:
+        """Generate a concise summary of the given man page."""
+        return await self._send_request(await self.document_prompt('summary', man_text), action='summary')
+
+    async def generate_example(self, man_text: str) -> str:
+        """Generate practical usage examples based on the man page."""
+        return await self._send_request(await self.document_prompt('example', man_text), action='example')
+
+    async def generate_command(self, intent: str) -> str:
+        """Generate a command based on the user's natural language intent."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        similar = await loop.run_in_executor(None, self.similar_command, intent)
+        if similar is not None:
+            return similar
+        command = await self._send_request(self.prompt_for('generate', intent), action='generate')
+        await loop.run_in_executor(None, self.remember_command, intent, command)
+        return command
+
+    async def generate_description(self, man_text: str) -> str:
+        """Generate a summary and usage examples of the man page with one request."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        prompts = {action: await self.document_prompt(action, man_text) for action in DESCRIPTION_ACTIONS}
+        parts = {action: await loop.run_in_executor(None, self.get_cached, action, prompts[action])
+                 for action in DESCRIPTION_ACTIONS}
+        missing = [action for action in DESCRIPTION_ACTIONS if not parts[action]]
+        if len(missing) == 2:
+            text = await self._send_request(description_prompt(prompts['summary']), action='describe')
+            if await loop.run_in_executor(None, self.remember_description, prompts, text):
+                return text
+        answers = await asyncio.gather(*(self._send_request(prompts[action], action=action) for action in missing))
+        parts.update(zip(missing, answers))
+        return format_description(parts['summary'], parts['example'])
+
+    async def stream_description(self, man_text: str) -> AsyncIterator[str]:
+        """Stream a summary and usage examples of the man page from one request (see generate_description)."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        prompts = {action: await self.document_prompt(action, man_text) for action in DESCRIPTION_ACTIONS}
+        parts = {action: await loop.run_in_executor(None, self.get_cached, action, prompts[action])
+                 for action in DESCRIPTION_ACTIONS}
+        if not any(parts.values()):
+            chunks = []
+            async for chunk in self._stream_request(description_prompt(prompts['summary']), action='describe'):
+                chunks.append(chunk)
+                yield chunk
+            # Only reached when the stream ran to completion
+            await loop.run_in_executor(None, self.remember_description, prompts, "".join(chunks))
+            return
+        for action, marker in zip(DESCRIPTION_ACTIONS, (SUMMARY_MARKER, EXAMPLES_MARKER)):
+            yield f"{marker}\n" if action == 'summary' else f"\n\n{marker}\n"
+            if parts[action]:
+                yield parts[action]
+            else:
+                async for chunk in self._stream_request(prompts[action], action=action):
+                    yield chunk
+
+    async def stream_summary(self, man_text: str) -> AsyncIterator[str]:
+        """Stream a concise summary of the given man page chunk by chunk."""
+        async for chunk in self._stream_request(await self.document_prompt('summary', man_text), action='summary'):
+            yield chunk
+
+    async def stream_example(self, man_text: str) -> AsyncIterator[str]:
+        """Stream practical usage examples based on the man page."""
+        async for chunk in self._stream_request(await self.document_prompt('example', man_text), action='example'):
+            yield chunk
+
+    async def stream_command(self, intent: str) -> AsyncIterator[str]:
+        """Stream a command generated from the user's natural language intent."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        similar = await loop.run_in_executor(None, self.similar_command, intent)
+        if similar is not None:
+            yield similar
+            return
+        chunks = []
+        async for chunk in self._stream_request(self.prompt_for('generate', intent), action='generate'):
+            chunks.append(chunk)
+            yield chunk
+        await loop.run_in_executor(None, self.remember_command, intent, "".join(chunks))
+
+    async def document_prompt(self, action: str, man_text: str) -> str:
+        """Build the prompt for a man page action, map-reducing pages too large for one request."""
+        import asyncio
+
+        chunks = self._chunks_for(man_text)
+        if chunks is None:
+            return self.prompt_for(action, man_text)
+
+        slots = asyncio.Semaphore(max(1, self.max_parallel_chunks))
+
+        async def notes_for(chunk):
+            async with slots:
+                return await self._send_request(build_prompt('chunk', chunk), action='chunk')
+
+        notes = await asyncio.gather(*(notes_for(chunk) for chunk in chunks))
+        return self._reduce_prompt(action, list(notes))
+
+    async def index_answer(self, index_text: str, action: str, man_text: str) -> None:
+        """Make the cached answer to a man page action reachable through index_text (see LLMInterface.index_answer)."""
+        import asyncio
+
+        if not self._caches(action):
+            return
+        if self._chunks_for(man_text) is not None and not self._caches('chunk'):
+            # The prompt of a chunked page can't be rebuilt without requesting the notes again
+            return
+        prompt = await self.document_prompt(action, man_text)
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.cache.link, index_text, self._cache_text(prompt), action)
+
+    @contextlib.asynccontextmanager
+    async def _flight(self, action: str, prompt: str):
+        """
+        Async counterpart of _coalesced, for a cacheable request.
+
+        Identical requests on this event loop wait for the first one to
+        finish; the first then takes the cache's single-flight lock (waiting
+        for it on the default executor, so the loop keeps running). Yields
+        the answer if another request cached it in the meantime, else None:
+        the caller then makes the request and caches it before leaving.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        key = (action, prompt)
+        while key in self._flights:
+            await asyncio.wait([self._flights[key]])
+            cached = await loop.run_in_executor(None, self.get_cached, action, prompt)
+            if cached:
+                yield cached
+                return
+        flight = self._flights[key] = loop.create_future()
+        try:
+            guard = self._coalesced(action, prompt)
+            entered = loop.run_in_executor(None, guard.__enter__)
+            try:
+                await asyncio.shield(entered)
+            except BaseException:
+                # Cancelled while waiting: release the lock as soon as it has been taken
+                entered.add_done_callback(
+                    lambda future: future.cancelled() or future.exception() or guard.__exit__(None, None, None))
+                raise
+            try:
+                yield await loop.run_in_executor(None, self.get_cached, action, prompt)
+            finally:
+                # Releasing never blocks
+                guard.__exit__(None, None, None)
+        finally:
+            del self._flights[key]
+            flight.set_result(None)
+
+    @profiling.atimed('llm request')
+    async def _send_request(self, prompt: str, action: Optional[str] = None) -> str:
+        """Send request to the LLM API and return the response text, consulting the cache for the action."""
+        import asyncio
+
+        if not self._caches(action):
+            return await self._call_provider(prompt)
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.get_cached, action, prompt)
+        if cached:
+            return cached
+
+        async with self._flight(action, prompt) as cached:
+            # Answered by another request while we waited
+            if cached:
+                return cached
+            result = await self._call_provider(prompt)
+            await loop.run_in_executor(None, self.set_cached, action, prompt, result)
+            return result
+
+    async def _stream_request(self, prompt: str, action: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the response text chunk by chunk, consulting the cache for the action."""
+        import asyncio
+
+        if not self._caches(action):
+            async for chunk in self._stream_provider(prompt):
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.get_cached, action, prompt)
+        if cached:
+            yield cached
+            return
+
+        async with self._flight(action, prompt) as cached:
+            if cached:
+                yield cached
+                return
+            chunks = []
+            async for chunk in self._stream_provider(prompt):
+                chunks.append(chunk)
+                yield chunk
+            # Only reached when the stream ran to completion
+            await loop.run_in_executor(None, self.set_cached, action, prompt, "".join(chunks))
+
+    async def _stream_provider(self, prompt: str) -> AsyncIterator[str]:
+        """Stream from the configured provider; routed and hedged answers arrive as a single chunk."""
+        if self.router is not None or self.hedger is not None:
+            yield await self._call_provider(prompt)
+            return
+        async for chunk in self._stream_direct(prompt):
+            yield chunk
+
+    async def _call_provider(self, prompt: str) -> str:
+        """Send request to the configured provider (routed or hedged, if enabled) and return the response text."""
+        if self.router is not None:
+            return await self.router.acall(prompt)
+        if self.hedger is not None:
+            return await self.hedger.acall(prompt)
+        return await self._call_direct(prompt)
+
+    async def _call_direct(self, prompt: str) -> str:
+        """Send request to this interface's provider and return the response text."""
+        import asyncio
+
+        if self.provider == "openai" and OPENAI_AVAILABLE:
+            try:
+                response = await self.client.chat.completions.create(**self._sdk_request(prompt))
+                self.record_usage(response.usage)
+                return response.choices[0].message.content
+            except Exception as e:
+                raise self._api_error("OpenAI", e) from e
+        elif self.provider == "anthropic" and ANTHROPIC_AVAILABLE:
+            try:
+                message = await self.client.messages.create(**self._sdk_request(prompt))
+                self.record_usage(message.usage)
+                return message.content[0].text
+            except Exception as e:
+                raise self._api_error("Anthropic", e) from e
+
+        headers, data = self._fallback_request(prompt)
+        if HTTPX_AVAILABLE:
+            response = await self.http.post(self.api_url, headers=headers, json=data)
+        else:
+            response = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self._post, headers, data))
+        return self._fallback_text(response)
+
+    async def _stream_direct(self, prompt: str) -> AsyncIterator[str]:
+        """Stream from this interface's provider, yielding text chunks as they arrive."""
+        if self.provider == "openai" and OPENAI_AVAILABLE:
+            try:
+                stream = await self.client.chat.completions.create(**self._sdk_request(prompt), stream=True,
+                                                                   stream_options={"include_usage": True})
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None):
+                        self.record_usage(chunk.usage)
+            except Exception as e:
+                raise self._api_error("OpenAI", e) from e
+            return
+        if self.provider == "anthropic" and ANTHROPIC_AVAILABLE:
+            try:
+                async with self.client.messages.stream(**self._sdk_request(prompt)) as stream:
+                    async for text in stream.text_stream:
+                        yield text
+                    self.record_usage((await stream.get_final_message()).usage)
+            except Exception as e:
+                raise self._api_error("Anthropic", e) from e
+            return
+        if self.provider not in ("openai", "anthropic") or not HTTPX_AVAILABLE:
+            # The custom endpoint has no streaming protocol; emit the whole answer at once
+            yield await self._call_direct(prompt)
+            return
+
+        headers, data = self._fallback_request(prompt, stream=True)
+        async with self.http.stream("POST", self.api_url, headers=headers, json=data) as response:
+            if response.status_code != 200:
+                await response.aread()
+                self._handle_error(response)
+            usage = {}
+            async for event in _aiter_sse(response):
+                text, finished = self._stream_event(event, usage)
+                if text:
+                    yield text
+                if finished:
+                    break
+        if usage:
+            self.record_usage(usage)
+
+async def _aiter_sse(response) -> AsyncIterator[str]:
+    """Yield the data payload of each server-sent event in a streaming httpx response."""
+    data_lines = []
+    async for line in response.aiter_lines():
+        if line == "":
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+        elif line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield "\n".join(data_lines)
+
+def _iter_sse(response) -> Iterator[str]:
+    """Yield the data payload of each server-sent event in a streaming response."""
+    data_lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            # A blank line terminates the current event
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+        elif line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield "\n".join(data_lines)
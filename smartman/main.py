@@ -1,14 +1,26 @@
 import os
+import sys
+import json
+import time
+# Imported first so that a profile's imports phase covers click, rich and smartman itself
+from smartman import profiling
 import click
+import signal
+import contextlib
 from smartman import man_retriever
-from smartman.llm_interface import LLMInterface
+from smartman.batch import BATCH_ACTIONS, documentation_source, read_items, run_batch, write_result
+from smartman import warm as cache_warmer
+from smartman import daemon
+from smartman.llm_interface import LLMInterface, PROMPT_VERSION, format_description, split_description
+from smartman.cache import ResponseCache
 from smartman.config import load_config
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
+from rich.markup import escape
 
 # Initialize rich console
 console = Console()
+profiling.mark_imported()
 
 # Check if this is first run
 def check_first_run():
@@ -35,9 +47,226 @@ def check_first_run():
         
     return
 
+def markdown(text):
+    """Build a Markdown renderable; the markdown/pygments stack is imported on first use."""
+    from rich.markdown import Markdown
+    return Markdown(text)
+
+def create_llm(config):
+    """Build an LLMInterface from the loaded configuration."""
+    return LLMInterface(
+        api_key=config.get('LLM_API_KEY'),
+        provider=config.get('PROVIDER'),
+        model=config.get('MODEL'),
+        temperature=config.get('TEMPERATURE', 0.2),
+        max_tokens=config.get('MAX_TOKENS', 500),
+        context_token_budget=config.get('TOKEN_BUDGET', 4000),
+        chunked=config.get('CHUNKED', 'auto'),
+        chunk_tokens=config.get('CHUNK_TOKENS', 3000),
+        max_parallel_chunks=config.get('MAX_PARALLEL_CHUNKS', 4),
+        coalesce_timeout=config.get('COALESCE_TIMEOUT', 120.0),
+        hedge_delay=config.get('HEDGE_DELAY'),
+        hedge_model=config.get('HEDGE_MODEL'),
+        routes=config.get('ROUTES'),
+        routing_options={
+            'retries': config.get('ROUTE_RETRIES', 2),
+            'failure_threshold': config.get('CIRCUIT_BREAKER_FAILURES', 3),
+            'cooldown': config.get('CIRCUIT_BREAKER_COOLDOWN', 60.0),
+        },
+        pool_size=config.get('POOL_SIZE', 10),
+        connect_timeout=config.get('CONNECT_TIMEOUT', 10.0),
+        read_timeout=config.get('READ_TIMEOUT', 120.0),
+        use_cache=config.get('USE_CACHE', True),
+        cache_options=cache_options(config),
+        cache_actions=config.get('CACHE_ACTIONS'),
+        similarity_threshold=config.get('SIMILARITY_THRESHOLD', 0.9),
+        reference_snippets=config.get('REFERENCE_SNIPPETS', 5),
+        base_url=config.get('BASE_URL'),
+    )
+
+def cache_options(config):
+    """ResponseCache arguments from the loaded configuration."""
+    return {
+        'backend': config.get('CACHE_BACKEND', 'sqlite'),
+        'ttl_hours': config.get('CACHE_TTL_HOURS', 24),
+        'max_entries': config.get('CACHE_MAX_ENTRIES', 10000),
+        'max_bytes': config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024),
+        'compression': config.get('CACHE_COMPRESSION'),
+    }
+
+# Configuration that changes the answer to a man page action, besides the page
+ANSWER_SETTINGS = ('PROVIDER', 'MODEL', 'TEMPERATURE', 'MAX_TOKENS', 'TOKEN_BUDGET', 'CHUNKED', 'CHUNK_TOKENS',
+                   'HEDGE_DELAY', 'HEDGE_MODEL', 'ROUTES', 'BASE_URL')
+
+def answer_index(config, action, source):
+    """
+    The answer index key of a man page action: the file its documentation
+    was rendered from (a retrieval cache entry) and the settings.
+
+    It has to change whenever the prompt or cache key would, because a hit
+    through the index never sees either.
+    """
+    material = {
+        'command': source['command'],
+        'kind': source['kind'],
+        'path': source['path'],
+        'identity': source['identity'],
+        'manpath': source.get('manpath'),
+        'action': action,
+        'prompt_version': PROMPT_VERSION,
+        'settings': {key: config.get(key) for key in ANSWER_SETTINGS},
+        # The provider picked when none is configured, and whether a hedge provider has a key
+        'keys': [bool(config.get('LLM_API_KEY')), bool(os.environ.get('OPENAI_API_KEY')),
+                 bool(os.environ.get('ANTH_API_KEY'))],
+    }
+    return json.dumps(material, sort_keys=True, default=str)
+
+def indexed_source(command_name):
+    """The retrieval cache entry of a command's documentation, if it can key the answer index."""
+    with profiling.phase('man page'):
+        source = man_retriever.get_retrieval_cache().lookup(command_name)
+    # Negative entries have no file to key on
+    return source if source is not None and source.get('identity') is not None else None
+
+def cached_answers(config, actions, command_name):
+    """
+    Serve man page actions from the answer index, before anything else is set up.
+
+    Returns (documentation kind, {action: answer}) when every action is a
+    hit, else None. A hit costs a stat() of the page's file and a few cache
+    reads: no man run, no prompt and no LLMInterface, so no provider SDK
+    or client either.
+    """
+    if not config.get('USE_CACHE', True):
+        return None
+    cached_actions = config.get('CACHE_ACTIONS')
+    if cached_actions is not None and not set(actions) <= set(cached_actions):
+        return None
+    source = indexed_source(command_name)
+    if source is None:
+        return None
+    cache = ResponseCache(**cache_options(config))
+    try:
+        answers = {action: cache.get_linked_response(answer_index(config, action, source)) for action in actions}
+    finally:
+        cache.close()
+    if not all(answers.values()):
+        return None
+    return source['kind'], answers
+
+def index_answers(llm, config, actions, command_name, doc_text):
+    """Add the answers just given for a command to the answer index, so the next ask is served by cached_answers."""
+    source = indexed_source(command_name)
+    if source is None or source.get('text') != doc_text:
+        return
+    for action in actions:
+        llm.index_answer(answer_index(config, action, source), action, doc_text)
+
+def should_stream(config):
+    """Stream responses only when writing to a terminal and not disabled in config."""
+    return bool(config.get('STREAM', True)) and console.is_terminal
+
+def answer_panel(text, title, border_style):
+    """A Markdown answer inside a panel."""
+    return Panel(markdown(text), title=title, border_style=border_style)
+
+def description_panels(text, command_name):
+    """The summary and examples panels of a `describe` answer, complete or still streaming."""
+    from rich.console import Group
+
+    summary_text, example_text = split_description(text)
+    return Group(answer_panel(summary_text, f"Summary of '{command_name}'", "green"),
+                 answer_panel(example_text, f"Examples for '{command_name}'", "yellow"))
+
+def print_answer(text, render):
+    """Render a complete answer with render(text)."""
+    with profiling.phase('render'):
+        console.print(render(text))
+
+def stream_answer(chunks, render):
+    """Render streamed chunks progressively, re-rendering the text so far with render(text)."""
+    from rich.live import Live
+
+    text = ""
+    with profiling.phase('render'), Live(render(text), console=console, refresh_per_second=15,
+                                         vertical_overflow="visible") as live:
+        for chunk in profiling.iterate('llm request', chunks):
+            text += chunk
+            live.update(render(text))
+    return text
+
+def print_panel(text, title, border_style):
+    """Render a Markdown answer inside a panel."""
+    print_answer(text, lambda text: answer_panel(text, title, border_style))
+
+def stream_panel(chunks, title, border_style):
+    """Render streamed chunks progressively inside a live-updating panel."""
+    return stream_answer(chunks, lambda text: answer_panel(text, title, border_style))
+
+SOURCE_MESSAGES = {
+    'builtin': "[bold yellow]Found shell builtin documentation.[/bold yellow]",
+    'help': "[bold yellow]Found command help output.[/bold yellow]",
+    'none': "[bold orange]No documentation found. Using LLM's general knowledge.[/bold orange]",
+    'man': "[bold green]Found man page documentation.[/bold green]",
+}
+
+def report_source(kind):
+    """Tell the user which kind of documentation the answer is based on."""
+    console.print(SOURCE_MESSAGES[kind])
+
+def forward_to_daemon(action, argument, title, border_style, render=None):
+    """
+    Answer through a running `smartman serve`, if there is one.
+
+    The documentation is retrieved here, in this process's PATH, MANPATH
+    and working directory, and sent as text. The answer goes in a panel with
+    the given title, or is rendered with render(text) when given. Returns
+    False when no server is listening so the caller runs in-process.
+    """
+    with profiling.phase('daemon'):
+        sock = daemon.connect()
+    if sock is None:
+        return False
+    if action != 'generate':
+        console.print(f"[bold blue]Retrieving documentation for [cyan]{argument}[/cyan]...[/bold blue]")
+        try:
+            argument = man_retriever.get_man_page(argument)
+        except BaseException:
+            sock.close()
+            raise
+        report_source(documentation_source(argument))
+    with profiling.phase('daemon'):
+        chunks = daemon.forward(action, argument, stream=console.is_terminal, sock=sock)
+    render = render or (lambda text: answer_panel(text, title, border_style))
+    if console.is_terminal:
+        stream_answer(chunks, render)
+    else:
+        print_answer("".join(profiling.iterate('daemon', chunks)), render)
+    return True
+
+def start_profile(ctx, output):
+    """Record a timing breakdown of this invocation, reported when the command exits."""
+    profiling.enable(cprofile=bool(output) and not output.endswith('.json'))
+
+    def finish():
+        stderr = Console(stderr=True)
+        profiling.report(stderr)
+        if output:
+            profiling.write(output)
+            stderr.print(f"Profile written to {escape(output)}")
+
+    ctx.call_on_close(finish)
+
 @click.group()
-def cli():
+@click.option('--profile', is_flag=True, envvar=profiling.ENV_VAR,
+              help='Print a timing breakdown of the command on stderr (or set SMARTMAN_PROFILE=1).')
+@click.option('--profile-output', type=click.Path(dir_okay=False), envvar=profiling.OUTPUT_ENV_VAR, default=None,
+              help='Also write the breakdown to a .json file, or cProfile stats to any other path.')
+@click.pass_context
+def cli(ctx, profile, profile_output):
     """Smartman: Generate man page summaries and commands."""
+    if profile or profile_output:
+        start_profile(ctx, profile_output)
     check_first_run()
 
 @cli.command()
@@ -50,71 +279,319 @@ def help():
 @click.argument('command_name')
 def summary(command_name):
     """Generate a summary for a given command."""
+    if forward_to_daemon('summary', command_name, f"Summary of '{command_name}'", "green"):
+        return
     config = load_config()
-    llm = LLMInterface(api_key=config.get('LLM_API_KEY'))
-    
-    console.print(f"[bold blue]Retrieving documentation for [cyan]{command_name}[/cyan]...[/bold blue]")
+    hit = cached_answers(config, ('summary',), command_name)
+    if hit is not None:
+        report_source(hit[0])
+        print_panel(hit[1]['summary'], f"Summary of '{command_name}'", "green")
+        return
+    llm = create_llm(config)
+
     doc_text = man_retriever.get_man_page(command_name)
     
-    if doc_text.startswith("SHELL BUILTIN COMMAND:"):
-        console.print("[bold yellow]Found shell builtin documentation.[/bold yellow]")
-    elif doc_text.startswith("COMMAND HELP OUTPUT:"):
-        console.print("[bold yellow]Found command help output.[/bold yellow]")
-    elif doc_text.startswith("NO_DOCUMENTATION:"):
-        console.print("[bold orange]No documentation found. Using LLM's general knowledge.[/bold orange]")
-    else:
-        console.print("[bold green]Found man page documentation.[/bold green]")
+    report_source(documentation_source(doc_text))
     
     console.print("[bold blue]Generating summary...[/bold blue]")
-    summary_text = llm.generate_summary(doc_text)
-    md = Markdown(summary_text)
-    console.print(Panel(md, title=f"Summary of '{command_name}'", border_style="green"))
+    if should_stream(config):
+        stream_panel(llm.stream_summary(doc_text), f"Summary of '{command_name}'", "green")
+    else:
+        summary_text = llm.generate_summary(doc_text)
+        print_panel(summary_text, f"Summary of '{command_name}'", "green")
+    index_answers(llm, config, ('summary',), command_name, doc_text)
 
 @cli.command()
 @click.argument('command_name')
 def example(command_name):
     """Show usage examples for a given command."""
+    if forward_to_daemon('example', command_name, f"Examples for '{command_name}'", "yellow"):
+        return
     config = load_config()
-    llm = LLMInterface(api_key=config.get('LLM_API_KEY'))
-    
-    console.print(f"[bold blue]Retrieving documentation for [cyan]{command_name}[/cyan]...[/bold blue]")
+    hit = cached_answers(config, ('example',), command_name)
+    if hit is not None:
+        report_source(hit[0])
+        print_panel(hit[1]['example'], f"Examples for '{command_name}'", "yellow")
+        return
+    llm = create_llm(config)
+
     doc_text = man_retriever.get_man_page(command_name)
     
-    if doc_text.startswith("SHELL BUILTIN COMMAND:"):
-        console.print("[bold yellow]Found shell builtin documentation.[/bold yellow]")
-    elif doc_text.startswith("COMMAND HELP OUTPUT:"):
-        console.print("[bold yellow]Found command help output.[/bold yellow]")
-    elif doc_text.startswith("NO_DOCUMENTATION:"):
-        console.print("[bold orange]No documentation found. Using LLM's general knowledge.[/bold orange]")
-    else:
-        console.print("[bold green]Found man page documentation.[/bold green]")
+    report_source(documentation_source(doc_text))
     
     console.print("[bold blue]Generating examples...[/bold blue]")
-    example_text = llm.generate_example(doc_text)
-    md = Markdown(example_text)
-    console.print(Panel(md, title=f"Examples for '{command_name}'", border_style="yellow"))
+    if should_stream(config):
+        stream_panel(llm.stream_example(doc_text), f"Examples for '{command_name}'", "yellow")
+    else:
+        example_text = llm.generate_example(doc_text)
+        print_panel(example_text, f"Examples for '{command_name}'", "yellow")
+    index_answers(llm, config, ('example',), command_name, doc_text)
+
+@cli.command()
+@click.argument('command_name')
+def describe(command_name):
+    """Show a summary and usage examples for a given command, from one request."""
+    render = lambda text: description_panels(text, command_name)
+    if forward_to_daemon('describe', command_name, None, None, render=render):
+        return
+    config = load_config()
+    hit = cached_answers(config, ('summary', 'example'), command_name)
+    if hit is not None:
+        report_source(hit[0])
+        print_answer(format_description(hit[1]['summary'], hit[1]['example']), render)
+        return
+    llm = create_llm(config)
+
+    doc_text = man_retriever.get_man_page(command_name)
+
+    report_source(documentation_source(doc_text))
+
+    console.print("[bold blue]Generating summary and examples...[/bold blue]")
+    if should_stream(config):
+        stream_answer(llm.stream_description(doc_text), render)
+    else:
+        print_answer(llm.generate_description(doc_text), render)
+    index_answers(llm, config, ('summary', 'example'), command_name, doc_text)
 
 @cli.command()
 @click.argument('intent')
 def generate(intent):
     """Generate a command based on your intent."""
-    config = load_config()
-    llm = LLMInterface(api_key=config.get('LLM_API_KEY'))
-    
     console.print(f"[bold blue]Generating command for: [cyan]{intent}[/cyan][/bold blue]")
+    if forward_to_daemon('generate', intent, "Generated Command", "magenta"):
+        return
+    config = load_config()
+    llm = create_llm(config)
+    if should_stream(config):
+        stream_panel(llm.stream_command(intent), "Generated Command", "magenta")
+        return
     command = llm.generate_command(intent)
-    md = Markdown(command)
-    console.print(Panel(md, title="Generated Command", border_style="magenta"))
+    print_panel(command, "Generated Command", "magenta")
+
+@cli.command()
+@click.argument('action', type=click.Choice(BATCH_ACTIONS))
+@click.argument('input_file', type=click.File('r'), default='-')
+@click.option('--workers', '-w', type=int, default=None, help='Items processed concurrently (default: BATCH_WORKERS or 4).')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default=None,
+              help='Write each output to its own file plus results.jsonl in this directory instead of stdout.')
+def batch(action, input_file, workers, output_dir):
+    """Run summary, example or generate for every line of a file (or stdin)."""
+    config = load_config()
+    workers = max(1, workers or config.get('BATCH_WORKERS', 4))
+    items = read_items(input_file)
+    status = Console(stderr=True)
+
+    # Keep stdout clean for JSONL; give every worker its own pooled connection
+    with contextlib.redirect_stdout(sys.stderr):
+        llm = create_llm(dict(config, POOL_SIZE=max(config.get('POOL_SIZE', 10), workers)))
+
+    results_file = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        results_file = open(os.path.join(output_dir, 'results.jsonl'), 'w')
+
+    failed = 0
+    try:
+        for done, result in enumerate(run_batch(llm, action, items, workers), 1):
+            if results_file:
+                results_file.write(json.dumps(write_result(result, output_dir)) + '\n')
+            else:
+                click.echo(json.dumps(result))
+            if result['ok']:
+                status.print(f"[{done}/{len(items)}] [green]ok[/green] {escape(result['item'])} ({result['elapsed_ms']:.0f} ms)")
+            else:
+                failed += 1
+                status.print(f"[{done}/{len(items)}] [bold red]failed[/bold red] {escape(result['item'])}: {escape(result['error'])}")
+    finally:
+        llm.close()
+        if results_file:
+            results_file.close()
+
+    status.print(f"[bold]{len(items) - failed} succeeded, {failed} failed[/bold]")
+    if failed:
+        sys.exit(1)
+
+@cli.command()
+@click.option('--section', '-s', 'sections', multiple=True,
+              help='Man section to include, e.g. 1 or 8 (repeatable; default: 1 and 8).')
+@click.option('--include', multiple=True, help='Only pages whose name matches this glob (repeatable).')
+@click.option('--exclude', multiple=True, help='Skip pages whose name matches this glob (repeatable).')
+@click.option('--action', '-a', 'actions', multiple=True, type=click.Choice(cache_warmer.WARM_ACTIONS),
+              help='Responses to precompute (repeatable; default: summary).')
+@click.option('--concurrency', '-c', type=int, default=None, help='LLM requests in flight (default: WARM_CONCURRENCY or 4).')
+@click.option('--processes', '-p', type=int, default=None, help='Worker processes rendering pages (default: CPU count).')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an interrupted run and start over.')
+@click.option('--dry-run', is_flag=True, help='Only list the pages that would be warmed.')
+def warm(sections, include, exclude, actions, concurrency, processes, restart, dry_run):
+    """Precompute cached responses for every page in the manpath."""
+    config = load_config()
+    if not config.get('USE_CACHE', True):
+        raise click.UsageError("Caching is disabled (USE_CACHE: false); there is nothing to warm.")
+    actions = actions or ('summary',)
+    concurrency = max(1, concurrency or config.get('WARM_CONCURRENCY', 4))
+
+    files = cache_warmer.list_page_files(sections or cache_warmer.DEFAULT_SECTIONS, include, exclude)
+    names = sorted(files)
+    if dry_run:
+        for name in names:
+            click.echo(name)
+        console.print(f"[bold]{len(names)} pages[/bold]")
+        return
+
+    checkpoint = cache_warmer.WarmCheckpoint(
+        os.path.join(os.path.expanduser('~/.smartman'), 'warm_checkpoint.jsonl'),
+        {'provider': config.get('PROVIDER'), 'model': config.get('MODEL'), 'actions': sorted(actions)})
+    done = checkpoint.start(resume=not restart)
+    pending = {name: files[name] for name in names if name not in done}
+    if done:
+        console.print(f"[bold blue]Resuming: {len(names) - len(pending)} of {len(names)} pages already done.[/bold blue]")
+
+    llm = create_llm(dict(config, POOL_SIZE=max(config.get('POOL_SIZE', 10), concurrency)))
+    from rich.progress import Progress, TextColumn, BarColumn, MofNCompleteColumn, TimeRemainingColumn
+
+    columns = (TextColumn("[bold blue]Warming"), BarColumn(), MofNCompleteColumn(),
+               TextColumn("{task.fields[rate]:.1f} pages/s"), TextColumn("ETA"), TimeRemainingColumn(),
+               TextColumn("{task.fields[stats]}"))
+    finished = False
+    start = time.perf_counter()
+    try:
+        with Progress(*columns, console=console) as progress:
+            task = progress.add_task("warm", total=len(pending), rate=0.0, stats="")
+            totals = {'warmed': 0, 'cached': 0, 'failed': 0}
+
+            def on_result(name, outcome, error):
+                totals[outcome] += 1
+                if error:
+                    progress.console.print(f"[bold red]failed[/bold red] {escape(name)}: {escape(error)}")
+                completed = sum(totals.values())
+                progress.update(task, completed=completed,
+                                rate=completed / max(time.perf_counter() - start, 1e-6),
+                                stats=f"warmed {totals['warmed']}, cached {totals['cached']}, failed {totals['failed']}")
+
+            counts = cache_warmer.warm_cache(llm, pending, actions, concurrency, processes,
+                                             checkpoint=checkpoint, on_result=on_result)
+        finished = True
+    except KeyboardInterrupt:
+        console.print("[bold yellow]Interrupted; run `smartman warm` again to resume.[/bold yellow]")
+        sys.exit(130)
+    finally:
+        checkpoint.close(finished=finished)
+        llm.close()
+
+    console.print(f"[bold green]Done in {time.perf_counter() - start:.0f}s:[/bold green] "
+                  f"{counts['warmed']} warmed, {counts['cached']} already cached, {counts['failed']} failed")
+
+@cli.command()
+@click.option('--section', '-s', 'sections', multiple=True,
+              help='Man section to index, e.g. 1 or 8 (repeatable; default: 1 and 8).')
+@click.option('--processes', '-p', type=int, default=None, help='Worker processes rendering pages (default: CPU count).')
+@click.option('--rebuild', is_flag=True, help='Re-index every page, not only the changed ones.')
+def index(sections, processes, rebuild):
+    """Build or update the local man page index used by generate."""
+    from smartman.man_index import ManIndex, DEFAULT_INDEX_PATH, update_index
+
+    path = os.path.expanduser(DEFAULT_INDEX_PATH)
+    if rebuild and os.path.exists(path):
+        os.remove(path)
+    try:
+        man_index = ManIndex(path)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    files = cache_warmer.list_page_files(sections or cache_warmer.DEFAULT_SECTIONS)
+    start = time.perf_counter()
+    with console.status("[bold blue]Indexing man pages...[/bold blue]") as status:
+        def on_page(name, snippet_count):
+            status.update(f"[bold blue]Indexing man pages...[/bold blue] {escape(name)}")
+
+        try:
+            counts = update_index(man_index, files, processes, on_page)
+        except KeyboardInterrupt:
+            console.print("[bold yellow]Interrupted; run `smartman index` again to continue.[/bold yellow]")
+            sys.exit(130)
+        finally:
+            man_index.close()
+
+    console.print(f"[bold green]Done in {time.perf_counter() - start:.0f}s:[/bold green] "
+                  f"{counts['indexed']} indexed, {counts['unchanged']} unchanged, {counts['removed']} removed, "
+                  f"{counts['failed']} failed")
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), default=None,
+              help='Socket to listen on (default: SMARTMAN_SOCKET or ~/.smartman/daemon.sock).')
+def serve(socket_path):
+    """Run a background server that keeps smartman warm for faster invocations."""
+    server = daemon.SmartmanServer(socket_path or daemon.socket_path(), load_config, create_llm)
+    with server.llm():
+        # Build the interface before the first request arrives
+        pass
+    console.print(f"[bold green]Serving on {server.path}[/bold green] (Ctrl-C to stop)")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+@cli.command('hedge-stats')
+def hedge_stats():
+    """Show win rates and latencies of hedged requests."""
+    from smartman.hedging import summarize_stats
+
+    stats = summarize_stats()
+    if not stats['requests']:
+        console.print("No hedged requests recorded yet. Set HEDGE_DELAY in ~/.smartman/config.yaml to enable hedging.")
+        return
+    console.print(f"[bold]{stats['requests']} requests, {stats['hedged']} hedged[/bold]")
+    for provider, values in sorted(stats['providers'].items()):
+        console.print(f"  {provider:10} wins {values['wins']:5} (hedged {values['hedged_wins']:5})   "
+                      f"mean {values['mean']:6.2f}s   p50 {values['p50']:6.2f}s   p95 {values['p95']:6.2f}s")
+
+@cli.command('route-stats')
+def route_stats():
+    """Show the latency and health of each routed backend."""
+    from smartman.routing import load_stats
+
+    stats = load_stats()
+    if not stats:
+        console.print("No routed requests recorded yet. Set ROUTES in ~/.smartman/config.yaml to enable routing.")
+        return
+    for name, entry in sorted(stats.items()):
+        state = "open" if entry.get('open_until', 0) > time.time() else "closed"
+        console.print(f"  {name:40} latency {entry.get('latency', 0):6.2f}s   errors {entry.get('error_rate', 0):5.1%}   "
+                      f"requests {entry.get('requests', 0):6}   circuit {state}")
 
 @cli.command()
 def interactive():
     """Start an interactive session with the CLI tool."""
     config = load_config()
-    llm = LLMInterface(api_key=config.get('LLM_API_KEY'))
+    llm = create_llm(config)
     
     console.print(Panel("[bold]Smartman Interactive Mode[/bold]\nType 'exit' to quit.", 
                         border_style="blue"))
     
+    try:
+        interactive_loop(llm, config)
+    finally:
+        llm.close()
+
+INTERACTIVE_TITLES = {
+    'summary': ("Summary of '{}'", "green"),
+    'example': ("Examples for '{}'", "yellow"),
+    'generate': ("Generated Command", "magenta"),
+}
+
+def interactive_loop(llm, config):
+    """Read and answer queries until the user exits."""
+    from smartman.session import InteractiveSession
+
+    session = InteractiveSession(
+        llm,
+        max_entries=config.get('INTERACTIVE_CACHE_SIZE', 128),
+        prefetch=config.get('INTERACTIVE_PREFETCH', True),
+        prefetch_budget=config.get('INTERACTIVE_PREFETCH_BUDGET', 20),
+    )
     while True:
         user_input = click.prompt('> ', type=str)
         if user_input.lower() == 'exit':
@@ -122,17 +599,14 @@ def interactive():
         parts = user_input.split(' ', 1)
         action = parts[0].lower()
         try:
-            if action == 'summary' and len(parts) > 1:
-                man_text = man_retriever.get_man_page(parts[1])
-                md = Markdown(llm.generate_summary(man_text))
-                console.print(Panel(md, title=f"Summary of '{parts[1]}'", border_style="green"))
-            elif action == 'example' and len(parts) > 1:
-                man_text = man_retriever.get_man_page(parts[1])
-                md = Markdown(llm.generate_example(man_text))
-                console.print(Panel(md, title=f"Examples for '{parts[1]}'", border_style="yellow"))
-            elif action == 'generate' and len(parts) > 1:
-                md = Markdown(llm.generate_command(parts[1]))
-                console.print(Panel(md, title="Generated Command", border_style="magenta"))
+            if action in INTERACTIVE_TITLES and len(parts) > 1:
+                title, border_style = INTERACTIVE_TITLES[action]
+                title = title.format(parts[1])
+                if should_stream(config):
+                    stream_panel(session.stream(action, parts[1]), title, border_style)
+                else:
+                    print_panel(session.answer(action, parts[1]), title, border_style)
+                session.answered(action, parts[1])
             else:
                 console.print("[bold red]Unknown command.[/bold red] Use: summary <cmd>, example <cmd>, generate <intent>, interactive, or help")
         except Exception as e:
@@ -0,0 +1,211 @@
+"""
+Offline full-text index of the installed man pages for `generate`.
+
+`smartman index` stores the NAME/SYNOPSIS lines and option entries of every
+page in the manpath in an SQLite FTS5 table, ranked with BM25. `generate`
+then looks up the snippets most relevant to the intent and attaches them
+to the prompt, so the model picks flags that exist in the locally installed
+versions of the tools. Only pages whose file changed since the last run are
+re-rendered, in a process pool.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+
+from smartman import man_retriever
+from smartman.similarity import STOP_WORDS
+
+DEFAULT_INDEX_PATH = '~/.smartman/man_index.db'
+# Longest snippet attached to a prompt, in characters
+MAX_SNIPPET_CHARS = 400
+# BM25 weight of a match in the page name relative to one in the snippet text
+PAGE_WEIGHT = 5.0
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9_+-]*")
+
+
+def extract_snippets(man_text):
+    """
+    Return the indexable snippets of a page as (kind, text) pairs.
+
+    One "synopsis" snippet holds the NAME and SYNOPSIS sections; every
+    option entry is an "option" snippet, whether it is listed under OPTIONS
+    or, as on GNU pages, under DESCRIPTION.
+    """
+    _, _, sections = man_retriever.render_sections(man_text)
+    snippets = []
+    synopsis = " ".join(" ".join(sections.get(name, [])) for name in ('NAME', 'SYNOPSIS')).strip()
+    if synopsis:
+        snippets.append(('synopsis', " ".join(synopsis.split())))
+    for name, blocks in sections.items():
+        if name in ('NAME', 'SYNOPSIS'):
+            continue
+        for block in blocks:
+            if name == 'OPTIONS' or block.startswith('-'):
+                snippets.append(('option', block))
+    return snippets
+
+def match_expression(query):
+    """FTS5 query matching any significant word of a natural language query."""
+    words = dict.fromkeys(word for word in _WORD.findall(query.lower()) if word not in STOP_WORDS)
+    return " OR ".join(f'"{word}"' for word in words)
+
+def format_snippets(snippets):
+    """Render search results as prompt text, one "page: snippet" per line."""
+    lines = []
+    for page, _, text in snippets:
+        text = " ".join(text.split())
+        if len(text) > MAX_SNIPPET_CHARS:
+            text = text[:MAX_SNIPPET_CHARS].rsplit(' ', 1)[0] + " ..."
+        lines.append(f"{page}: {text}")
+    return "\n".join(lines)
+
+
+class ManIndex:
+    """
+    BM25-ranked snippets of man pages in an SQLite FTS5 table.
+
+    The pages table records the identity (mtime, size) of the file each
+    page was indexed from, so updates only re-render what changed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            name TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS snippets USING fts5(
+            page, text, kind UNINDEXED, tokenize = 'porter unicode61'
+        );
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        db_path = os.path.expanduser(db_path)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._conn.executescript(self.SCHEMA)
+        except sqlite3.OperationalError as e:
+            self._conn.close()
+            raise RuntimeError(f"The man page index needs SQLite with FTS5: {e}")
+
+    def changes(self, files):
+        """
+        Compare page files against the index.
+
+        Args:
+            files: {name: path} of the pages that should be indexed
+
+        Returns (names to (re)index, names to remove).
+        """
+        with self._lock:
+            indexed = {name: (path, mtime_ns, size) for name, path, mtime_ns, size
+                       in self._conn.execute("SELECT name, path, mtime_ns, size FROM pages")}
+        stale = []
+        for name, path in files.items():
+            identity = man_retriever.file_identity(path)
+            if identity is None or indexed.get(name) != (path, *identity):
+                stale.append(name)
+        return stale, [name for name in indexed if name not in files]
+
+    def replace(self, name, path, snippets):
+        """Store a page's snippets, replacing any indexed before."""
+        identity = man_retriever.file_identity(path) or [0, 0]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM snippets WHERE page = ?", (name,))
+                self._conn.executemany("INSERT INTO snippets (page, text, kind) VALUES (?, ?, ?)",
+                                       [(name, text, kind) for kind, text in snippets])
+                self._conn.execute("INSERT OR REPLACE INTO pages (name, path, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                                   (name, path, *identity))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, names):
+        """Drop pages (and their snippets) from the index."""
+        with self._lock:
+            for name in names:
+                self._conn.execute("DELETE FROM snippets WHERE page = ?", (name,))
+                self._conn.execute("DELETE FROM pages WHERE name = ?", (name,))
+
+    def search(self, query, limit=5):
+        """Return the (page, kind, text) snippets most relevant to a query, best first."""
+        expression = match_expression(query)
+        if not expression or limit <= 0:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page, kind, text FROM snippets WHERE snippets MATCH ? "
+                "ORDER BY bm25(snippets, ?, 1.0) LIMIT ?", (expression, PAGE_WEIGHT, limit * 2)).fetchall()
+        # Aliases such as ls/dir/vdir share their option text; keep one copy
+        unique = {}
+        for page, kind, text in rows:
+            unique.setdefault(text, (page, kind, text))
+        return list(unique.values())[:limit]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def render_page(name, path):
+    """Render the exact file a page is indexed from; runs in a pool worker process."""
+    return name, path, man_retriever.render_man_file(path)
+
+def update_index(index, files, processes=None, on_page=None):
+    """
+    Bring the index up to date with the given page files.
+
+    Changed and new pages are rendered from their files by a pool of
+    `processes` worker processes (in this process when processes is 1) and
+    pages whose file is gone are removed. A page whose file can't be
+    rendered is left as it was, to be tried again by the next update.
+    on_page(name, snippet_count) is called after each page is indexed.
+
+    Returns a dict counting the "indexed", "unchanged", "removed" and "failed" pages.
+    """
+    stale, removed = index.changes(files)
+    index.remove(removed)
+
+    processes = processes or os.cpu_count() or 1
+    pool = None
+    if processes > 1 and len(stale) > 1:
+        # Imported here: it pulls in multiprocessing, which every other command can skip
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=processes)
+    fetched = None
+    failed = 0
+    try:
+        paths = [files[name] for name in stale]
+        fetched = pool.map(render_page, stale, paths, chunksize=4) if pool else map(render_page, stale, paths)
+        for name, path, text in fetched:
+            if text is None:
+                failed += 1
+                continue
+            snippets = extract_snippets(text)
+            index.replace(name, path, snippets)
+            if on_page is not None:
+                on_page(name, len(snippets))
+    finally:
+        if pool is not None:
+            if fetched is not None:
+                # Closing the map's iterator cancels the pages still queued
+                # (shutdown(cancel_futures=True) needs Python 3.9)
+                fetched.close()
+            pool.shutdown(wait=False)
+    return {'indexed': len(stale) - failed, 'unchanged': len(files) - len(stale), 'removed': len(removed),
+            'failed': failed}
@@ -1,49 +1,626 @@
+import os
+import re
+import json
+import signal
+import shutil
+import hashlib
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from smartman import profiling
 
-def get_man_page(command_name):
+# Limits applied to every documentation probe
+PROBE_TIMEOUT = 10.0  # seconds for man and builtin help (large pages take a while to render)
+HELP_PROBE_TIMEOUT = 3.0  # seconds for running a binary with --help / -h
+PROBE_MAX_BYTES = 2 * 1024 * 1024  # output cap per probe
+
+@profiling.timed('man page')
+def get_man_page(command_name, use_cache=True):
     """
     Retrieve the man page for a given command.
     Falls back to alternative help sources if man page isn't available.
+
+    Results are cached by the identity (path, mtime, size) of the file they
+    were rendered from, so repeat lookups cost a stat() instead of a groff run.
+    """
+    cache = get_retrieval_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(command_name)
+        if cached is not None:
+            return cached
+
+    text, source = retrieve_documentation(command_name)
+
+    # A better source that was only too slow this time may answer next time
+    if cache is not None and not source.get('timed_out'):
+        cache.set(command_name, text, source)
+    return text
+
+def retrieve_documentation(command_name):
+    """
+    Run the documentation sources for a command without consulting the cache.
+
+    The man page and bash builtin help are probed concurrently, each with
+    stdin closed, a timeout and an output cap; the best-ranked source that
+    answers wins and the other probe is killed. Only when neither has
+    documentation is the binary itself run with `--help` (under the same
+    limits, so a command that ignores it and waits on stdin or starts a
+    long-running job can't hang retrieval), since running a program has side
+    effects that a man page lookup doesn't. `-h` is only tried once `--help`
+    has failed, because for some commands it means something else entirely
+    (e.g. `shutdown -h`).
+
+    Returns a (text, source) tuple where source describes what produced the
+    text: {'kind': 'man' | 'builtin' | 'help' | 'none', 'path': file or None},
+    with 'timed_out': True added when a better-ranked source timed out.
+    """
+    result, timed_out = run_ranked([ManProbe(command_name), BuiltinProbe(command_name)])
+    binary = shutil.which(command_name) if result is None else None
+    if binary:
+        for flag in ('--help', '-h'):
+            try:
+                result = HelpProbe(command_name, binary, flag).run()
+            except ProbeTimeout:
+                timed_out = True
+            if result is not None:
+                break
+    if result is None:
+        # If all else fails, return a message indicating no documentation was found
+        result = (f"NO_DOCUMENTATION: No manual page or help information found for '{command_name}'. Using general knowledge.",
+                  {'kind': 'none', 'path': None})
+    if timed_out:
+        result[1]['timed_out'] = True
+    return result
+
+def render_man_file(path):
+    """
+    Render one man page file with `man -l`, under the probe timeout and output cap.
+
+    Returns the text, or None if the file could not be rendered (in time).
     """
     try:
-        # First, try the standard man page
-        man_page = subprocess.check_output(['man', command_name], text=True)
-        return man_page
-    except subprocess.CalledProcessError:
-        # Man page not found, try alternative help sources
-        
-        # Try bash help (for shell builtins)
+        text = DocumentationProbe().run_argv(['man', '-l', path])
+    except ProbeTimeout:
+        return None
+    return text if text and text.strip() else None
+
+def run_ranked(probes):
+    """
+    Run probes concurrently and return the result of the best-ranked one that answers.
+
+    Probes are ranked by their position in the list. Results are awaited in
+    rank order, so a lower-ranked answer is only used once every better probe
+    has failed; the remaining probes are cancelled as soon as a winner is known.
+
+    Returns a (result, timed_out) tuple: result is None if no probe answered,
+    and timed_out tells whether a probe ranked above it timed out.
+    """
+    timed_out = False
+    if not probes:
+        return None, timed_out
+    with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+        futures = [pool.submit(probe.run) for probe in probes]
         try:
-            help_text = subprocess.check_output(['bash', '-c', f'help {command_name} 2>/dev/null'], 
-                                               text=True, stderr=subprocess.DEVNULL)
-            if help_text.strip():
-                return f"SHELL BUILTIN COMMAND:\n{help_text}"
-        except subprocess.CalledProcessError:
-            pass
-        
-        # Try --help flag
+            for future in futures:
+                try:
+                    result = future.result()
+                except ProbeTimeout:
+                    timed_out = True
+                    continue
+                if result is not None:
+                    return result, timed_out
+        finally:
+            for probe in probes:
+                probe.cancel()
+    return None, timed_out
+
+
+class ProbeTimeout(Exception):
+    """A documentation command was killed for running longer than its probe's timeout."""
+
+
+class DocumentationProbe:
+    """
+    Runs documentation commands with stdin closed, a timeout and an output cap.
+
+    A probe runs in a worker thread; cancel() may be called from any thread
+    and kills the running process group (and prevents any further commands).
+    """
+
+    def __init__(self, timeout=None, max_bytes=None):
+        self.timeout = PROBE_TIMEOUT if timeout is None else timeout
+        self.max_bytes = PROBE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._proc = None
+        self._cancelled = False
+
+    def run(self):
+        """
+        Return a (text, source) tuple, or None if this source has no documentation.
+
+        Raises ProbeTimeout if a command timed out before it could tell.
+        """
+        raise NotImplementedError
+
+    def run_argv(self, argv):
+        """
+        Run a command and return its (possibly truncated) output, or None on failure.
+
+        Raises ProbeTimeout if the command was killed for exceeding the timeout,
+        since a slow source may still have documentation.
+        """
+        with self._lock:
+            if self._cancelled:
+                return None
+            try:
+                proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, start_new_session=True)
+            except OSError:
+                return None
+            self._proc = proc
+
+        timed_out = threading.Event()
+
+        def time_out():
+            if proc.poll() is None:
+                timed_out.set()
+                _kill_process_group(proc)
+
+        timer = threading.Timer(self.timeout, time_out)
+        timer.start()
         try:
-            help_text = subprocess.check_output([command_name, '--help'], 
-                                              text=True, stderr=subprocess.DEVNULL)
-            if help_text.strip():
-                return f"COMMAND HELP OUTPUT:\n{help_text}"
-        except (subprocess.CalledProcessError, FileNotFoundError):
+            output = proc.stdout.read(self.max_bytes)
+            truncated = len(output) >= self.max_bytes
+            if truncated:
+                _kill_process_group(proc)
+            returncode = proc.wait()
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+            with self._lock:
+                self._proc = None
+
+        # A truncated page is still usable
+        if not truncated:
+            if timed_out.is_set():
+                raise ProbeTimeout(f"{argv[0]} did not finish within {self.timeout} seconds")
+            # Failed, or killed by cancel()
+            if returncode != 0:
+                return None
+        return output.decode('utf-8', errors='replace')
+
+    def cancel(self):
+        """Stop the probe, killing its process if one is running."""
+        with self._lock:
+            self._cancelled = True
+            if self._proc is not None:
+                _kill_process_group(self._proc)
+
+
+class ManProbe(DocumentationProbe):
+    """Renders the man page for a command."""
+
+    def __init__(self, command_name, **kwargs):
+        super().__init__(**kwargs)
+        self.command_name = command_name
+
+    def run(self):
+        man_path = _first_line(self.run_argv(['man', '-w', self.command_name]))
+        if not man_path:
+            return None
+        man_page = self.run_argv(['man', self.command_name])
+        if not man_page or not man_page.strip():
+            return None
+        return man_page, {'kind': 'man', 'path': man_path}
+
+
+class BuiltinProbe(DocumentationProbe):
+    """Asks bash for help on a shell builtin."""
+
+    def __init__(self, command_name, **kwargs):
+        super().__init__(**kwargs)
+        self.command_name = command_name
+
+    def run(self):
+        # The name is passed as a positional argument, never interpolated into the script
+        help_text = self.run_argv(['bash', '-c', 'help -- "$1"', 'bash', self.command_name])
+        if not help_text or not help_text.strip():
+            return None
+        return f"SHELL BUILTIN COMMAND:\n{help_text}", {'kind': 'builtin', 'path': shutil.which('bash')}
+
+
+class HelpProbe(DocumentationProbe):
+    """Runs a binary with a help flag such as --help or -h."""
+
+    def __init__(self, command_name, binary, flag, timeout=None, **kwargs):
+        super().__init__(timeout=HELP_PROBE_TIMEOUT if timeout is None else timeout, **kwargs)
+        self.command_name = command_name
+        self.binary = binary
+        self.flag = flag
+
+    def run(self):
+        help_text = self.run_argv([self.command_name, self.flag])
+        if not help_text or not help_text.strip():
+            return None
+        return f"COMMAND HELP OUTPUT:\n{help_text}", {'kind': 'help', 'path': self.binary}
+
+
+def _first_line(output):
+    lines = output.strip().splitlines() if output else []
+    return lines[0] if lines else None
+
+def _kill_process_group(proc):
+    """Kill a probe process and anything it spawned."""
+    if proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, AttributeError):
+        try:
+            proc.kill()
+        except OSError:
             pass
-        
-        # Try -h flag as last resort
+
+def file_identity(path):
+    """Return [mtime_ns, size] for a file, or None if it can't be stat'ed."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def path_fingerprint():
+    """
+    Fingerprint the contents of every directory on PATH.
+
+    A directory's mtime changes whenever an entry is added to or removed from
+    it, so this changes when a command is installed or uninstalled.
+    """
+    parts = []
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        identity = file_identity(directory) if directory else None
+        parts.append(f"{directory}:{identity[0] if identity else '-'}")
+    return hashlib.md5("\n".join(parts).encode('utf-8')).hexdigest()
+
+
+class RetrievalCache:
+    """
+    Caches retrieved documentation keyed by the file it was produced from.
+
+    Man pages are validated against the resolved man file, --help output
+    against the binary on PATH, and builtin help against bash itself. Negative
+    (NO_DOCUMENTATION) results are validated against a fingerprint of PATH so
+    they are dropped as soon as something is installed.
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.expanduser('~/.smartman/man_cache')
+        self.cache_dir = cache_dir
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _entry_path(self, command_name):
+        return os.path.join(self.cache_dir, hashlib.md5(command_name.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, command_name):
+        """Return cached text for the command if its source is unchanged, else None."""
+        entry = self.lookup(command_name)
+        return entry.get('text') if entry is not None else None
+
+    def lookup(self, command_name):
+        """
+        Return the cached entry for the command if its source is unchanged, else None.
+
+        Besides the text, an entry has the 'kind' of documentation and the
+        'path' and 'identity' of the file it was produced from.
+        """
+        try:
+            with open(self._entry_path(command_name), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('command') != command_name or entry.get('manpath') != os.environ.get('MANPATH'):
+            return None
+
+        kind = entry.get('kind')
+        if kind == 'none':
+            valid = entry.get('path_fingerprint') == path_fingerprint()
+        elif kind == 'help':
+            valid = shutil.which(command_name) == entry.get('path') and file_identity(entry.get('path')) == entry.get('identity')
+        else:
+            valid = entry.get('identity') is not None and file_identity(entry.get('path')) == entry.get('identity')
+        return entry if valid else None
+
+    def set(self, command_name, text, source):
+        """Store retrieved text together with the identity of its source."""
+        entry = {
+            'command': command_name,
+            'kind': source['kind'],
+            'path': source['path'],
+            'identity': file_identity(source['path']),
+            'manpath': os.environ.get('MANPATH'),
+            'text': text,
+        }
+        if source['kind'] == 'none':
+            entry['path_fingerprint'] = path_fingerprint()
+        elif entry['identity'] is None:
+            # Nothing stable to validate against
+            return
+
+        path = self._entry_path(command_name)
+        # Unique per process and thread, so concurrent writers never share a temp file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
-            help_text = subprocess.check_output([command_name, '-h'], 
-                                              text=True, stderr=subprocess.DEVNULL)
-            if help_text.strip():
-                return f"COMMAND HELP OUTPUT:\n{help_text}"
-        except (subprocess.CalledProcessError, FileNotFoundError):
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
             pass
-            
-        # If all else fails, return a message indicating no documentation was found
-        return f"NO_DOCUMENTATION: No manual page or help information found for '{command_name}'. Using general knowledge."
+
+_retrieval_cache = None
+
+def get_retrieval_cache():
+    """Return the process-wide RetrievalCache, creating it on first use."""
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        _retrieval_cache = RetrievalCache()
+    return _retrieval_cache
+
+# Sections sent to the model first, in this order; the rest follow in page order
+SECTION_PRIORITY = ('NAME', 'SYNOPSIS', 'DESCRIPTION', 'OPTIONS', 'EXAMPLES', 'EXAMPLE')
+
+# Sections that never help explain or use a command
+DROPPED_SECTIONS = {'AUTHOR', 'AUTHORS', 'COPYRIGHT', 'REPORTING BUGS', 'SEE ALSO', 'COLOPHON'}
+
+# Sections whose line breaks carry meaning and must not be reflowed
+VERBATIM_SECTIONS = {'SYNOPSIS', 'EXAMPLES', 'EXAMPLE'}
+
+# Markers get_man_page puts in front of non-man documentation
+DOC_PREFIXES = ('SHELL BUILTIN COMMAND:', 'COMMAND HELP OUTPUT:', 'NO_DOCUMENTATION:')
+
+DEFAULT_TOKEN_BUDGET = 4000
+
+_OVERSTRIKE_RE = re.compile(r'.\x08')
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+_SECTION_RE = re.compile(r"^[A-Z][A-Z0-9 ,/&()'-]*$")
+_TITLE_RE = re.compile(r'^(\S+\(\w+\))\s')
 
 def parse_man_page(man_text):
-    """Parse the retrieved man page text and return relevant information."""
-    # This is a placeholder for parsing logic.
-    # Implement parsing logic to extract summaries or specific sections as needed.
-    return man_text.strip()  # For now, just return the raw text.
\ No newline at end of file
+    """
+    Parse rendered man page text into sections and option entries.
+
+    Returns a dict with:
+        'header': the title line (e.g. "LS(1) User Commands LS(1)") or None
+        'sections': {name: [block, ...]} in page order, where each block is a
+            paragraph, option entry or verbatim group as a list of
+            (indent, text) lines; text without section headings goes under ''
+        'options': [{'flags': "-a, --all", 'description': "..."}] for every
+            option entry on the page
+    """
+    lines = [_ANSI_RE.sub('', _OVERSTRIKE_RE.sub('', line)).rstrip() for line in man_text.splitlines()]
+
+    header = None
+    non_empty = [i for i, line in enumerate(lines) if line.strip()]
+    if non_empty:
+        match = _TITLE_RE.match(lines[non_empty[0]])
+        if match:
+            header = ' '.join(lines[non_empty[0]].split())
+            last = non_empty[-1]
+            # Drop the footer, which repeats the page title at the end of the line
+            if last != non_empty[0] and lines[last].rstrip().endswith(match.group(1)):
+                lines[last] = ''
+            lines[non_empty[0]] = ''
+
+    sections = {}
+    current = ''
+    body = {current: []}
+    for line in lines:
+        if line and not line[0].isspace() and _SECTION_RE.match(line):
+            current = ' '.join(line.split())
+            body.setdefault(current, [])
+        else:
+            body[current].append(line)
+
+    options = []
+    for name, section_lines in body.items():
+        blocks = _split_blocks(section_lines)
+        if blocks or name:
+            sections[name] = blocks
+        for block in blocks:
+            option = _as_option(block)
+            if option:
+                options.append(option)
+
+    return {'header': header, 'sections': sections, 'options': options}
+
+def _split_blocks(section_lines):
+    """Split a section body into blank-line separated blocks of (indent, text) lines."""
+    blocks = []
+    block = []
+    for line in section_lines:
+        if not line.strip():
+            if block:
+                blocks.append(block)
+                block = []
+            continue
+        stripped = line.lstrip()
+        block.append((len(line) - len(stripped), stripped))
+    if block:
+        blocks.append(block)
+    return blocks
+
+def _as_option(block):
+    """Return {'flags', 'description'} if the block is an option entry, else None."""
+    indent, first = block[0]
+    if not first.startswith('-'):
+        return None
+    rest = block[1:]
+    if rest and all(line_indent > indent for line_indent, _ in rest):
+        return {'flags': first, 'description': _unwrap(text for _, text in rest)}
+    # Tagged paragraph on one line, e.g. "-a     do not ignore entries"
+    parts = re.split(r'\s{2,}', first, maxsplit=1)
+    if not rest and len(parts) == 2:
+        return {'flags': parts[0], 'description': _squash(parts[1])}
+    return None
+
+def _squash(text):
+    """Collapse the runs of spaces left by justified 80-column formatting."""
+    return ' '.join(text.split())
+
+def _render_block(block, section_name):
+    """Render one block compactly: options as "flags: description", prose unwrapped."""
+    option = _as_option(block)
+    if option:
+        return f"{option['flags']}: {option['description']}"
+    indents = {indent for indent, _ in block}
+    if section_name in VERBATIM_SECTIONS or len(indents) > 1:
+        base = min(indents)
+        return '\n'.join(' ' * (indent - base) + text for indent, text in block)
+    return _unwrap(text for _, text in block)
+
+def _unwrap(texts):
+    """Join wrapped lines into one, rejoining words groff hyphenated across lines."""
+    joined = ''
+    for text in texts:
+        text = _squash(text)
+        if joined.endswith('\u2010'):
+            joined = joined[:-1] + text
+        else:
+            joined = f"{joined} {text}" if joined else text
+    return joined
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+def render_sections(man_text):
+    """
+    Render documentation compactly, section by section.
+
+    Returns (prefix, header, sections): the get_man_page marker line (if any),
+    the page title line (if any), and {name: [rendered block, ...]} in page
+    order with boilerplate sections dropped. NO_DOCUMENTATION text yields
+    no sections.
+    """
+    prefix = ''
+    for marker in DOC_PREFIXES:
+        if man_text.startswith(marker):
+            if marker == 'NO_DOCUMENTATION:':
+                return '', None, {}
+            prefix = marker + '\n'
+            man_text = man_text[len(marker):]
+            break
+
+    parsed = parse_man_page(man_text)
+    sections = {}
+    for name, blocks in parsed['sections'].items():
+        if name not in DROPPED_SECTIONS:
+            sections[name] = [_render_block(block, name) for block in blocks]
+    return prefix, parsed['header'], sections
+
+def build_prompt_context(man_text, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Condense documentation to fit a token budget for the LLM prompt.
+
+    Sections are kept by priority (NAME, SYNOPSIS, DESCRIPTION, OPTIONS,
+    EXAMPLES, then the rest in page order) one paragraph or option entry at a
+    time until the budget is reached; the block that crosses it is cut at a
+    line boundary and everything after it is left out. Boilerplate sections such as AUTHOR,
+    COPYRIGHT, REPORTING BUGS and SEE ALSO are dropped, overstrike/padding is
+    removed and wrapped prose is unwrapped. The result keeps page order.
+    A token_budget of None keeps everything.
+    """
+    prefix, header, sections = render_sections(man_text)
+    if not prefix and header is None and not sections:
+        return man_text
+    if token_budget is None:
+        return _join_sections(prefix, header, sections)
+
+    ranked = [name for name in SECTION_PRIORITY if name in sections]
+    ranked += [name for name in sections if name not in ranked]
+
+    remaining = token_budget - estimate_tokens(prefix + (header or ''))
+    kept = {}
+    for name in ranked:
+        remaining -= estimate_tokens(name + '\n\n')
+        rendered = []
+        for text in sections[name]:
+            cost = estimate_tokens(text + '\n')
+            if cost > remaining:
+                # Budget reached: keep whatever lines of this block still fit
+                partial = []
+                for line in text.split('\n'):
+                    remaining -= estimate_tokens(line + '\n')
+                    if remaining < 0:
+                        break
+                    partial.append(line)
+                rendered.extend(partial + ['[...]'] if partial else [])
+                remaining = 0
+                break
+            rendered.append(text)
+            remaining -= cost
+        if rendered:
+            kept[name] = rendered
+        if remaining <= 0:
+            break
+
+    return _join_sections(prefix, header, {name: kept[name] for name in sections if name in kept})
+
+def split_man_page(man_text, chunk_tokens):
+    """
+    Split documentation into chunks of roughly chunk_tokens along section boundaries.
+
+    Whole sections are packed together while they fit; a section larger than
+    a chunk is split between paragraphs/option entries (and an oversized
+    block between lines), with its heading repeated as "NAME (continued)".
+    Every chunk starts with the page title so it can be understood alone.
+    """
+    prefix, header, sections = render_sections(man_text)
+    if not sections:
+        return [man_text]
+
+    lead = prefix + (header + '\n\n' if header else '')
+    budget = max(chunk_tokens - estimate_tokens(lead), 1)
+    chunks = []
+    current = []
+    spent = 0
+
+    for name, blocks in sections.items():
+        pieces = []
+        for text in blocks:
+            # A block bigger than a whole chunk is split between lines
+            pieces.extend([text] if estimate_tokens(text + '\n') <= budget else text.split('\n'))
+        for index, piece in enumerate(pieces):
+            # Sections split across chunks repeat their heading, marked as continued
+            title = f"{name} (continued)" if index and name else name
+            opens_section = not current or current[-1][0] != name
+            cost = estimate_tokens(piece + '\n') + (estimate_tokens(title + '\n\n') if opens_section else 0)
+            if current and spent + cost > budget:
+                chunks.append(lead + _join_parts(current))
+                current, spent = [], 0
+                if not opens_section:
+                    opens_section = True
+                    cost += estimate_tokens(title + '\n\n')
+            if opens_section:
+                current.append((name, title, []))
+            current[-1][2].append(piece)
+            spent += cost
+    if current:
+        chunks.append(lead + _join_parts(current))
+    return chunks
+
+def _join_parts(parts):
+    """Join (name, title, blocks) parts into text, one paragraph per section."""
+    return '\n\n'.join('\n'.join(([title] if title else []) + blocks) for _, title, blocks in parts)
+
+def _join_sections(prefix, header, sections):
+    """Join the marker, title and {name: [rendered block, ...]} back into prompt text."""
+    parts = [header] if header else []
+    for name, blocks in sections.items():
+        parts.append('\n'.join(([name] if name else []) + blocks))
+    return prefix + '\n\n'.join(parts)
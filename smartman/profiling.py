@@ -0,0 +1,221 @@
+"""
+Opt-in wall time breakdown of a smartman invocation.
+
+`smartman --profile ...` (or SMARTMAN_PROFILE=1) times the phases of a
+command -- imports, config loading, man page retrieval, cache I/O, LLM
+requests and rendering -- and prints a table on stderr at exit. Each
+phase is charged its own time only: a cache lookup inside an LLM request
+counts as cache, not as request. Counters, such as the input, output and
+prompt-cached tokens reported by the provider, are listed below the table.
+`--profile-output` also writes the breakdown as JSON (a .json path) or a
+cProfile dump (any other path, for `python -m pstats` or snakeviz).
+
+When profiling is off, phase() returns a shared no-op context manager and
+timed() functions make a single flag check before calling through.
+"""
+
+import functools
+import json
+import sys
+import threading
+import time
+
+ENV_VAR = 'SMARTMAN_PROFILE'
+OUTPUT_ENV_VAR = 'SMARTMAN_PROFILE_OUTPUT'
+
+_started = time.perf_counter()
+_imports = None
+_enabled = False
+_profiler = None
+_lock = threading.Lock()
+_local = threading.local()
+# phase name -> [seconds, calls]
+_totals = {}
+# counter name -> total
+_counters = {}
+
+
+class _Phase:
+    """Times one entry into a phase, excluding the time spent in nested phases."""
+
+    __slots__ = ('name', 'start', 'children')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.children = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        record(self.name, elapsed - self.children)
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def enable(cprofile=False):
+    """Start recording phases, and run cProfile as well when cprofile is true."""
+    global _enabled, _profiler
+    _enabled = True
+    if cprofile and _profiler is None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """Stop profiling and forget everything recorded so far."""
+    global _enabled, _profiler, _started
+    if _profiler is not None:
+        _profiler.disable()
+    _enabled = False
+    _profiler = None
+    _started = time.perf_counter()
+    _local.stack = []
+    with _lock:
+        _totals.clear()
+        _counters.clear()
+
+def mark_imported():
+    """Note that the CLI finished importing; the time since this module was imported is the imports phase."""
+    global _imports
+    if _imports is None:
+        _imports = time.perf_counter() - _started
+
+def record(name, seconds, calls=1):
+    """Add time to a phase."""
+    with _lock:
+        entry = _totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+def count(name, amount=1):
+    """Add to a counter, e.g. the tokens a response used."""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+def phase(name):
+    """Context manager timing the enclosed block as part of a phase."""
+    return _Phase(name) if _enabled else _NO_PHASE
+
+def timed(name):
+    """Decorator timing every call of a function as part of a phase."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def atimed(name):
+    """
+    Decorator timing every call of a coroutine function as part of a phase.
+
+    Coroutines interleave on one thread, so their time is not nested under
+    other phases: like phases timed in worker threads, concurrent calls overlap.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not _enabled:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def iterate(name, iterable):
+    """
+    Time the production of each item of an iterable as part of a phase.
+
+    For generators such as streamed responses, where a phase can't simply
+    be wrapped around code that yields.
+    """
+    if not _enabled:
+        return iterable
+    return _timed_items(name, iter(iterable))
+
+def _timed_items(name, iterator):
+    while True:
+        with _Phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def summary():
+    """
+    The breakdown so far: total wall time, the seconds and calls of each
+    phase, and the counters.
+
+    Phases timed in worker threads overlap; "other" is whatever wall time
+    no phase accounts for.
+    """
+    total = time.perf_counter() - _started
+    with _lock:
+        phases = {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in _totals.items()}
+        counters = dict(_counters)
+    if _imports is not None:
+        phases = {'imports': {'seconds': _imports, 'calls': 1}, **phases}
+    accounted = sum(entry['seconds'] for entry in phases.values())
+    phases['other'] = {'seconds': max(0.0, total - accounted), 'calls': 0}
+    return {'total': total, 'phases': phases, 'counters': counters}
+
+def report(console):
+    """Print the breakdown as a table on a rich console."""
+    from rich.table import Table
+
+    data = summary()
+    table = Table(title="smartman profile", title_justify="left")
+    table.add_column("phase")
+    table.add_column("calls", justify="right")
+    table.add_column("ms", justify="right")
+    table.add_column("%", justify="right")
+    for name, entry in sorted(data['phases'].items(), key=lambda item: -item[1]['seconds']):
+        share = entry['seconds'] / data['total'] if data['total'] else 0.0
+        table.add_row(name, str(entry['calls'] or ""), f"{entry['seconds'] * 1000:.1f}", f"{share:.0%}")
+    table.add_row("total", "", f"{data['total'] * 1000:.1f}", "", style="bold")
+    console.print(table)
+    for name, value in data['counters'].items():
+        console.print(f"{name}: {value}")
+
+def write(path):
+    """Write the breakdown as JSON to a .json path, otherwise the cProfile stats."""
+    if path.endswith('.json') or _profiler is None:
+        with open(path, 'w') as f:
+            json.dump(dict(summary(), argv=sys.argv), f, indent=2)
+        return
+    _profiler.disable()
+    _profiler.dump_stats(path)
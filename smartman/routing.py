@@ -0,0 +1,228 @@
+"""
+Latency-aware routing across provider/model backends.
+
+Each request goes to the fastest healthy backend, judged by rolling latency
+and error-rate statistics that are persisted between invocations. Transient
+failures (429, 5xx, timeouts, dropped connections) are retried with jittered
+exponential backoff before failing over to the next backend, and a backend
+that keeps failing is skipped by a circuit breaker until its cooldown ends.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+
+from smartman.llm_interface import is_transient
+
+DEFAULT_STATS_PATH = '~/.smartman/routing_stats.json'
+
+# Weight of the newest sample in the rolling latency and error-rate averages
+SMOOTHING = 0.3
+
+
+def backend_key(llm):
+    """Name a backend in the stats file, e.g. "openai/gpt-4o" or "openai/gpt-4o@http://localhost:8000/v1"."""
+    base_url = getattr(llm, 'base_url', None)
+    return f"{llm.provider}/{llm.model}@{base_url}" if base_url else f"{llm.provider}/{llm.model}"
+
+
+class Router:
+    """
+    Sends requests to the currently fastest healthy backend, failing over on errors.
+
+    Backends are LLMInterface instances; requests go through their
+    _call_direct/_stream_direct methods. With no statistics yet, backends
+    are tried in the order given.
+    """
+
+    def __init__(self, backends, retries=2, backoff=0.5, max_backoff=8.0, failure_threshold=3,
+                 cooldown=60.0, stats_path=DEFAULT_STATS_PATH):
+        """
+        Args:
+            backends: LLMInterface instances to route between, in order of preference
+            retries: Retries of a transient failure on one backend before failing over
+            backoff: Base delay in seconds of the exponential backoff between retries
+            max_backoff: Upper bound in seconds of one backoff delay
+            failure_threshold: Consecutive failures that open a backend's circuit breaker
+            cooldown: Seconds an open circuit breaker skips the backend before trying it again
+            stats_path: JSON file the statistics are persisted in; None keeps them in memory
+        """
+        self.backends = list(backends)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stats_path = os.path.expanduser(stats_path) if stats_path else None
+        self._lock = threading.Lock()
+        self.stats = self._load()
+
+    def order(self):
+        """
+        The backends to try, best first.
+
+        Backends with a closed circuit (or whose cooldown has ended) are
+        ranked by expected latency per successful request; unmeasured ones go
+        first so they get measured. If every circuit is open, all backends are
+        returned in the order their cooldowns end.
+        """
+        now = time.time()
+        with self._lock:
+            stats = {backend_key(llm): dict(self.stats.get(backend_key(llm), {})) for llm in self.backends}
+        healthy = [llm for llm in self.backends if stats[backend_key(llm)].get('open_until', 0) <= now]
+        if not healthy:
+            return sorted(self.backends, key=lambda llm: stats[backend_key(llm)]['open_until'])
+
+        def expected_latency(llm):
+            entry = stats[backend_key(llm)]
+            if not entry.get('requests'):
+                return 0.0
+            if not entry.get('latency'):
+                # Tried, but never answered
+                return float('inf')
+            return entry['latency'] / (1 - min(entry.get('error_rate', 0.0), 0.9))
+        return sorted(healthy, key=expected_latency)
+
+    def call(self, prompt):
+        """Return the answer of the first backend that succeeds."""
+        errors = []
+        for llm in self.order():
+            for attempt in range(self.retries + 1):
+                start = time.monotonic()
+                try:
+                    result = llm._call_direct(prompt)
+                except Exception as e:
+                    if not self._failed(llm, e, attempt, errors):
+                        break
+                    time.sleep(self._delay(attempt))
+                    continue
+                self.record(llm, time.monotonic() - start)
+                return result
+        raise errors[0]
+
+    def stream(self, prompt):
+        """
+        Stream the answer of the first backend that starts producing one.
+
+        Failover only happens before the first chunk; an error once output
+        has been yielded is raised as is.
+        """
+        errors = []
+        for llm in self.order():
+            for attempt in range(self.retries + 1):
+                start = time.monotonic()
+                try:
+                    # Some backends (the custom provider) connect before returning the stream
+                    stream = llm._stream_direct(prompt)
+                    first = next(stream, None)
+                except Exception as e:
+                    if not self._failed(llm, e, attempt, errors):
+                        break
+                    time.sleep(self._delay(attempt))
+                    continue
+                yield from self._finish_stream(llm, start, first, stream)
+                return
+        raise errors[0]
+
+    def _finish_stream(self, llm, start, first, stream):
+        try:
+            if first is not None:
+                yield first
+                yield from stream
+        except Exception as e:
+            self.record(llm, None, e)
+            raise
+        self.record(llm, time.monotonic() - start)
+
+    async def acall(self, prompt):
+        """Async variant of call() for AsyncLLMInterface."""
+        # Only async callers need asyncio, so the sync CLI doesn't pay for importing it
+        import asyncio
+
+        errors = []
+        for llm in self.order():
+            for attempt in range(self.retries + 1):
+                start = time.monotonic()
+                try:
+                    result = await llm._call_direct(prompt)
+                except Exception as e:
+                    if not self._failed(llm, e, attempt, errors):
+                        break
+                    await asyncio.sleep(self._delay(attempt))
+                    continue
+                self.record(llm, time.monotonic() - start)
+                return result
+        raise errors[0]
+
+    def _failed(self, llm, error, attempt, errors):
+        """Record a failed attempt; returns whether to retry on the same backend."""
+        errors.append(error)
+        self.record(llm, None, error)
+        return is_transient(error) and attempt < self.retries and not self.is_open(llm)
+
+    def _delay(self, attempt):
+        """Exponential backoff with full jitter, so clients retrying together spread out."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def is_open(self, llm):
+        """Whether the backend's circuit breaker is currently skipping it."""
+        with self._lock:
+            return self.stats.get(backend_key(llm), {}).get('open_until', 0) > time.time()
+
+    def record(self, llm, latency, error=None):
+        """Update a backend's statistics with one request outcome and persist them."""
+        key = backend_key(llm)
+        with self._lock:
+            entry = self.stats.setdefault(key, {'latency': 0.0, 'error_rate': 0.0, 'failures': 0,
+                                                 'requests': 0, 'open_until': 0})
+            first = entry['requests'] == 0
+            entry['requests'] += 1
+            entry['error_rate'] += SMOOTHING * ((error is not None) - entry['error_rate'])
+            if error is None:
+                entry['latency'] = latency if first or not entry['latency'] else \
+                    entry['latency'] + SMOOTHING * (latency - entry['latency'])
+                entry['failures'] = 0
+                entry['open_until'] = 0
+            else:
+                entry['failures'] += 1
+                if entry['failures'] >= self.failure_threshold:
+                    # Also re-opens a half-open circuit whose trial request failed
+                    entry['open_until'] = time.time() + self.cooldown
+            self._save(key, dict(entry))
+
+    def _load(self):
+        if self.stats_path is None:
+            return {}
+        try:
+            with open(self.stats_path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return stats if isinstance(stats, dict) else {}
+
+    def _save(self, key, entry):
+        """
+        Write one backend's entry into the stats file.
+
+        The file is re-read first so entries updated by other processes are
+        kept, and replaced atomically so readers never see a partial file.
+        """
+        if self.stats_path is None:
+            return
+        stats = self._load()
+        stats[key] = entry
+        tmp_path = f"{self.stats_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(stats, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.stats_path)
+        except OSError:
+            pass
+
+
+def load_stats(stats_path=DEFAULT_STATS_PATH):
+    """Read the persisted statistics: {"provider/model": {latency, error_rate, failures, requests, open_until}}."""
+    return Router([], stats_path=stats_path).stats
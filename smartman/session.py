@@ -0,0 +1,161 @@
+"""
+In-memory state of a `smartman interactive` session.
+
+Retrieved documentation and answers are kept in a small LRU, so asking
+about the same command again in a session costs neither a man render nor
+a cache lookup. After a summary has been shown, the examples of the same
+command are requested in the background, since that is very often the
+next question; a prefetch is spent only while the session's budget lasts.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from smartman import man_retriever
+
+# Action whose answer is prefetched after each action
+PREFETCH_NEXT = {'summary': 'example'}
+
+
+class LRU:
+    """A thread-safe mapping that forgets its least recently used keys beyond max_entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max(0, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InteractiveSession:
+    """
+    Pages and answers of one interactive session, with background prefetching.
+
+    Args:
+        llm: The session's LLMInterface, shared with the prefetch threads
+        max_entries: Pages and answers each kept in memory
+        prefetch: Whether to prefetch the likely next answer
+        prefetch_budget: Prefetches allowed in the session
+    """
+
+    def __init__(self, llm, max_entries=128, prefetch=True, prefetch_budget=20):
+        self.llm = llm
+        self.pages = LRU(max_entries)
+        self.answers = LRU(max_entries)
+        self.prefetch_budget = prefetch_budget if prefetch else 0
+        self.prefetches = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def page(self, command_name):
+        """The documentation of a command, retrieved once per session."""
+        text = self.pages.get(command_name)
+        if text is None:
+            text = man_retriever.get_man_page(command_name)
+            self.pages.put(command_name, text)
+        return text
+
+    def cached(self, action, argument):
+        """
+        The answer already known for an action, or None.
+
+        Waits for a prefetch of the same answer still in flight rather than
+        requesting it a second time; a failed prefetch counts as unknown.
+        """
+        answer = self.answers.get((action, argument))
+        if answer is not None:
+            return answer
+        with self._lock:
+            pending = self._pending.get((action, argument))
+        if pending is None:
+            return None
+        try:
+            return pending.result()
+        except Exception:
+            return None
+
+    def answer(self, action, argument):
+        """Answer an action, using the session's answers when possible."""
+        answer = self.cached(action, argument)
+        if answer is None:
+            answer = self._request(action, argument)
+            self.answers.put((action, argument), answer)
+        return answer
+
+    def stream(self, action, argument):
+        """Stream the answer of an action, remembering it once it has been received completely."""
+        answer = self.cached(action, argument)
+        if answer is not None:
+            yield answer
+            return
+        if action == 'generate':
+            chunks = self.llm.stream_command(argument)
+        else:
+            method = self.llm.stream_summary if action == 'summary' else self.llm.stream_example
+            chunks = method(self.page(argument))
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.answers.put((action, argument), "".join(received))
+
+    def answered(self, action, argument):
+        """Note that an answer was shown, and prefetch the likely next one."""
+        next_action = PREFETCH_NEXT.get(action)
+        if next_action is not None:
+            self.prefetch(next_action, argument)
+
+    def prefetch(self, action, argument):
+        """
+        Request an answer in the background, unless it is known, in flight or the budget is spent.
+
+        Returns whether a prefetch was started.
+        """
+        key = (action, argument)
+        if self.answers.get(key) is not None:
+            return False
+        with self._lock:
+            if key in self._pending or self.prefetches >= self.prefetch_budget:
+                return False
+            self.prefetches += 1
+            future = self._pending[key] = Future()
+
+        def run():
+            try:
+                answer = self._request(action, argument)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                self.answers.put(key, answer)
+                future.set_result(answer)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+        # A daemon thread, so leaving the session never waits for a prefetch
+        threading.Thread(target=run, name=f"smartman-prefetch-{action}", daemon=True).start()
+        return True
+
+    def _request(self, action, argument):
+        if action == 'generate':
+            return self.llm.generate_command(argument)
+        if action == 'summary':
+            return self.llm.generate_summary(self.page(argument))
+        return self.llm.generate_example(self.page(argument))
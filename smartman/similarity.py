@@ -0,0 +1,244 @@
+"""
+Offline similarity cache for `generate` intents.
+
+Intents are free text, so "find all pdf files" and "find every PDF file"
+never share an exact cache key. Each answered intent is normalized, turned
+into a MinHash signature over character trigrams and words, and stored with
+its command in an SQLite index with locality-sensitive hashing (LSH) bands.
+A new intent looks up its band keys, verifies the few candidates by exact
+Jaccard similarity, and reuses the best command above the threshold. No
+network or model is involved; a lookup is a handful of indexed reads.
+"""
+
+import re
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+
+# Filler words that don't change which command is wanted
+STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'all', 'every', 'each', 'any', 'some', 'please', 'me', 'my', 'i',
+    'of', 'that', 'which', 'how', 'do', 'can', 'you', 'want', 'to', 'would', 'like',
+    'in', 'into', 'for', 'on',
+})
+# Words that flip the meaning of an otherwise similar intent
+NEGATIONS = frozenset({'not', 'no', 'without', 'except', 'excluding', 'never'})
+# Words that pick one end, direction or state of an otherwise similar intent
+DIRECTIONS = frozenset({
+    'head', 'tail', 'first', 'last', 'top', 'bottom', 'start', 'stop', 'begin', 'end',
+    'before', 'after', 'older', 'newer', 'oldest', 'newest', 'up', 'down', 'off',
+    'enable', 'disable', 'open', 'close', 'lock', 'unlock', 'add', 'remove',
+})
+# Prefixes that reverse a word: zip/unzip, mount/unmount, encrypt/decrypt, compress/decompress
+REVERSING_PREFIXES = ('un', 'de')
+
+NUM_PERMUTATIONS = 32
+# 8 bands of 4 rows: an intent with 0.8 Jaccard similarity shares a band with
+# 98.5% probability, one with 0.4 with 19%, so few candidates need verifying
+BAND_ROWS = 4
+# Candidates verified per lookup, those sharing the most bands first
+MAX_CANDIDATES = 32
+# Random XOR masks over a 64-bit shingle hash stand in for the permutations
+_rng = random.Random(0x5eed)
+_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERMUTATIONS)]
+
+_TOKEN = re.compile(r"[a-z0-9_./*~-]+")
+
+
+def normalize_intent(intent):
+    """
+    Reduce an intent to its significant words: lowercased, punctuation and
+    filler words dropped, simple plurals singularized.
+    """
+    words = []
+    for token in _TOKEN.findall(intent.lower()):
+        token = token.strip('.-')
+        if not token or token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss') and token.isalpha():
+            token = token[:-1]
+        words.append(token)
+    return " ".join(words)
+
+def shingles(normalized):
+    """Character trigrams (across word boundaries) plus whole words of a normalized intent."""
+    padded = f" {normalized} "
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    grams.update(f"w:{word}" for word in normalized.split())
+    return grams
+
+def guards(normalized):
+    """
+    Words that must match exactly for two intents to share a command.
+
+    Numbers, paths, globs, negations, direction words and un-/de- words
+    change the right command even when the rest of the intent is nearly
+    identical ("last 7 days" vs "last 30 days", "mount" vs "unmount"), and
+    so does the leading verb ("zip" vs "unzip", "encrypt" vs "decrypt").
+    """
+    words = normalized.split()
+    required = {f"verb:{words[0]}"} if words else set()
+    required.update(word for word in words
+                    if word in NEGATIONS or word in DIRECTIONS or not word.isalpha()
+                    or (word.startswith(REVERSING_PREFIXES) and len(word) > 4))
+    return frozenset(required)
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def minhash(grams):
+    """MinHash signature of a set of shingles."""
+    hashes = [int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'big')
+              for gram in grams] or [0]
+    return [min(map(mask.__xor__, hashes)) for mask in _MASKS]
+
+def band_keys(scope, signature):
+    """LSH band keys of a signature, namespaced by scope."""
+    keys = []
+    for band in range(0, NUM_PERMUTATIONS, BAND_ROWS):
+        digest = hashlib.blake2b(f"{scope}:{band}:{signature[band:band + BAND_ROWS]}".encode('utf-8'),
+                                 digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+class SimilarityIndex:
+    """
+    Intents and their commands in a single SQLite database in WAL mode.
+
+    Entries are grouped by scope (the provider, model and settings that
+    produced them) so a command is only reused under the same settings.
+    Expired entries are dropped and the least recently used ones evicted
+    beyond max_entries, as in the response cache.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS intents (
+            id INTEGER PRIMARY KEY,
+            scope TEXT NOT NULL,
+            normalized TEXT NOT NULL,
+            response TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            UNIQUE (scope, normalized)
+        );
+        CREATE INDEX IF NOT EXISTS intents_expires_at ON intents (expires_at);
+        CREATE INDEX IF NOT EXISTS intents_accessed_at ON intents (accessed_at);
+        CREATE TABLE IF NOT EXISTS bands (
+            band INTEGER NOT NULL,
+            intent_id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS bands_band ON bands (band);
+        CREATE INDEX IF NOT EXISTS bands_intent_id ON bands (intent_id);
+    """
+
+    def __init__(self, db_path, threshold=0.9, ttl_seconds=24 * 3600, max_entries=10000):
+        """
+        Args:
+            db_path: Path of the SQLite database
+            threshold: Minimum Jaccard similarity of two normalized intents to reuse a command
+            ttl_seconds: Seconds an entry stays valid
+            max_entries: Maximum number of intents kept
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def lookup(self, scope, intent):
+        """Return the command of the most similar stored intent above the threshold, or None."""
+        normalized = normalize_intent(intent)
+        if not normalized:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, response FROM intents WHERE scope = ? AND normalized = ? AND expires_at > ?",
+                (scope, normalized, now)).fetchone()
+            if row is None:
+                row = self._most_similar(scope, normalized, now)
+            if row is None:
+                return None
+            self._conn.execute("UPDATE intents SET accessed_at = ? WHERE id = ?", (now, row[0]))
+        return row[1]
+
+    def _most_similar(self, scope, normalized, now):
+        grams = shingles(normalized)
+        keys = band_keys(scope, minhash(grams))
+        candidates = self._conn.execute(
+            f"SELECT id, normalized, response FROM intents JOIN "
+            f"(SELECT intent_id, COUNT(*) AS shared FROM bands WHERE band IN ({','.join('?' * len(keys))}) "
+            f"GROUP BY intent_id ORDER BY shared DESC LIMIT ?) ON id = intent_id "
+            f"WHERE scope = ? AND expires_at > ?", (*keys, MAX_CANDIDATES, scope, now)).fetchall()
+        required = guards(normalized)
+        best, best_score = None, self.threshold
+        for intent_id, other, response in candidates:
+            if guards(other) != required:
+                continue
+            score = jaccard(grams, shingles(other))
+            if score >= best_score:
+                best, best_score = (intent_id, response), score
+        return best
+
+    def add(self, scope, intent, response):
+        """Store the command answering an intent."""
+        self.add_many(scope, [(intent, response)])
+
+    def add_many(self, scope, pairs):
+        """Store (intent, command) pairs in one transaction."""
+        now = time.time()
+        rows = []
+        for intent, response in pairs:
+            normalized = normalize_intent(intent)
+            if normalized and response:
+                rows.append((normalized, response, band_keys(scope, minhash(shingles(normalized)))))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for normalized, response, keys in rows:
+                    old = self._conn.execute("SELECT id FROM intents WHERE scope = ? AND normalized = ?",
+                                             (scope, normalized)).fetchone()
+                    if old is not None:
+                        self._delete([old])
+                    intent_id = self._conn.execute(
+                        "INSERT INTO intents (scope, normalized, response, expires_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?)", (scope, normalized, response, now + self.ttl_seconds, now)
+                    ).lastrowid
+                    self._conn.executemany("INSERT INTO bands (band, intent_id) VALUES (?, ?)",
+                                           [(key, intent_id) for key in keys])
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now):
+        """Drop expired intents, then least recently used ones beyond max_entries."""
+        self._delete(self._conn.execute("SELECT id FROM intents WHERE expires_at <= ?", (now,)).fetchall())
+        excess = self._conn.execute("SELECT COUNT(*) FROM intents").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._delete(self._conn.execute("SELECT id FROM intents ORDER BY accessed_at LIMIT ?",
+                                            (excess,)).fetchall())
+
+    def _delete(self, ids):
+        self._conn.executemany("DELETE FROM bands WHERE intent_id = ?", ids)
+        self._conn.executemany("DELETE FROM intents WHERE id = ?", ids)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,240 @@
+"""
+Cache warm-up for `smartman warm`.
+
+Lists every page in the manpath, renders them in a process pool (groff is
+the CPU-heavy part) and fills the response cache with bounded-concurrency
+LLM calls, so later `smartman summary X` calls are cache hits. Progress is
+checkpointed so an interrupted run resumes where it stopped.
+"""
+
+import os
+import json
+import fnmatch
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from smartman import man_retriever
+
+# Sections holding user and administration commands
+DEFAULT_SECTIONS = ('1', '8')
+DEFAULT_MANPATH = ('/usr/local/share/man', '/usr/share/man')
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.lzma', '.zst', '.Z')
+WARM_ACTIONS = ('summary', 'example')
+
+def manpath_dirs():
+    """Return the directories searched for man pages, as reported by `manpath`."""
+    try:
+        output = subprocess.run(['manpath', '-q'], capture_output=True, text=True,
+                                timeout=man_retriever.PROBE_TIMEOUT).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        output = ''
+    if not output:
+        output = os.environ.get('MANPATH', '').strip(':') or ':'.join(DEFAULT_MANPATH)
+    return [path for path in output.split(':') if path]
+
+def page_name(filename):
+    """Return the command name for a man page file, e.g. "tar.1.gz" -> "tar"."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if filename.endswith(suffix):
+            filename = filename[:-len(suffix)]
+            break
+    name, dot, _ = filename.rpartition('.')
+    return name if dot else None
+
+def list_pages(sections=DEFAULT_SECTIONS, include=(), exclude=(), dirs=None):
+    """
+    List the names of the pages in the manpath, sorted and without duplicates.
+
+    Args:
+        sections: Section prefixes to keep, e.g. ("1", "8"); "3" also matches "3p". Empty keeps all
+        include: Glob patterns a name must match (any of them); empty matches everything
+        exclude: Glob patterns of names to leave out
+        dirs: Manpath directories to scan (defaults to manpath_dirs())
+    """
+    return sorted(list_page_files(sections, include, exclude, dirs))
+
+def list_page_files(sections=DEFAULT_SECTIONS, include=(), exclude=(), dirs=None):
+    """Like list_pages, but return {name: path of its first file in manpath order}."""
+    names = {}
+    for root in (manpath_dirs() if dirs is None else dirs):
+        try:
+            subdirs = os.listdir(root)
+        except OSError:
+            continue
+        for subdir in sorted(subdirs):
+            section = subdir[3:]
+            if not subdir.startswith('man') or not section:
+                continue
+            if sections and not any(section.startswith(wanted) for wanted in sections):
+                continue
+            try:
+                filenames = os.listdir(os.path.join(root, subdir))
+            except OSError:
+                continue
+            for filename in filenames:
+                name = page_name(filename)
+                if not name:
+                    continue
+                if include and not any(fnmatch.fnmatchcase(name, pattern) for pattern in include):
+                    continue
+                if any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude):
+                    continue
+                names.setdefault(name, os.path.join(root, subdir, filename))
+    return names
+
+def render_page(name, path):
+    """
+    Render a page from its file and cache it as the name's documentation; runs in a pool worker process.
+
+    Only the man file is rendered, the command itself is never run. Returns
+    (name, text), with text None if the file could not be rendered.
+    """
+    text = man_retriever.render_man_file(path)
+    if text is not None:
+        man_retriever.get_retrieval_cache().set(name, text, {'kind': 'man', 'path': path})
+    return name, text
+
+
+class WarmCheckpoint:
+    """
+    Append-only record of the pages finished by a warm-up run.
+
+    The first line holds the settings the run was started with; each later
+    line names one finished page. A run with different settings (another
+    model, provider or action list) starts over instead of resuming.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self):
+        """Return the names already finished under the same settings."""
+        try:
+            with open(self.path, 'r') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return set()
+        try:
+            if not lines or json.loads(lines[0]) != self.settings:
+                return set()
+        except ValueError:
+            return set()
+        done = set()
+        for line in lines[1:]:
+            try:
+                done.add(json.loads(line)['name'])
+            except (ValueError, KeyError, TypeError):
+                # A line cut short by an interruption
+                continue
+        return done
+
+    def start(self, resume=True):
+        """Open the checkpoint for appending, discarding it unless resuming a matching run."""
+        done = self.load() if resume else set()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if done:
+            self._file = open(self.path, 'a')
+        else:
+            self._file = open(self.path, 'w')
+            self._file.write(json.dumps(self.settings, sort_keys=True) + '\n')
+            self._file.flush()
+        return done
+
+    def record(self, name):
+        """Mark a page as finished."""
+        with self._lock:
+            self._file.write(json.dumps({'name': name}) + '\n')
+            self._file.flush()
+
+    def close(self, finished=False):
+        """Close the checkpoint, removing it once the whole run has finished."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if finished:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def warm_page(llm, name, text, actions):
+    """
+    Fill the cache for one page and return its outcome: "warmed", "cached" or "failed".
+
+    Pages that could not be rendered (text is None) are reported as failed
+    rather than cached, since their answer would come from general knowledge.
+    """
+    if text is None:
+        return "failed"
+    outcome = "cached"
+    for action in actions:
+        if llm.get_cached(action, llm.document_prompt(action, text)) is not None:
+            continue
+        if action == 'summary':
+            llm.generate_summary(text)
+        else:
+            llm.generate_example(text)
+        outcome = "warmed"
+    return outcome
+
+def warm_cache(llm, files, actions=('summary',), concurrency=4, processes=None,
+               checkpoint=None, on_result=None):
+    """
+    Warm the response cache for every page in files ({name: path of its man file}).
+
+    Pages are rendered from their files by a pool of `processes` worker processes (in this
+    process when processes is 1) and sent to the LLM by `concurrency`
+    threads. Each finished page is recorded in the checkpoint and reported
+    to on_result(name, outcome, error), one call at a time. On interruption,
+    queued pages are dropped and only requests already in flight are awaited.
+
+    Returns a dict counting the "warmed", "cached" and "failed" pages.
+    """
+    counts = {'warmed': 0, 'cached': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def process(name, text):
+        error = None
+        try:
+            outcome = warm_page(llm, name, text, actions)
+        except Exception as e:
+            outcome, error = "failed", str(e)
+        if outcome != "failed" and checkpoint is not None:
+            checkpoint.record(name)
+        with lock:
+            counts[outcome] += 1
+            if on_result is not None:
+                on_result(name, outcome, error)
+
+    processes = processes or os.cpu_count() or 1
+    pages = None
+    if processes > 1:
+        # Imported here: it pulls in multiprocessing, which every other command can skip
+        from concurrent.futures import ProcessPoolExecutor
+        pages = ProcessPoolExecutor(max_workers=processes)
+    llm_pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    submitted = []
+    fetched = None
+    try:
+        names, paths = list(files), list(files.values())
+        fetched = (pages.map(render_page, names, paths, chunksize=4) if pages
+                   else map(render_page, names, paths))
+        for name, text in fetched:
+            submitted.append(llm_pool.submit(process, name, text))
+        llm_pool.shutdown(wait=True)
+    finally:
+        # Cancelled by hand: shutdown(cancel_futures=True) needs Python 3.9
+        for future in submitted:
+            future.cancel()
+        llm_pool.shutdown(wait=True)
+        if pages is not None:
+            if fetched is not None:
+                # Closing the map's iterator cancels the pages still queued
+                fetched.close()
+            pages.shutdown(wait=False)
+    return counts
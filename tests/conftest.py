@@ -8,6 +8,7 @@ These fixtures help isolate tests by mocking external dependencies.
 import pytest
 import os
 from unittest.mock import patch, MagicMock
+from smartman.llm_interface import format_description
 
 # Sample test data that can be reused across tests
 TEST_DATA = {
@@ -58,6 +59,27 @@ def mock_env_vars():
         elif key in os.environ:
             del os.environ[key]
 
+@pytest.fixture(autouse=True)
+def isolated_retrieval_cache(tmp_path):
+    """
+    Give every test an empty retrieval cache instead of the one in ~/.smartman.
+
+    Keeps the CLI from serving answers indexed by earlier runs on this machine.
+    """
+    from smartman import man_retriever
+
+    with patch.object(man_retriever, '_retrieval_cache', man_retriever.RetrievalCache(str(tmp_path / 'man_cache'))):
+        yield
+
+@pytest.fixture(autouse=True)
+def no_daemon(monkeypatch):
+    """
+    Keep the CLI from forwarding to a `smartman serve` running on this machine.
+
+    Tests that exercise the daemon clear SMARTMAN_NO_DAEMON themselves.
+    """
+    monkeypatch.setenv('SMARTMAN_NO_DAEMON', '1')
+
 @pytest.fixture(autouse=True)
 def mock_llm_interface():
     """
@@ -92,9 +114,13 @@ def mock_llm_interface():
             else:
                 return "echo 'Command generated based on: " + intent + "'"
         
+        def describe_command(text):
+            return format_description(get_summary_for_command(text), get_example_for_command(text))
+
         # Configure side effect functions that can dynamically respond based on input
         instance.generate_summary.side_effect = get_summary_for_command
         instance.generate_example.side_effect = get_example_for_command
+        instance.generate_description.side_effect = describe_command
         instance.generate_command.side_effect = generate_command_from_intent
         
         mock_llm.return_value = instance
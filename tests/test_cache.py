@@ -5,14 +5,24 @@ This module tests the cache implementation to ensure:
 1. Responses are properly cached
 2. Cached responses are retrieved correctly
 3. Cache expiration works as expected
+4. The SQLite backend evicts least recently used entries and migrates the file cache
+5. The file backend shards, compresses and atomically replaces entries
+6. Single-flight locks serialize identical work across threads and processes
+7. Index entries lead to the response they were linked to
 """
 
 import pytest
 import os
 import tempfile
 import time
+import sqlite3
+import subprocess
+import sys
+import threading
+import json
+from datetime import datetime
 from unittest.mock import patch, MagicMock
-from smartman.cache import ResponseCache
+from smartman.cache import ResponseCache, SQLiteCacheStorage, SingleFlight
 
 
 class TestResponseCache:
@@ -98,6 +108,24 @@ class TestResponseCache:
         # Check that None is returned for a cache miss
         assert cached_response is None
     
+    @pytest.mark.parametrize("backend", ["sqlite", "file"])
+    def test_linked_response(self, temp_cache_dir, backend):
+        """
+        Test that an index entry finds the response it was linked to.
+
+        Verifies that:
+        1. The response is found through the index text alone
+        2. Unknown index texts and links to missing responses are misses
+        """
+        cache = ResponseCache(cache_dir=temp_cache_dir, backend=backend)
+        cache.cache_response("full prompt", "summary", "A summary")
+        cache.link("ls.1 settings", "full prompt", "summary")
+        cache.link("tar.1 settings", "other prompt", "summary")
+
+        assert cache.get_linked_response("ls.1 settings") == "A summary"
+        assert cache.get_linked_response("grep.1 settings") is None
+        assert cache.get_linked_response("tar.1 settings") is None
+
     def test_cache_expiration(self, temp_cache_dir):
         """
         Test that cached responses expire correctly.
@@ -125,6 +153,304 @@ class TestResponseCache:
         assert cached_response is None
 
 
+class TestSQLiteBackend:
+    """Test suite for the SQLite storage backend."""
+
+    @pytest.fixture
+    def temp_cache_dir(self):
+        """Create a temporary directory for the cache database."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    def test_database_uses_wal_mode(self, temp_cache_dir):
+        """
+        Test that the cache database is created in WAL journal mode.
+        """
+        ResponseCache(cache_dir=temp_cache_dir).close()
+
+        conn = sqlite3.connect(os.path.join(temp_cache_dir, 'cache.db'))
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
+
+    def test_lru_eviction_by_entry_count(self, temp_cache_dir):
+        """
+        Test that the least recently used entry is evicted past max_entries.
+
+        Verifies that:
+        1. Reading an entry refreshes its recency
+        2. The oldest unread entry is the one evicted
+        """
+        cache = ResponseCache(cache_dir=temp_cache_dir, max_entries=2)
+
+        cache.cache_response("a", "summary", "response a")
+        time.sleep(0.01)
+        cache.cache_response("b", "summary", "response b")
+        time.sleep(0.01)
+        assert cache.get_cached_response("a", "summary") == "response a"
+        time.sleep(0.01)
+        cache.cache_response("c", "summary", "response c")
+
+        assert cache.get_cached_response("a", "summary") == "response a"
+        assert cache.get_cached_response("b", "summary") is None
+        assert cache.get_cached_response("c", "summary") == "response c"
+
+    def test_reads_do_not_write(self, temp_cache_dir):
+        """
+        Test that a hit records its access time without writing to the database.
+
+        Verifies that:
+        1. The stored access time is unchanged after a hit
+        2. It is written with the next write
+        """
+        cache = ResponseCache(cache_dir=temp_cache_dir)
+        cache.cache_response("a", "summary", "response a")
+        conn = sqlite3.connect(os.path.join(temp_cache_dir, 'cache.db'))
+        stored = conn.execute("SELECT accessed_at FROM entries").fetchone()[0]
+
+        time.sleep(0.01)
+        assert cache.get_cached_response("a", "summary") == "response a"
+        assert conn.execute("SELECT accessed_at FROM entries").fetchone()[0] == stored
+
+        cache.cache_response("b", "summary", "response b")
+        key = cache.get_cache_key("summary:a")
+        assert conn.execute("SELECT accessed_at FROM entries WHERE key = ?", (key,)).fetchone()[0] > stored
+        conn.close()
+        cache.close()
+
+    def test_database_errors_are_misses(self, temp_cache_dir):
+        """
+        Test that a locked or corrupt database never fails a lookup or a write.
+        """
+        cache = ResponseCache(cache_dir=temp_cache_dir)
+        cache.cache_response("a", "summary", "response a")
+
+        failing = MagicMock()
+        failing.execute.side_effect = sqlite3.OperationalError("database is locked")
+        failing.executemany.side_effect = sqlite3.OperationalError("database is locked")
+        cache.storage._conn = failing
+        assert cache.get_cached_response("a", "summary") is None
+        cache.cache_response("b", "summary", "response b")
+
+        failing.execute.side_effect = sqlite3.DatabaseError("database disk image is malformed")
+        assert cache.get_cached_response("a", "summary") is None
+        cache.cache_response("b", "summary", "response b")
+
+    def test_eviction_by_total_bytes(self, temp_cache_dir):
+        """
+        Test that entries are evicted once the byte limit is exceeded.
+        """
+        cache = ResponseCache(cache_dir=temp_cache_dir, max_bytes=25)
+
+        cache.cache_response("a", "summary", "x" * 10)
+        time.sleep(0.01)
+        cache.cache_response("b", "summary", "y" * 10)
+        time.sleep(0.01)
+        cache.cache_response("c", "summary", "z" * 10)
+
+        assert cache.get_cached_response("a", "summary") is None
+        assert cache.get_cached_response("b", "summary") == "y" * 10
+        assert cache.get_cached_response("c", "summary") == "z" * 10
+
+    def test_file_cache_is_migrated(self, temp_cache_dir):
+        """
+        Test that entries written by the file backend are imported.
+
+        Verifies that:
+        1. A valid legacy entry is readable through the SQLite backend
+        2. Legacy files are removed after the import
+        """
+        legacy = ResponseCache(cache_dir=temp_cache_dir, backend="file")
+        legacy.cache_response("legacy prompt", "summary", "legacy response")
+        key = legacy.get_cache_key("summary:legacy prompt")
+        assert os.path.exists(os.path.join(temp_cache_dir, key[:2], key))
+        flat_key = legacy.get_cache_key("summary:flat prompt")
+        with open(os.path.join(temp_cache_dir, flat_key), 'w') as f:
+            json.dump({'timestamp': datetime.now().isoformat(), 'response': "flat response"}, f)
+
+        cache = ResponseCache(cache_dir=temp_cache_dir)
+
+        assert cache.get_cached_response("legacy prompt", "summary") == "legacy response"
+        assert cache.get_cached_response("flat prompt", "summary") == "flat response"
+        assert not os.path.exists(os.path.join(temp_cache_dir, key[:2], key))
+        assert not os.path.exists(os.path.join(temp_cache_dir, flat_key))
+
+    def test_failed_migration_keeps_legacy_files(self, temp_cache_dir):
+        """
+        Test that legacy files survive an import that fails before committing.
+
+        Verifies that:
+        1. No legacy file is removed when the transaction fails
+        2. The next start imports them
+        """
+        legacy = ResponseCache(cache_dir=temp_cache_dir, backend="file")
+        legacy.cache_response("legacy prompt", "summary", "legacy response")
+        key = legacy.get_cache_key("summary:legacy prompt")
+
+        with patch.object(SQLiteCacheStorage, '_evict', side_effect=sqlite3.OperationalError("database is locked")):
+            failed = ResponseCache(cache_dir=temp_cache_dir)
+        assert os.path.exists(os.path.join(temp_cache_dir, key[:2], key))
+        assert failed.get_cached_response("legacy prompt", "summary") is None
+        failed.close()
+
+        cache = ResponseCache(cache_dir=temp_cache_dir)
+        assert cache.get_cached_response("legacy prompt", "summary") == "legacy response"
+        assert not os.path.exists(os.path.join(temp_cache_dir, key[:2], key))
+        cache.close()
+
+    def test_unknown_backend_rejected(self, temp_cache_dir):
+        """
+        Test that an unknown backend name raises a ValueError.
+        """
+        with pytest.raises(ValueError):
+            ResponseCache(cache_dir=temp_cache_dir, backend="redis")
+
+
+class TestFileBackend:
+    """Test suite for the sharded, compressed file backend."""
+
+    @pytest.fixture
+    def temp_cache_dir(self):
+        """Create a temporary directory for cache testing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    def test_entries_are_sharded_and_compressed(self, temp_cache_dir):
+        """
+        Test that an entry is stored compressed under a two-character shard.
+
+        Verifies that:
+        1. The entry lives in cache_dir/<first two hex digits>/<key>
+        2. The response text does not appear uncompressed on disk
+        3. No temporary files are left behind
+        """
+        cache = ResponseCache(cache_dir=temp_cache_dir, backend="file", compression="zlib")
+        cache.cache_response("prompt", "summary", "response " * 100)
+        key = cache.get_cache_key("summary:prompt")
+
+        with open(os.path.join(temp_cache_dir, key[:2], key), 'rb') as f:
+            blob = f.read()
+        assert blob.startswith(b"SMC1z")
+        assert b"response" not in blob
+        assert os.listdir(os.path.join(temp_cache_dir, key[:2])) == [key]
+        assert cache.get_cached_response("prompt", "summary") == "response " * 100
+
+    def test_legacy_flat_entries_are_read(self, temp_cache_dir):
+        """Test that plain JSON entries from the old flat layout are still hits."""
+        cache = ResponseCache(cache_dir=temp_cache_dir, backend="file")
+        key = cache.get_cache_key("summary:prompt")
+        with open(os.path.join(temp_cache_dir, key), 'w') as f:
+            json.dump({'timestamp': datetime.now().isoformat(), 'response': "old response"}, f)
+
+        assert cache.get_cached_response("prompt", "summary") == "old response"
+
+    @pytest.mark.parametrize("damage", [
+        lambda blob: blob[:len(blob) // 2],
+        lambda blob: blob[:5] + b"\x00" * (len(blob) - 5),
+        lambda blob: b"",
+    ])
+    def test_corrupt_entries_are_misses(self, temp_cache_dir, damage):
+        """Test that truncated or garbled entries are treated as cache misses."""
+        cache = ResponseCache(cache_dir=temp_cache_dir, backend="file")
+        cache.cache_response("prompt", "summary", "response")
+        path = cache.storage.path(cache.get_cache_key("summary:prompt"))
+        with open(path, 'rb') as f:
+            blob = f.read()
+        with open(path, 'wb') as f:
+            f.write(damage(blob))
+
+        assert cache.get_cached_response("prompt", "summary") is None
+
+    def test_unknown_compression_rejected(self, temp_cache_dir):
+        """Test that an unknown compression name raises a ValueError."""
+        with pytest.raises(ValueError):
+            ResponseCache(cache_dir=temp_cache_dir, backend="file", compression="lz4")
+
+    def test_concurrent_writers_never_expose_partial_entries(self, temp_cache_dir):
+        """
+        Test that processes rewriting the same keys while others read them
+        only ever see complete entries.
+        """
+        script = (
+            "import sys\n"
+            "from smartman.cache import ResponseCache\n"
+            "cache = ResponseCache(cache_dir=sys.argv[1], backend='file')\n"
+            "tag = sys.argv[2]\n"
+            "for i in range(200):\n"
+            "    key = f'prompt {i % 5}'\n"
+            "    cache.cache_response(key, 'summary', tag * 2000)\n"
+            "    value = cache.get_cached_response(key, 'summary')\n"
+            "    if value is not None and len(set(value)) != 1:\n"
+            "        sys.exit('partial entry')\n"
+        )
+        processes = [subprocess.Popen([sys.executable, "-c", script, temp_cache_dir, tag])
+                     for tag in "abcd"]
+
+        assert [process.wait(timeout=60) for process in processes] == [0, 0, 0, 0]
+        leftovers = [name for shard in os.listdir(temp_cache_dir)
+                     for name in os.listdir(os.path.join(temp_cache_dir, shard)) if name.endswith(".tmp")]
+        assert leftovers == []
+
+
+class TestSingleFlight:
+    """Test suite for the per-key single-flight locks."""
+
+    @pytest.fixture
+    def lock_dir(self):
+        """Create a temporary directory for lock files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    def test_threads_take_turns_and_lock_files_are_removed(self, lock_dir):
+        """
+        Test that holders of one key never overlap and leave no lock file behind.
+        """
+        flights = SingleFlight(lock_dir)
+        active = []
+        overlaps = []
+
+        def work():
+            with flights.hold("key", timeout=5):
+                active.append(1)
+                overlaps.append(len(active))
+                time.sleep(0.01)
+                active.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert overlaps == [1] * 8
+        assert os.listdir(lock_dir) == []
+        assert flights._locks == {}
+
+    def test_waiter_gives_up_after_timeout(self, lock_dir):
+        """
+        Test that a waiter proceeds unlocked once the timeout passes, e.g. if another process hangs.
+        """
+        script = (
+            "import sys, time\n"
+            "from smartman.cache import SingleFlight\n"
+            "with SingleFlight(sys.argv[1]).hold('key', timeout=5):\n"
+            "    print('locked', flush=True)\n"
+            "    time.sleep(1)\n"
+        )
+        holder = subprocess.Popen([sys.executable, "-c", script, lock_dir], stdout=subprocess.PIPE, text=True)
+        try:
+            assert holder.stdout.readline().strip() == "locked"
+
+            start = time.monotonic()
+            with SingleFlight(lock_dir).hold("key", timeout=0.3):
+                waited = time.monotonic() - start
+            with SingleFlight(lock_dir).hold("other", timeout=0.3):
+                unrelated = time.monotonic() - start - waited
+        finally:
+            holder.wait()
+
+        assert 0.3 <= waited < 1
+        assert unrelated < 0.1
+
 class TestCacheIntegration:
     """Test suite for cache integration with the main application."""
     
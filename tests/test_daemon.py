@@ -0,0 +1,150 @@
+"""
+Tests for the background server behind `smartman serve`.
+
+This module runs a real server on a temporary Unix socket to verify that:
+1. The CLI retrieves documentation itself and forwards it to a running server
+2. The CLI falls back to in-process execution when no server is listening
+3. Errors and stale sockets are handled
+4. A config change replaces the shared LLMInterface and closes the old one
+"""
+
+import os
+import socket
+import threading
+import pytest
+from unittest.mock import MagicMock
+from smartman import daemon
+from smartman.main import cli
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, mock_man_page):
+    """A running SmartmanServer backed by a mock LLMInterface."""
+    path = str(tmp_path / "daemon.sock")
+    monkeypatch.delenv('SMARTMAN_NO_DAEMON')
+    monkeypatch.setenv('SMARTMAN_SOCKET', path)
+
+    llm = MagicMock()
+    llm.generate_summary.side_effect = lambda text: f"summary of {text.split()[0]}"
+    llm.stream_summary.side_effect = lambda text: iter(["streamed ", "summary"])
+    llm.generate_command.side_effect = lambda intent: "ls -la"
+
+    server = daemon.SmartmanServer(path, lambda: {'STREAM': True}, MagicMock(return_value=llm))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.mock_llm = llm
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestForwarding:
+    """Test suite for requests forwarded to the server."""
+
+    def test_forward_returns_answer(self, server):
+        """
+        Test a summary round trip, streamed and not.
+
+        Verifies that:
+        1. The server answers from the documentation text it is sent
+        2. Streamed answers arrive chunk by chunk
+        3. The same LLMInterface is reused across requests
+        """
+        assert list(daemon.forward('summary', 'LS(1) page')) == ["summary of LS(1)"]
+        assert list(daemon.forward('summary', 'LS(1) page', stream=True)) == ["streamed ", "summary"]
+        assert server.create_llm.call_count == 1
+
+    def test_cli_retrieves_documentation_itself(self, cli_runner, server, mock_man_page):
+        """
+        Test that the page is looked up by the CLI, in its own environment, and only its text is sent.
+        """
+        result = cli_runner.invoke(cli, ['summary', 'ls'])
+
+        assert result.exit_code == 0
+        assert "Found man page documentation" in result.output
+        mock_man_page.assert_called_once_with('ls')
+        server.mock_llm.generate_summary.assert_called_once_with(mock_man_page('ls'))
+
+    def test_cli_uses_running_server(self, cli_runner, server, mock_llm_interface):
+        """
+        Test that the CLI renders the server's answer without building its own LLMInterface.
+        """
+        result = cli_runner.invoke(cli, ['generate', 'list files'])
+
+        assert result.exit_code == 0
+        assert "ls -la" in result.output
+        mock_llm_interface.assert_not_called()
+
+    def test_server_errors_are_raised_by_client(self, server):
+        """
+        Test that a failing request surfaces the server's error message.
+        """
+        server.mock_llm.generate_command.side_effect = Exception("API error")
+
+        chunks = daemon.forward('generate', 'anything')
+        with pytest.raises(Exception, match="API error"):
+            list(chunks)
+
+
+class TestConfigReload:
+    """Test suite for rebuilding the shared LLMInterface."""
+
+    def test_replaced_interface_is_closed_after_its_last_request(self, tmp_path, monkeypatch):
+        """
+        Test that a config change builds a new interface and closes the old one once it is no longer in use.
+        """
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text("MODEL: a\n")
+        monkeypatch.setattr(daemon, 'CONFIG_PATH', str(config_path))
+        create_llm = MagicMock(side_effect=lambda config: MagicMock())
+        server = daemon.SmartmanServer(str(tmp_path / "daemon.sock"), dict, create_llm)
+        try:
+            with server.llm() as old:
+                config_path.write_text("MODEL: bb\n")
+                with server.llm() as new:
+                    assert new is not old
+                old.close.assert_not_called()
+            old.close.assert_called_once()
+            new.close.assert_not_called()
+        finally:
+            server.server_close()
+
+
+class TestFallback:
+    """Test suite for running without a server."""
+
+    def test_cli_runs_in_process_without_server(self, cli_runner, tmp_path, monkeypatch, mock_llm_interface):
+        """
+        Test that a missing or dead socket falls back to in-process execution.
+        """
+        path = str(tmp_path / "daemon.sock")
+        monkeypatch.delenv('SMARTMAN_NO_DAEMON')
+        monkeypatch.setenv('SMARTMAN_SOCKET', path)
+        assert daemon.forward('summary', 'ls') is None
+
+        # A socket file nobody listens on, left by a crashed server
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        result = cli_runner.invoke(cli, ['summary', 'ls'])
+
+        assert result.exit_code == 0
+        mock_llm_interface.return_value.generate_summary.assert_called_once()
+
+    def test_server_replaces_stale_socket_but_not_live_one(self, server, tmp_path):
+        """
+        Test that a new server refuses to take over a live socket but replaces a stale one.
+        """
+        with pytest.raises(RuntimeError):
+            daemon.SmartmanServer(server.path, dict, MagicMock())
+
+        path = str(tmp_path / "stale.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        replacement = daemon.SmartmanServer(path, dict, MagicMock())
+        assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+        replacement.server_close()
+        assert not os.path.exists(path)
@@ -0,0 +1,244 @@
+"""
+Tests for hedged requests across OpenAI and Anthropic.
+
+This module verifies that:
+1. A slow primary is hedged to the other provider and the first answer wins
+2. A fast primary never triggers a hedge, and a failing one fails over
+3. The losing stream is closed and the losing async request is cancelled
+4. Wins and latencies are recorded and summarized per provider
+5. The stats file is rotated once it grows past its size limit
+"""
+
+import os
+import time
+import json
+import asyncio
+import pytest
+import subprocess
+import sys
+from unittest.mock import patch
+from smartman import hedging
+from smartman.hedging import summarize_stats
+from smartman.llm_interface import LLMInterface, AsyncLLMInterface
+
+
+def delayed(seconds, answer):
+    """Return a fake provider call that answers after the given delay."""
+    def call(prompt):
+        time.sleep(seconds)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return call
+
+
+@pytest.fixture
+def make_llm(tmp_path):
+    """Build a hedged interface of the given class, recording stats under tmp_path."""
+    def make(cls=LLMInterface, delay=0.05):
+        with patch.dict(os.environ, {'ANTH_API_KEY': 'test_anthropic_key'}):
+            llm = cls(api_key="test", provider="openai", use_cache=False, hedge_delay=delay)
+        llm.hedger.stats_path = str(tmp_path / "hedge_stats.jsonl")
+        return llm
+    return make
+
+
+class TestHedgedCalls:
+    """Test suite for the blocking and streaming hedged request paths."""
+
+    def test_slow_primary_is_hedged(self, make_llm):
+        """
+        Test that the secondary is asked once the delay passes and its answer wins.
+        """
+        llm = make_llm()
+        llm._call_direct = delayed(0.5, "from openai")
+        llm.hedger.secondary._call_direct = delayed(0, "from anthropic")
+
+        start = time.monotonic()
+        assert llm._call_provider("prompt") == "from anthropic"
+        assert time.monotonic() - start < 0.4
+        assert llm.hedger.hedges == 1
+        assert llm.hedger.stats['anthropic']['hedged_wins'] == 1
+
+    def test_fast_primary_is_not_hedged(self, make_llm):
+        """
+        Test that an answer arriving before the delay never reaches the secondary.
+        """
+        llm = make_llm(delay=0.5)
+        llm._call_direct = delayed(0, "from openai")
+        llm.hedger.secondary._call_direct = delayed(0, AssertionError("secondary called"))
+
+        assert llm._call_provider("prompt") == "from openai"
+        assert llm.hedger.hedges == 0
+        assert llm.hedger.stats['openai']['wins'] == 1
+
+    def test_failing_primary_fails_over_immediately(self, make_llm):
+        """
+        Test that a primary error hedges at once instead of waiting out the delay.
+        """
+        llm = make_llm(delay=5)
+        llm._call_direct = delayed(0, Exception("rate limited"))
+        llm.hedger.secondary._call_direct = delayed(0, "from anthropic")
+
+        start = time.monotonic()
+        assert llm._call_provider("prompt") == "from anthropic"
+        assert time.monotonic() - start < 1
+
+    def test_both_failing_raises_primary_error(self, make_llm):
+        """
+        Test that the primary's error is surfaced when neither provider answers.
+        """
+        llm = make_llm()
+        llm._call_direct = delayed(0, Exception("openai down"))
+        llm.hedger.secondary._call_direct = delayed(0, Exception("anthropic down"))
+
+        with pytest.raises(Exception, match="openai down"):
+            llm._call_provider("prompt")
+
+    def test_losing_stream_is_closed(self, make_llm):
+        """
+        Test that the first provider to produce a chunk wins and the other stream is closed.
+        """
+        llm = make_llm()
+        closed = []
+
+        def stream(delay, provider):
+            def open_stream(prompt):
+                try:
+                    time.sleep(delay)
+                    yield f"{provider} 1 "
+                    yield f"{provider} 2"
+                finally:
+                    closed.append(provider)
+            return open_stream
+
+        llm._stream_direct = stream(0.3, "openai")
+        llm.hedger.secondary._stream_direct = stream(0, "anthropic")
+
+        assert "".join(llm._stream_provider("prompt")) == "anthropic 1 anthropic 2"
+        time.sleep(0.4)
+        assert sorted(closed) == ["anthropic", "openai"]
+
+    def test_hedged_answers_have_their_own_cache_keys(self, make_llm):
+        """
+        Test that enabling hedging does not reuse answers cached without it.
+        """
+        plain = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        hedged = make_llm()
+
+        assert "hedge" not in json.loads(plain._cache_text("prompt"))
+        assert json.loads(hedged._cache_text("prompt"))["hedge"] == ["anthropic", hedged.hedger.secondary.model]
+
+    def test_missing_second_key_disables_hedging(self):
+        """
+        Test that hedging is skipped when only one provider has a key.
+        """
+        with patch.dict(os.environ, {}, clear=True):
+            llm = LLMInterface(api_key="test", provider="openai", use_cache=False, hedge_delay=0.1)
+        assert llm.hedger is None
+
+
+class TestAsyncHedging:
+    """Test suite for hedging in AsyncLLMInterface."""
+
+    def test_loser_is_cancelled(self, make_llm):
+        """
+        Test that the slow primary's task is cancelled once the secondary answers.
+        """
+        llm = make_llm(cls=AsyncLLMInterface)
+        cancelled = []
+
+        async def slow(prompt):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append("openai")
+                raise
+            return "from openai"
+
+        async def fast(prompt):
+            return "from anthropic"
+
+        llm._call_direct = slow
+        llm.hedger.secondary._call_direct = fast
+
+        async def run():
+            answer = await llm._call_provider("prompt")
+            await asyncio.sleep(0)
+            return answer
+
+        assert asyncio.run(run()) == "from anthropic"
+        assert cancelled == ["openai"]
+
+
+class TestStats:
+    """Test suite for the hedge statistics file."""
+
+    def test_wins_are_recorded_and_summarized(self, make_llm):
+        """
+        Test that every win is appended to the stats file and summarized per provider.
+        """
+        llm = make_llm()
+        llm.hedger.secondary._call_direct = delayed(0, "from anthropic")
+        llm._call_direct = delayed(0, "from openai")
+        llm._call_provider("prompt")
+        llm._call_provider("prompt")
+        llm._call_direct = delayed(0.3, "from openai")
+        llm._call_provider("prompt")
+
+        stats = summarize_stats(llm.hedger.stats_path)
+        assert stats['requests'] == 3
+        assert stats['hedged'] == 1
+        assert stats['providers']['openai']['wins'] == 2
+        assert stats['providers']['anthropic']['hedged_wins'] == 1
+        assert stats['providers']['openai']['p95'] < 0.3
+
+    def test_missing_or_damaged_file(self, tmp_path):
+        """
+        Test that a missing file is empty and unreadable lines are skipped.
+        """
+        path = tmp_path / "hedge_stats.jsonl"
+        assert summarize_stats(str(path))['requests'] == 0
+
+        path.write_text('{"winner": "openai", "latency": 1.5, "hedged": false}\n{"winner": "open')
+        stats = summarize_stats(str(path))
+        assert stats['requests'] == 1
+        assert stats['providers']['openai']['p50'] == 1.5
+
+    def test_stats_file_is_rotated(self, make_llm):
+        """
+        Test that the stats file is rotated past its size limit and both files are summarized.
+
+        Verifies that:
+        1. A record taking the file past the limit moves it to the .1 backup
+        2. Only one backup is kept
+        3. Records in the backup still count
+        """
+        llm = make_llm()
+        llm._call_direct = delayed(0, "from openai")
+        path = llm.hedger.stats_path
+        with patch.object(hedging, 'MAX_STATS_BYTES', 150):
+            for _ in range(5):
+                llm._call_provider("prompt")
+
+        assert os.path.getsize(path) <= 150
+        assert os.path.getsize(path + '.1') > 150
+        stats_files = [name for name in os.listdir(os.path.dirname(path)) if name.startswith("hedge_stats")]
+        assert sorted(stats_files) == ["hedge_stats.jsonl", "hedge_stats.jsonl.1"]
+        assert 2 <= summarize_stats(path)['requests'] < 5
+
+
+class TestImports:
+    """Test suite for the import cost of the hedging module."""
+
+    def test_asyncio_is_imported_lazily(self):
+        """
+        Test that importing the hedging module does not import asyncio.
+
+        Run in a fresh interpreter because the test session itself has it loaded.
+        """
+        script = "import sys, smartman.hedging\nprint('asyncio' in sys.modules)\n"
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "False"
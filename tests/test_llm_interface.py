@@ -0,0 +1,751 @@
+"""
+Tests for the LLM interface request paths.
+
+This module exercises LLMInterface below the CLI layer to ensure:
+1. Server-sent events from the requests fallback are parsed correctly
+2. Streaming yields chunks progressively and caches the full text
+3. Requests-based provider paths share one pooled HTTP session
+4. Every action goes through one cache keyed on provider, model and settings
+5. Oversized man pages are map-reduced over concurrently processed chunks
+6. AsyncLLMInterface runs many requests concurrently on one event loop
+7. Identical concurrent requests are coalesced into one provider call
+8. Man page prompts share a cacheable prefix and report prompt cache usage
+9. describe answers summary and examples in one request, cached per action
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import pytest
+import tempfile
+import threading
+import subprocess
+from unittest.mock import patch, MagicMock, AsyncMock
+from smartman import llm_interface, profiling
+from smartman.cache import ResponseCache
+from smartman.llm_interface import (LLMInterface, AsyncLLMInterface, _iter_sse, split_prompt, usage_counts,
+                                    split_description, format_description)
+from smartman.man_retriever import split_man_page, estimate_tokens
+
+
+def make_sse_response(events, status_code=200):
+    """Build a fake streaming requests response emitting the given SSE data payloads."""
+    lines = []
+    for event in events:
+        lines.append(f"data: {event}")
+        lines.append("")
+    response = MagicMock()
+    response.status_code = status_code
+    response.iter_lines.return_value = iter(lines)
+    return response
+
+
+@pytest.fixture
+def temp_cache():
+    """Provide a ResponseCache backed by a temporary directory."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield ResponseCache(cache_dir=temp_dir)
+
+
+class TestStreaming:
+    """Test suite for the streaming request paths."""
+
+    def test_iter_sse_groups_data_lines(self):
+        """
+        Test that the SSE parser yields one payload per event.
+
+        Verifies that:
+        1. Blank lines terminate events
+        2. Comment and non-data lines are ignored
+        """
+        response = MagicMock()
+        response.iter_lines.return_value = iter([
+            ": keep-alive", "", "event: delta", "data: one", "", "data: two", "data: three", ""
+        ])
+
+        assert list(_iter_sse(response)) == ["one", "two\nthree"]
+
+    def test_openai_requests_fallback_streams_and_caches(self, temp_cache):
+        """
+        Test the OpenAI requests fallback when streaming a summary.
+
+        Verifies that:
+        1. Delta chunks are yielded in order
+        2. The joined text is cached once the stream completes
+        """
+        events = [
+            json.dumps({"choices": [{"delta": {"content": "Hello"}}]}),
+            json.dumps({"choices": [{"delta": {"content": " world"}}]}),
+            "[DONE]",
+        ]
+        with patch.object(llm_interface, 'OPENAI_AVAILABLE', False), \
+             patch('requests.Session.post', return_value=make_sse_response(events)) as mock_post:
+            llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+            llm.use_cache = True
+            llm.cache = temp_cache
+
+            chunks = list(llm.stream_summary("man text"))
+
+        assert chunks == ["Hello", " world"]
+        assert mock_post.call_args.kwargs["json"]["stream"] is True
+        assert llm.get_cached('summary', llm.prompt_for('summary', "man text")) == "Hello world"
+
+    def test_anthropic_requests_fallback_streams_text_deltas(self):
+        """
+        Test the Anthropic requests fallback when streaming a command.
+
+        Verifies that only text deltas are yielded and message_stop ends the stream.
+        """
+        events = [
+            json.dumps({"type": "message_start", "message": {}}),
+            json.dumps({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "ls"}}),
+            json.dumps({"type": "content_block_delta", "delta": {"type": "text_delta", "text": " -la"}}),
+            json.dumps({"type": "message_stop"}),
+        ]
+        with patch.object(llm_interface, 'ANTHROPIC_AVAILABLE', False), \
+             patch('requests.Session.post', return_value=make_sse_response(events)):
+            llm = LLMInterface(api_key="test", provider="anthropic", use_cache=False)
+
+            assert "".join(llm.stream_command("list files")) == "ls -la"
+
+    def test_interrupted_stream_is_not_cached(self, temp_cache):
+        """
+        Test that a stream closed before completion leaves the cache untouched.
+        """
+        events = [json.dumps({"choices": [{"delta": {"content": "partial"}}]}), "[DONE]"]
+        with patch.object(llm_interface, 'OPENAI_AVAILABLE', False), \
+             patch('requests.Session.post', return_value=make_sse_response(events)):
+            llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+            llm.use_cache = True
+            llm.cache = temp_cache
+
+            stream = llm.stream_summary("man text")
+            assert next(stream) == "partial"
+            stream.close()
+
+        assert llm.get_cached('summary', llm.prompt_for('summary', "man text")) is None
+
+    def test_error_response_is_closed(self):
+        """
+        Test that a streamed request answered with an error status releases its connection.
+        """
+        response = make_sse_response([], status_code=500)
+        response.json.return_value = {"error": {"message": "server error"}}
+        with patch.object(llm_interface, 'OPENAI_AVAILABLE', False), \
+             patch('requests.Session.post', return_value=response):
+            llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+
+            with pytest.raises(llm_interface.LLMAPIError):
+                list(llm.stream_summary("man text"))
+
+        response.__exit__.assert_called_once()
+
+
+class TestHTTPSession:
+    """Test suite for the pooled HTTP session used by the requests fallbacks."""
+
+    def test_session_is_shared_and_pooled(self):
+        """
+        Test that every requests-based call goes through one keep-alive session.
+
+        Verifies that:
+        1. The configured pool size is applied to the mounted adapter
+        2. Connect/read timeouts are passed on each request
+        3. Repeated calls reuse the same session object
+        """
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"text": "answer"}
+
+        llm = LLMInterface(api_key="test", provider="custom", use_cache=False,
+                           pool_size=4, connect_timeout=1.5, read_timeout=30)
+        with patch('requests.Session.post', return_value=response) as mock_post:
+            session = llm.session
+            assert llm.generate_command("one") == "answer"
+            assert llm.generate_command("two") == "answer"
+            assert llm.session is session
+
+        assert session.get_adapter("https://api.example.com")._pool_maxsize == 4
+        assert mock_post.call_count == 2
+        assert mock_post.call_args.kwargs["timeout"] == (1.5, 30)
+
+    def test_context_manager_closes_session(self):
+        """
+        Test that leaving the context manager releases pooled connections.
+        """
+        with patch('requests.Session.close') as mock_close:
+            with LLMInterface(api_key="test", provider="custom", use_cache=False) as llm:
+                llm.session
+
+        mock_close.assert_called_once()
+        assert llm._session is None
+
+    @pytest.mark.parametrize("provider,base_url,api_url", [
+        ("openai", "http://localhost:8000/v1/", "http://localhost:8000/v1/chat/completions"),
+        ("anthropic", "http://localhost:8000", "http://localhost:8000/v1/messages"),
+        ("custom", None, "https://api.example.com/v1/completions"),
+    ])
+    def test_base_url_sets_endpoint(self, provider, base_url, api_url):
+        """
+        Test that base_url takes each SDK's form and the requests fallback posts under it.
+        """
+        llm = LLMInterface(api_key="test", provider=provider, use_cache=False, base_url=base_url)
+
+        assert llm.api_url == api_url
+
+    @pytest.mark.parametrize("interface,provider,client", [
+        (LLMInterface, "openai", "OpenAI"),
+        (LLMInterface, "anthropic", "Anthropic"),
+        (AsyncLLMInterface, "openai", "AsyncOpenAI"),
+        (AsyncLLMInterface, "anthropic", "AsyncAnthropic"),
+    ])
+    def test_sdk_clients_get_both_timeouts(self, interface, provider, client):
+        """
+        Test that the SDK clients are given the connect timeout as well as the read timeout.
+        """
+        sdk, httpx = MagicMock(), MagicMock()
+        with patch.dict(sys.modules, {provider: sdk, 'httpx': httpx}), \
+             patch.object(llm_interface, f'{provider.upper()}_AVAILABLE', True):
+            llm = interface(api_key="test", provider=provider, use_cache=False,
+                            connect_timeout=1.5, read_timeout=30)
+            llm.client
+
+        httpx.Timeout.assert_called_once_with(30, connect=1.5)
+        assert getattr(sdk, client).call_args.kwargs["timeout"] is httpx.Timeout.return_value
+
+
+class TestResponseCaching:
+    """Test suite for the caching layer wrapped around every request."""
+
+    @pytest.fixture
+    def llm(self, temp_cache):
+        """An LLMInterface whose provider call is mocked and whose cache is temporary."""
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        llm.use_cache = True
+        llm.cache = temp_cache
+        with patch.object(llm, '_call_provider', return_value="fresh answer") as mock_call:
+            llm.mock_call = mock_call
+            yield llm
+
+    @pytest.mark.parametrize("method", ["generate_summary", "generate_example", "generate_command"])
+    def test_every_action_is_cached(self, llm, method):
+        """
+        Test that repeated calls for any action are served from the cache.
+        """
+        assert getattr(llm, method)("input") == "fresh answer"
+        assert getattr(llm, method)("input") == "fresh answer"
+
+        assert llm.mock_call.call_count == 1
+
+    def test_key_includes_model_and_settings(self, llm):
+        """
+        Test that changing the model or sampling settings misses the cache.
+
+        Verifies that an answer produced by one model is never returned for another.
+        """
+        llm.generate_summary("input")
+        llm.model = "claude-3-opus-20240229"
+        llm.generate_summary("input")
+        llm.max_tokens = 1000
+        llm.generate_summary("input")
+
+        assert llm.mock_call.call_count == 3
+
+    def test_key_includes_base_url(self, llm):
+        """Test that answers from another endpoint are cached separately."""
+        llm.generate_summary("input")
+        llm.base_url = "http://localhost:8000/v1"
+        llm.generate_summary("input")
+
+        assert llm.mock_call.call_count == 2
+
+    def test_key_includes_prompt_version(self, llm):
+        """
+        Test that bumping the prompt template version invalidates cached answers.
+        """
+        llm.generate_summary("input")
+        with patch.object(llm_interface, 'PROMPT_VERSION', llm_interface.PROMPT_VERSION + 1):
+            llm.generate_summary("input")
+
+        assert llm.mock_call.call_count == 2
+
+    def test_caching_can_be_disabled_per_action(self, llm):
+        """
+        Test that actions missing from cache_actions always hit the provider.
+        """
+        llm.cache_actions = {'summary'}
+
+        llm.generate_command("input")
+        llm.generate_command("input")
+        llm.generate_summary("input")
+        llm.generate_summary("input")
+
+        assert llm.mock_call.call_count == 3
+
+
+class TestCoalescing:
+    """Test suite for single-flight coalescing of identical requests."""
+
+    def test_identical_requests_in_threads_make_one_call(self, temp_cache):
+        """
+        Test that threads asking the same question share one provider call.
+        """
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        llm.use_cache = True
+        llm.cache = temp_cache
+
+        def slow_answer(prompt):
+            time.sleep(0.2)
+            return "answer"
+
+        results = []
+        with patch.object(llm, '_call_provider', side_effect=slow_answer) as mock_call:
+            threads = [threading.Thread(target=lambda: results.append(llm.generate_command("list files")))
+                       for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == ["answer"] * 10
+        assert mock_call.call_count == 1
+
+    def test_identical_requests_in_processes_make_one_call(self):
+        """
+        Test that separate processes sharing a cache directory share one provider call.
+
+        Each process records its provider calls in a log file; only one may appear.
+        """
+        script = (
+            "import sys, time\n"
+            "from unittest.mock import patch\n"
+            "from smartman.llm_interface import LLMInterface\n"
+            "cache_dir, log = sys.argv[1], sys.argv[2]\n"
+            "def answer(prompt):\n"
+            "    with open(log, 'a') as f:\n"
+            "        f.write('call\\n')\n"
+            "    time.sleep(0.5)\n"
+            "    return 'answer'\n"
+            "llm = LLMInterface(api_key='test', provider='openai', cache_options={'cache_dir': cache_dir})\n"
+            "with patch.object(llm, '_call_provider', side_effect=answer):\n"
+            "    sys.stderr.write(llm.generate_summary('NAME\\n       tar - an archiving utility\\n'))\n"
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log = os.path.join(temp_dir, "calls.log")
+            cache_dir = os.path.join(temp_dir, "cache")
+            procs = [subprocess.Popen([sys.executable, "-c", script, cache_dir, log],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+                     for _ in range(5)]
+            outputs = [proc.communicate()[1] for proc in procs]
+
+            assert outputs == ["answer"] * 5
+            with open(log) as f:
+                assert f.read() == "call\n"
+
+
+LARGE_MAN_PAGE = "TOOL(1)  User Commands  TOOL(1)\n\n" + "\n\n".join(
+    f"SECTION{index}\n       " + f"Paragraph {index} describing the tool in some detail. " * 20
+    for index in range(6)
+)
+
+
+class TestChunkedMode:
+    """Test suite for map-reduce handling of man pages larger than the token budget."""
+
+    @pytest.fixture
+    def llm(self, temp_cache):
+        """An LLMInterface with a small budget, a temporary cache and a recording provider."""
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False,
+                           context_token_budget=300, chunk_tokens=300, max_parallel_chunks=3)
+        llm.use_cache = True
+        llm.cache = temp_cache
+        llm.prompts = []
+        llm.in_flight = 0
+        llm.peak = 0
+        lock = threading.Lock()
+
+        def call_provider(prompt):
+            with lock:
+                llm.prompts.append(prompt)
+                llm.in_flight += 1
+                llm.peak = max(llm.peak, llm.in_flight)
+            time.sleep(0.05)
+            with lock:
+                llm.in_flight -= 1
+            return f"answer {len(llm.prompts)}"
+
+        with patch.object(llm, '_call_provider', side_effect=call_provider):
+            yield llm
+
+    def test_large_page_is_mapped_in_parallel_then_reduced(self, llm):
+        """
+        Test that an oversized page is summarized chunk by chunk.
+
+        Verifies that:
+        1. One request is made per chunk plus one reduce request
+        2. Chunk requests run concurrently up to max_parallel_chunks
+        3. The reduce prompt combines every chunk's notes
+        """
+        chunks = split_man_page(LARGE_MAN_PAGE, llm.chunk_tokens)
+        assert len(chunks) > 3
+
+        llm.generate_summary(LARGE_MAN_PAGE)
+
+        assert len(llm.prompts) == len(chunks) + 1
+        assert llm.peak == 3
+        reduce_prompt = llm.prompts[-1]
+        assert reduce_prompt.startswith("Part 1 of")
+        assert f"Part {len(chunks)} of {len(chunks)}:" in reduce_prompt
+        assert reduce_prompt.endswith(llm_interface.REDUCE_INSTRUCTIONS['summary'])
+
+    def test_chunk_notes_are_cached_and_shared(self, llm):
+        """
+        Test that chunk notes are reused across calls and between actions.
+        """
+        chunk_count = len(split_man_page(LARGE_MAN_PAGE, llm.chunk_tokens))
+
+        llm.generate_summary(LARGE_MAN_PAGE)
+        llm.generate_example(LARGE_MAN_PAGE)
+        llm.generate_summary(LARGE_MAN_PAGE)
+
+        # Chunks once, then one reduce per action; the repeated summary is a cache hit
+        assert len(llm.prompts) == chunk_count + 2
+
+    def test_small_page_and_never_mode_use_single_prompt(self, llm):
+        """
+        Test that pages within the budget, or chunked="never", make one request.
+        """
+        llm.generate_summary("NAME\n       tiny - a small page\n")
+        llm.chunked = "never"
+        llm.generate_summary(LARGE_MAN_PAGE)
+
+        assert len(llm.prompts) == 2
+
+    def test_page_over_budget_is_chunked_in_auto_mode(self, llm):
+        """
+        Test that a page only a few times the token budget, far below a model's context window,
+        is chunked rather than trimmed.
+        """
+        assert estimate_tokens(LARGE_MAN_PAGE) < 10 * llm.context_token_budget
+        llm.generate_summary(LARGE_MAN_PAGE)
+
+        assert len(llm.prompts) == len(split_man_page(LARGE_MAN_PAGE, llm.chunk_tokens)) + 1
+
+    def test_unknown_chunked_mode_is_rejected(self):
+        """
+        Test that an invalid chunked setting fails fast.
+        """
+        with pytest.raises(ValueError):
+            LLMInterface(api_key="test", provider="openai", use_cache=False, chunked="sometimes")
+
+
+class TestPromptCaching:
+    """Test suite for provider-side prompt caching of man page prompts."""
+
+    MAN_TEXT = "TAR(1)\nNAME\n       tar - an archiving utility\n"
+
+    def test_actions_share_the_page_as_prefix(self):
+        """
+        Test that summary and example prompts for one page differ only in the trailing instruction.
+        """
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        summary = llm.prompt_for('summary', self.MAN_TEXT)
+        example = llm.prompt_for('example', self.MAN_TEXT)
+
+        summary_page, summary_instruction = split_prompt(summary)
+        example_page, example_instruction = split_prompt(example)
+        assert summary_page == example_page
+        assert "tar - an archiving utility" in summary_page
+        assert summary_instruction != example_instruction
+        assert split_prompt(llm.prompt_for('generate', "list files"))[0] is None
+
+    def test_anthropic_request_marks_cache_breakpoint(self):
+        """
+        Test that Anthropic requests put the page in its own block with cache_control.
+
+        Verifies that:
+        1. The page block carries an ephemeral cache breakpoint and comes first
+        2. The instruction follows in an uncached block
+        3. Prompts without a page are sent as plain text
+        """
+        llm = LLMInterface(api_key="test", provider="anthropic", use_cache=False)
+        content = llm._sdk_request(llm.prompt_for('summary', self.MAN_TEXT))["messages"][0]["content"]
+
+        assert content[0]["cache_control"] == {"type": "ephemeral"}
+        assert "tar - an archiving utility" in content[0]["text"]
+        assert content[1] == {"type": "text", "text": llm_interface.DOCUMENT_INSTRUCTIONS['summary']}
+        generate = llm._sdk_request(llm.prompt_for('generate', "list files"))
+        assert isinstance(generate["messages"][0]["content"], str)
+
+    def test_usage_counts(self):
+        """Test that cached tokens are read from both providers' usage blocks."""
+        assert usage_counts("openai", {"prompt_tokens": 1200, "completion_tokens": 80,
+                                       "prompt_tokens_details": {"cached_tokens": 1024}}) == {
+            "input tokens": 1200, "cached input tokens": 1024, "output tokens": 80}
+        assert usage_counts("anthropic", {"input_tokens": 20, "cache_read_input_tokens": 1500,
+                                          "cache_creation_input_tokens": 0, "output_tokens": 90}) == {
+            "input tokens": 1520, "cached input tokens": 1500, "cache write tokens": 0, "output tokens": 90}
+
+    def test_usage_is_counted_in_profile(self):
+        """Test that usage reported by the API is added to the --profile counters."""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "content": [{"type": "text", "text": "A summary"}],
+            "usage": {"input_tokens": 12, "cache_read_input_tokens": 1800, "output_tokens": 40},
+        }
+        profiling.reset()
+        profiling.enable()
+        try:
+            with patch.object(llm_interface, 'ANTHROPIC_AVAILABLE', False), \
+                 patch('requests.Session.post', return_value=response):
+                llm = LLMInterface(api_key="test", provider="anthropic", use_cache=False)
+                assert llm.generate_summary(self.MAN_TEXT) == "A summary"
+            counters = profiling.summary()['counters']
+        finally:
+            profiling.reset()
+
+        assert counters["cached input tokens"] == 1800
+        assert counters["input tokens"] == 1812
+
+
+class TestDescribe:
+    """Test suite for summary and examples answered by one request."""
+
+    MAN_TEXT = "TAR(1)\nNAME\n       tar - an archiving utility\n"
+    ANSWER = "[SUMMARY]\ntar archives files.\n\n[EXAMPLES]\ntar -czf out.tgz dir/"
+
+    @pytest.fixture
+    def llm(self, temp_cache):
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        llm.use_cache = True
+        llm.cache = temp_cache
+        return llm
+
+    def test_one_request_caches_both_actions(self, llm):
+        """
+        Test that a description is one provider call whose parts serve later single-action requests.
+
+        Verifies that:
+        1. The combined prompt shares the page prefix of the summary prompt
+        2. generate_summary and generate_example are then cache hits
+        """
+        with patch.object(llm, '_call_provider', return_value=self.ANSWER) as call:
+            assert llm.generate_description(self.MAN_TEXT) == self.ANSWER
+            assert llm.generate_summary(self.MAN_TEXT) == "tar archives files."
+            assert llm.generate_example(self.MAN_TEXT) == "tar -czf out.tgz dir/"
+
+        assert call.call_count == 1
+        prompt = call.call_args.args[0]
+        assert split_prompt(prompt)[0] == split_prompt(llm.prompt_for('summary', self.MAN_TEXT))[0]
+        assert split_prompt(prompt)[1] == llm_interface.DOCUMENT_INSTRUCTIONS['describe']
+
+    def test_concurrent_descriptions_make_one_call(self, llm):
+        """Test that identical describe requests in threads are coalesced like single actions."""
+        def slow_answer(prompt):
+            time.sleep(0.2)
+            return self.ANSWER
+
+        results = []
+        with patch.object(llm, '_call_provider', side_effect=slow_answer) as call:
+            threads = [threading.Thread(target=lambda: results.append(llm.generate_description(self.MAN_TEXT)))
+                       for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == [self.ANSWER] * 5
+        assert call.call_count == 1
+
+    def test_stream_splits_markers_across_chunks(self, llm):
+        """Test that a streamed answer is split even when a marker arrives in pieces."""
+        chunks = ["[SUMM", "ARY]\ntar archives files.\n\n[EXA", "MPLES]\ntar -czf out.tgz dir/"]
+        with patch.object(llm, '_stream_provider', return_value=iter(chunks)):
+            streamed = list(llm.stream_description(self.MAN_TEXT))
+
+        assert streamed == chunks
+        assert split_description("".join(chunks[:2])) == ("tar archives files.", "")
+        assert split_description(chunks[0]) == ("", "")
+        assert llm.get_cached('example', llm.prompt_for('example', self.MAN_TEXT)) == "tar -czf out.tgz dir/"
+
+    def test_only_missing_part_is_requested(self, llm):
+        """Test that with the summary cached, only the examples are asked for."""
+        llm.set_cached('summary', llm.prompt_for('summary', self.MAN_TEXT), "cached summary")
+        with patch.object(llm, '_call_provider', return_value="tar -xf in.tar") as call:
+            text = llm.generate_description(self.MAN_TEXT)
+
+        assert split_description(text) == ("cached summary", "tar -xf in.tar")
+        assert call.call_args.args[0] == llm.prompt_for('example', self.MAN_TEXT)
+
+    def test_unsplittable_answer_falls_back_to_separate_requests(self, llm):
+        """Test that an answer without the examples marker is not cached and each part is requested on its own."""
+        with patch.object(llm, '_call_provider', side_effect=["no markers here", "a summary", "examples"]) as call:
+            text = llm.generate_description(self.MAN_TEXT)
+
+        assert text == format_description("a summary", "examples")
+        assert call.call_count == 3
+        assert llm.get_cached('summary', llm.prompt_for('summary', self.MAN_TEXT)) == "a summary"
+
+
+class TestAsyncLLMInterface:
+    """Test suite for the asyncio counterpart of LLMInterface."""
+
+    @pytest.fixture
+    def llm(self, temp_cache):
+        """An AsyncLLMInterface with a temporary cache and a mock async OpenAI client."""
+        llm = AsyncLLMInterface(api_key="test", provider="openai", use_cache=False)
+        llm.use_cache = True
+        llm.cache = temp_cache
+        llm.in_flight = 0
+        llm.peak = 0
+
+        async def create(**kwargs):
+            llm.in_flight += 1
+            llm.peak = max(llm.peak, llm.in_flight)
+            await asyncio.sleep(0.05)
+            llm.in_flight -= 1
+            response = MagicMock()
+            response.choices[0].message.content = f"answer to {kwargs['messages'][-1]['content'][-10:]}"
+            return response
+
+        llm._client = MagicMock()
+        llm._client.chat.completions.create = AsyncMock(side_effect=create)
+        llm._client.close = AsyncMock()
+        return llm
+
+    def test_requests_share_one_event_loop(self, llm):
+        """
+        Test that many requests are in flight at once without extra threads.
+
+        Verifies that:
+        1. All requests overlap on the event loop
+        2. Each caller gets its own answer
+        """
+        async def run():
+            return await asyncio.gather(*(llm.generate_command(f"intent {i:04d}") for i in range(100)))
+
+        start = time.perf_counter()
+        answers = asyncio.run(run())
+
+        assert llm.peak == 100
+        assert time.perf_counter() - start < 2
+        assert answers[7].endswith("ntent 0007")
+
+    def test_cache_is_shared_with_sync_interface(self, llm, temp_cache):
+        """
+        Test that async answers are cached under the same keys as the sync interface.
+        """
+        async def run():
+            first = await llm.generate_summary("NAME\n       ls - list directory contents\n")
+            second = await llm.generate_summary("NAME\n       ls - list directory contents\n")
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first == second
+        assert llm._client.chat.completions.create.await_count == 1
+        sync_llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        sync_llm.use_cache = True
+        sync_llm.cache = temp_cache
+        with patch.object(sync_llm, '_call_provider') as mock_call:
+            assert sync_llm.generate_summary("NAME\n       ls - list directory contents\n") == first
+        mock_call.assert_not_called()
+
+    def test_chunk_requests_are_bounded(self, llm):
+        """
+        Test that chunked mode keeps at most max_parallel_chunks chunk requests in flight.
+        """
+        llm.context_token_budget = 300
+        llm.chunk_tokens = 300
+        llm.max_parallel_chunks = 2
+        chunk_count = len(split_man_page(LARGE_MAN_PAGE, llm.chunk_tokens))
+
+        asyncio.run(llm.generate_summary(LARGE_MAN_PAGE))
+
+        assert llm.peak == 2
+        assert llm._client.chat.completions.create.await_count == chunk_count + 1
+
+    def test_identical_requests_are_coalesced(self, llm):
+        """
+        Test that identical requests in flight at once make one provider call, and are profiled.
+        """
+        async def run():
+            return await asyncio.gather(*(llm.generate_summary("NAME\n       ls - list\n") for _ in range(5)))
+
+        profiling.enable()
+        try:
+            answers = asyncio.run(run())
+            phases = profiling.summary()['phases']
+        finally:
+            profiling.reset()
+
+        assert len(set(answers)) == 1
+        assert llm._client.chat.completions.create.await_count == 1
+        assert phases['llm request']['calls'] == 5
+
+    def test_stream_yields_chunks_as_they_arrive(self, llm):
+        """
+        Test that async streams yield each chunk of the provider's stream, then cache the whole answer.
+        """
+        async def chunks():
+            for text in ("ls ", "-la"):
+                chunk = MagicMock(usage=None)
+                chunk.choices[0].delta.content = text
+                yield chunk
+
+        async def run():
+            llm._client.chat.completions.create = AsyncMock(return_value=chunks())
+            streamed = [chunk async for chunk in llm.stream_command("list all files")]
+            return streamed, await llm.generate_command("list all files")
+
+        streamed, answer = asyncio.run(run())
+
+        assert streamed == ["ls ", "-la"]
+        assert answer == "ls -la"
+        assert llm._client.chat.completions.create.await_args.kwargs["stream"] is True
+
+    def test_index_answer_links_the_cached_answer(self, llm, temp_cache):
+        """
+        Test that index_answer is a coroutine linking the answer under the index text.
+        """
+        page = "NAME\n       ls - list directory contents\n"
+
+        async def run():
+            answer = await llm.generate_summary(page)
+            await llm.index_answer("ls index", 'summary', page)
+            return answer
+
+        answer = asyncio.run(run())
+
+        assert temp_cache.get_linked_response("ls index") == answer
+
+    def test_custom_provider_without_httpx(self):
+        """
+        Test that direct API calls fall back to the pooled requests session off the event loop.
+        """
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"text": "answer"}
+        llm = AsyncLLMInterface(api_key="test", provider="custom", use_cache=False)
+
+        with patch.object(llm_interface, 'HTTPX_AVAILABLE', False), \
+             patch('requests.Session.post', return_value=response) as mock_post:
+            assert asyncio.run(llm.generate_command("list files")) == "answer"
+
+        assert mock_post.call_args.kwargs["json"]["prompt"].endswith("list files")
+
+    def test_async_context_manager_closes_client(self, llm):
+        """
+        Test that leaving `async with` closes the async client, and close() is refused.
+        """
+        client = llm._client
+
+        async def run():
+            async with llm:
+                await llm.generate_command("intent")
+
+        asyncio.run(run())
+
+        client.close.assert_awaited_once()
+        with pytest.raises(TypeError):
+            llm.close()
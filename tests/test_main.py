@@ -7,8 +7,11 @@ It verifies that the command-line interface works as expected.
 
 import pytest
 import os
+import json
 from unittest.mock import patch, MagicMock
 from smartman.main import cli
+from smartman import man_retriever
+from smartman.llm_interface import LLMInterface
 from click.testing import CliRunner
 
 # Import test data from conftest
@@ -73,6 +76,23 @@ class TestBasicCommands:
         # Check that we're getting output that looks like examples
         assert "example" in result.output.lower() or "usage" in result.output.lower()
 
+    def test_describe_command(self, cli_runner, mock_llm_interface):
+        """
+        Test the describe command shows summary and examples from one request.
+
+        This test verifies that:
+        1. Both panels are rendered
+        2. Only the combined request is made
+        """
+        result = cli_runner.invoke(cli, ['describe', 'ls'])
+
+        assert result.exit_code == 0
+        assert "Summary of 'ls'" in result.output and "Examples for 'ls'" in result.output
+        assert "ls -la" in result.output
+        instance = mock_llm_interface.return_value
+        instance.generate_description.assert_called_once()
+        instance.generate_summary.assert_not_called()
+
     def test_generate_command(self, cli_runner):
         """
         Test the generate command creates commands from descriptions.
@@ -198,4 +218,167 @@ class TestInteractions:
             result = cli_runner.invoke(cli, ['summary', 'nonexistentcommand'])
             
             # Either it handled the error with a 0 exit code, or it returned a non-zero exit code
-            assert result.exit_code == 0 or "not" in result.output.lower() or "invalid" in result.output.lower()
\ No newline at end of file
+            assert result.exit_code == 0 or "not" in result.output.lower() or "invalid" in result.output.lower()
+
+class TestBatch:
+    """Test suite for the batch command."""
+
+    def test_batch_writes_jsonl_to_stdout(self, cli_runner):
+        """
+        Test that batch reads items from stdin and emits one JSON record per item.
+
+        Verifies that:
+        1. Blank lines and comments in the input are skipped
+        2. Every record carries the output, source and timing
+        3. stdout contains nothing but JSONL
+        """
+        result = cli_runner.invoke(cli, ['batch', 'summary', '--workers', '2'], input="ls\n\n# tools\ngrep\n")
+
+        assert result.exit_code == 0
+        records = [json.loads(line) for line in result.stdout.splitlines()]
+        assert sorted(record['item'] for record in records) == ['grep', 'ls']
+        by_item = {record['item']: record for record in records}
+        assert by_item['ls']['output'] == TEST_DATA['commands']['ls']['summary']
+        assert by_item['ls']['source'] == 'man'
+        assert all(record['ok'] and record['elapsed_ms'] >= 0 for record in records)
+
+    def test_batch_continues_after_failures(self, cli_runner, mock_llm_interface):
+        """
+        Test that a failing item is reported without stopping the rest of the run.
+        """
+        def fail_for_archives(intent):
+            if 'archive' in intent:
+                raise Exception("API error")
+            return "ls -la"
+        mock_llm_interface.return_value.generate_command.side_effect = fail_for_archives
+
+        result = cli_runner.invoke(cli, ['batch', 'generate'], input="extract an archive\nlist files\n")
+
+        assert result.exit_code == 1
+        records = {record['item']: record for record in map(json.loads, result.stdout.splitlines())}
+        assert records['extract an archive']['ok'] is False
+        assert records['extract an archive']['error'] == "API error"
+        assert records['list files']['output'] == "ls -la"
+
+    def test_batch_warnings_go_to_stderr(self, cli_runner, mock_llm_interface, tmp_path, monkeypatch):
+        """Test that a warning printed while items run (an unusable man page index) stays out of the JSONL."""
+        monkeypatch.setenv('HOME', str(tmp_path))
+        (tmp_path / '.smartman').mkdir()
+        (tmp_path / '.smartman' / '.first_run_complete').write_text("First run completed")
+        (tmp_path / '.smartman' / 'man_index.db').write_bytes(b"")
+
+        def build(**kwargs):
+            llm = LLMInterface(**kwargs)
+            llm._call_provider = MagicMock(return_value="ls -la")
+            return llm
+
+        mock_llm_interface.side_effect = build
+        with patch('smartman.man_index.ManIndex', side_effect=RuntimeError("no FTS5")):
+            result = cli_runner.invoke(cli, ['batch', 'generate'], input="list files\n")
+
+        assert result.exit_code == 0
+        assert [json.loads(line)['output'] for line in result.stdout.splitlines()] == ["ls -la"]
+        assert "Warning: no FTS5" in result.stderr
+
+    def test_batch_output_dir(self, cli_runner, tmp_path):
+        """
+        Test that --output-dir writes each output to a file plus a results.jsonl index.
+        """
+        input_file = tmp_path / "intents.txt"
+        input_file.write_text("list all files\nsearch for text\n")
+        output_dir = tmp_path / "out"
+
+        result = cli_runner.invoke(cli, ['batch', 'generate', str(input_file), '-o', str(output_dir)])
+
+        assert result.exit_code == 0
+        assert result.stdout == ""
+        records = [json.loads(line) for line in (output_dir / "results.jsonl").read_text().splitlines()]
+        assert len(records) == 2
+        files = {record['item']: output_dir / record['file'] for record in records}
+        assert all("output" not in record for record in records)
+        assert files['list all files'].read_text() == "ls -la # Lists all files including hidden ones"
+        assert files['search for text'].name == "0001-search_for_text.generate.md"
+
+class TestCacheHitFastPath:
+    """Test suite for answers served from the answer index."""
+
+    @pytest.fixture
+    def indexed_home(self, tmp_path, monkeypatch, mock_llm_interface):
+        """
+        A HOME whose `ls` documentation was rendered from a real file, with
+        real LLMInterfaces (answering "Indexed summary") behind the CLI.
+
+        LLMInterface is the class imported before this module's mock_llm
+        fixture replaced it.
+        """
+        monkeypatch.setenv('HOME', str(tmp_path))
+        man_file = tmp_path / 'ls.1'
+        man_file.write_text(".TH LS 1")
+        # The same text the mocked retriever returns, as if it had been rendered from man_file
+        man_retriever.get_retrieval_cache().set('ls', man_retriever.get_man_page('ls'),
+                                                {'kind': 'man', 'path': str(man_file)})
+
+        def build(**kwargs):
+            llm = LLMInterface(**kwargs)
+            llm._call_provider = MagicMock(return_value="Indexed summary")
+            return llm
+
+        mock_llm_interface.side_effect = build
+        return man_file
+
+    def test_hit_skips_retrieval_and_interface(self, cli_runner, indexed_home, mock_llm_interface, mock_man_retriever):
+        """
+        Test that a repeated summary is served without man retrieval or an LLMInterface.
+
+        Verifies that:
+        1. The first run answers normally and indexes the answer
+        2. The second run shows the same answer without retrieving or constructing anything
+        """
+        first = cli_runner.invoke(cli, ['summary', 'ls'])
+        mock_llm_interface.reset_mock()
+        mock_man_retriever.reset_mock()
+        second = cli_runner.invoke(cli, ['summary', 'ls'])
+
+        assert first.exit_code == 0 and second.exit_code == 0
+        assert "Indexed summary" in second.output
+        mock_llm_interface.assert_not_called()
+        mock_man_retriever.assert_not_called()
+
+    def test_index_follows_page_file_and_settings(self, cli_runner, indexed_home, mock_llm_interface):
+        """Test that changing the page's file or the model makes the next run a miss again."""
+        cli_runner.invoke(cli, ['summary', 'ls'])
+
+        indexed_home.write_text(".TH LS 1\n.SH NAME")
+        mock_llm_interface.reset_mock()
+        cli_runner.invoke(cli, ['summary', 'ls'])
+        assert mock_llm_interface.called
+
+        (indexed_home.parent / '.smartman' / 'config.yaml').write_text("MODEL: gpt-4o-mini\n")
+        mock_llm_interface.reset_mock()
+        cli_runner.invoke(cli, ['summary', 'ls'])
+        assert mock_llm_interface.called
+
+
+class TestStartup:
+    """Test suite for the import cost of the CLI entry point."""
+
+    def test_entry_point_does_not_import_heavy_modules(self):
+        """
+        Test that importing the CLI does not pull in provider SDKs, asyncio or rich.markdown.
+
+        These are imported lazily on first use so `smartman help` and cache
+        hits don't pay for them. Run in a fresh interpreter because the test
+        session itself may already have them loaded.
+        """
+        import subprocess
+        import sys
+
+        script = (
+            "import sys, smartman.main\n"
+            "heavy = ('openai', 'anthropic', 'requests', 'asyncio', 'rich.markdown')\n"
+            "print(','.join(m for m in heavy if m in sys.modules))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "", f"Imported at startup: {result.stdout.strip()}"
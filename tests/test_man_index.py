@@ -0,0 +1,190 @@
+"""
+Tests for the offline man page index used by `generate`.
+
+This module verifies that:
+1. NAME/SYNOPSIS lines and option entries are extracted as snippets
+2. Searches rank the snippets relevant to an intent first
+3. Updates only re-render pages whose file changed and drop removed pages
+4. generate prompts carry the top snippets when an index exists
+"""
+
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from smartman.man_index import ManIndex, extract_snippets, update_index, match_expression
+from smartman.llm_interface import LLMInterface
+
+TAR_PAGE = """TAR(1)  GNU TAR Manual  TAR(1)
+
+NAME
+       tar - an archiving utility
+
+SYNOPSIS
+       tar [OPTION...] [FILE]...
+
+DESCRIPTION
+       GNU tar saves many files together into a single tape or disk archive.
+
+OPTIONS
+       -c, --create
+              Create a new archive.
+
+       -z, --gzip
+              Filter the archive through gzip(1).
+
+       -f, --file=ARCHIVE
+              Use archive file or device ARCHIVE.
+
+AUTHOR
+       John Gilmore
+"""
+
+DU_PAGE = """DU(1)  User Commands  DU(1)
+
+NAME
+       du - estimate file space usage
+
+SYNOPSIS
+       du [OPTION]... [FILE]...
+
+DESCRIPTION
+       Summarize device usage of the set of FILEs, recursively for directories.
+
+       -h, --human-readable
+              print sizes in human readable format (e.g., 1K 234M 2G)
+
+       -s, --summarize
+              display only a total for each argument
+"""
+
+
+@pytest.fixture
+def man_index(tmp_path):
+    """A ManIndex in a temporary directory."""
+    index = ManIndex(str(tmp_path / "man_index.db"))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def page_files(tmp_path):
+    """Stand-in man page files for tar and du."""
+    files = {}
+    for name in ("tar", "du"):
+        path = tmp_path / f"{name}.1"
+        path.write_text(name)
+        files[name] = str(path)
+    return files
+
+
+def fake_render(path):
+    return {"tar.1": TAR_PAGE, "du.1": DU_PAGE}.get(os.path.basename(path))
+
+
+class TestSnippets:
+    """Test suite for snippet extraction."""
+
+    def test_synopsis_and_options(self):
+        """
+        Test that a page yields one synopsis snippet and one per option.
+
+        Verifies that:
+        1. NAME and SYNOPSIS are combined
+        2. Options under OPTIONS and under DESCRIPTION (GNU style) are both found
+        3. Prose and boilerplate sections are skipped
+        """
+        tar = extract_snippets(TAR_PAGE)
+        assert tar[0] == ('synopsis', "tar - an archiving utility tar [OPTION...] [FILE]...")
+        assert [text for kind, text in tar if kind == 'option'] == [
+            "-c, --create: Create a new archive.",
+            "-z, --gzip: Filter the archive through gzip(1).",
+            "-f, --file=ARCHIVE: Use archive file or device ARCHIVE.",
+        ]
+        assert len([kind for kind, _ in extract_snippets(DU_PAGE) if kind == 'option']) == 2
+
+    def test_missing_documentation_has_no_snippets(self):
+        """Test that pages without documentation are indexed empty."""
+        assert extract_snippets("NO_DOCUMENTATION: none") == []
+
+    def test_match_expression_drops_filler_words(self):
+        """Test that queries match any significant word, quoted for FTS5."""
+        assert match_expression('Show the "disk" usage!') == '"show" OR "disk" OR "usage"'
+
+
+class TestManIndex:
+    """Test suite for building and searching the index."""
+
+    def test_relevant_snippets_rank_first(self, man_index, page_files):
+        """
+        Test that search returns the snippets matching the intent, best first.
+        """
+        with patch('smartman.man_retriever.render_man_file', side_effect=fake_render):
+            update_index(man_index, page_files, processes=1)
+
+        results = man_index.search("compress a directory into a gzip archive", limit=3)
+        assert results[0] == ('tar', 'option', "-z, --gzip: Filter the archive through gzip(1).")
+        assert all(page == 'tar' for page, _, _ in results)
+        assert man_index.search("human readable disk usage sizes", limit=1)[0][0] == 'du'
+        assert man_index.search("the", limit=3) == []
+
+    def test_update_is_incremental(self, man_index, page_files):
+        """
+        Test that only new or changed pages are rendered again and removed ones are dropped.
+        """
+        render = MagicMock(side_effect=fake_render)
+        with patch('smartman.man_retriever.render_man_file', render):
+            assert update_index(man_index, page_files, processes=1) == {'indexed': 2, 'unchanged': 0, 'removed': 0, 'failed': 0}
+            assert update_index(man_index, page_files, processes=1) == {'indexed': 0, 'unchanged': 2, 'removed': 0, 'failed': 0}
+
+            with open(page_files['du'], 'a') as f:
+                f.write(" updated")
+            counts = update_index(man_index, {'du': page_files['du']}, processes=1)
+
+        assert counts == {'indexed': 1, 'unchanged': 0, 'removed': 1, 'failed': 0}
+        assert render.call_count == 3
+        assert len(man_index) == 1
+        assert man_index.search("archive", limit=5) == []
+
+    def test_indexed_file_is_the_rendered_one(self, man_index, page_files, tmp_path):
+        """
+        Test that each page is rendered from its own file and a failed render is retried next time.
+        """
+        render = MagicMock(side_effect=fake_render)
+        files = dict(page_files, ls=str(tmp_path / "ls.8"))
+        (tmp_path / "ls.8").write_text("ls")
+        with patch('smartman.man_retriever.render_man_file', render):
+            assert update_index(man_index, files, processes=1)['failed'] == 1
+            assert man_index.changes(files) == (['ls'], [])
+
+        assert sorted(call.args[0] for call in render.call_args_list) == sorted(files.values())
+
+
+class TestGeneratePrompt:
+    """Test suite for man page snippets in generate prompts."""
+
+    def test_prompt_includes_top_snippets(self, tmp_path, page_files):
+        """
+        Test that generate prompts list the most relevant snippets when the index exists.
+        """
+        path = str(tmp_path / "man_index.db")
+        man_index = ManIndex(path)
+        with patch('smartman.man_retriever.render_man_file', side_effect=fake_render):
+            update_index(man_index, page_files, processes=1)
+        man_index.close()
+
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False,
+                           reference_snippets=2, man_index_path=path)
+        prompt = llm.prompt_for('generate', "make a gzip archive of my logs")
+
+        assert "make a gzip archive of my logs" in prompt
+        assert "tar: -z, --gzip: Filter the archive through gzip(1)." in prompt
+        assert prompt.count("\ntar: ") == 2
+
+    def test_prompt_unchanged_without_index(self, tmp_path):
+        """Test that generate prompts are untouched when no index has been built."""
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False,
+                           reference_snippets=5, man_index_path=str(tmp_path / "missing.db"))
+
+        assert llm.prompt_for('generate', "list files") == LLMInterface(
+            api_key="test", provider="openai", use_cache=False).prompt_for('generate', "list files")
+        assert not os.path.exists(tmp_path / "missing.db")
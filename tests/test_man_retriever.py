@@ -0,0 +1,402 @@
+"""
+Tests for man page retrieval.
+
+This module tests the retriever below the CLI layer to ensure:
+1. Retrieved documentation is cached by the identity of its source file
+2. Cached entries are invalidated when the source file changes
+3. Negative results are cached until the contents of PATH change
+4. Fallback sources are probed concurrently with timeouts and output caps
+5. Pages are parsed into sections and condensed to a token budget
+"""
+
+import os
+import time
+import pytest
+import tempfile
+from unittest.mock import patch
+from smartman import man_retriever
+from smartman.man_retriever import RetrievalCache
+
+# The autouse mock in conftest replaces man_retriever.get_man_page for every
+# test, so keep a reference to the real function taken at import time.
+real_get_man_page = man_retriever.get_man_page
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for cache entries and fake source files."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield temp_dir
+
+
+@pytest.fixture
+def retrieval_cache(temp_dir):
+    """Install a RetrievalCache in a temporary directory as the process-wide cache."""
+    cache = RetrievalCache(cache_dir=os.path.join(temp_dir, 'man_cache'))
+    with patch.object(man_retriever, '_retrieval_cache', cache):
+        yield cache
+
+
+def write_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestRetrievalCache:
+    """Test suite for the retrieval cache."""
+
+    def test_man_page_is_served_from_cache(self, temp_dir, retrieval_cache):
+        """
+        Test that a second lookup does not render the page again.
+
+        Verifies that:
+        1. The first lookup runs the retrieval
+        2. The second lookup returns the same text without retrieving
+        """
+        man_file = os.path.join(temp_dir, 'ls.1.gz')
+        write_file(man_file, 'source')
+        source = {'kind': 'man', 'path': man_file}
+
+        with patch.object(man_retriever, 'retrieve_documentation', return_value=("LS(1) page", source)) as mock_retrieve:
+            assert real_get_man_page('ls') == "LS(1) page"
+            assert real_get_man_page('ls') == "LS(1) page"
+
+        assert mock_retrieve.call_count == 1
+
+    def test_changed_source_file_invalidates_entry(self, temp_dir, retrieval_cache):
+        """
+        Test that editing the man file forces a fresh render.
+        """
+        man_file = os.path.join(temp_dir, 'ls.1.gz')
+        write_file(man_file, 'source')
+        retrieval_cache.set('ls', "old page", {'kind': 'man', 'path': man_file})
+        assert retrieval_cache.get('ls') == "old page"
+
+        write_file(man_file, 'updated source')
+
+        assert retrieval_cache.get('ls') is None
+
+    def test_negative_result_cached_until_path_changes(self, temp_dir, retrieval_cache):
+        """
+        Test that NO_DOCUMENTATION results are cached and dropped on PATH changes.
+
+        Verifies that:
+        1. A negative entry is returned while PATH is unchanged
+        2. Installing a file into a PATH directory invalidates it
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        with patch.dict(os.environ, {'PATH': bin_dir}):
+            retrieval_cache.set('mytool', "NO_DOCUMENTATION: none", {'kind': 'none', 'path': None})
+            assert retrieval_cache.get('mytool') == "NO_DOCUMENTATION: none"
+
+            write_file(os.path.join(bin_dir, 'mytool'), '#!/bin/sh\n')
+            os.utime(bin_dir, ns=(0, os.stat(bin_dir).st_mtime_ns + 1_000_000_000))
+
+            assert retrieval_cache.get('mytool') is None
+
+    def test_help_entry_tracks_binary_on_path(self, temp_dir, retrieval_cache):
+        """
+        Test that --help output is invalidated when the binary is replaced.
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        binary = os.path.join(bin_dir, 'mytool')
+        write_file(binary, '#!/bin/sh\necho usage\n')
+        os.chmod(binary, 0o755)
+
+        with patch.dict(os.environ, {'PATH': bin_dir}):
+            retrieval_cache.set('mytool', "COMMAND HELP OUTPUT:\nusage", {'kind': 'help', 'path': binary})
+            assert retrieval_cache.get('mytool') == "COMMAND HELP OUTPUT:\nusage"
+
+            write_file(binary, '#!/bin/sh\necho new usage\n')
+
+            assert retrieval_cache.get('mytool') is None
+
+    def test_use_cache_false_bypasses_cache(self, retrieval_cache):
+        """
+        Test that use_cache=False always retrieves and never stores.
+        """
+        source = {'kind': 'none', 'path': None}
+        with patch.object(man_retriever, 'retrieve_documentation', return_value=("NO_DOCUMENTATION: x", source)) as mock_retrieve:
+            real_get_man_page('x', use_cache=False)
+            real_get_man_page('x', use_cache=False)
+
+        assert mock_retrieve.call_count == 2
+        assert retrieval_cache.get('x') is None
+
+
+def write_script(path, body):
+    write_file(path, "#!/bin/sh\n" + body)
+    os.chmod(path, 0o755)
+
+
+class TestProbes:
+    """Test suite for the concurrent, time-bounded documentation probes."""
+
+    def test_probe_times_out(self):
+        """
+        Test that a probe which never finishes is killed after its timeout and
+        reports the timeout rather than a failure.
+        """
+        probe = man_retriever.DocumentationProbe(timeout=0.5)
+
+        start = time.monotonic()
+        with pytest.raises(man_retriever.ProbeTimeout):
+            probe.run_argv(['sh', '-c', 'sleep 30'])
+        assert time.monotonic() - start < 5
+        assert probe.run_argv(['sh', '-c', 'exit 1']) is None
+
+    def test_probe_closes_stdin(self):
+        """
+        Test that a probe reading stdin sees EOF instead of blocking.
+        """
+        probe = man_retriever.DocumentationProbe(timeout=5)
+
+        start = time.monotonic()
+        assert probe.run_argv(['sh', '-c', 'cat; echo done']) == "done\n"
+        assert time.monotonic() - start < 5
+
+    def test_probe_caps_output(self):
+        """
+        Test that endless output is truncated at max_bytes and still returned.
+        """
+        probe = man_retriever.DocumentationProbe(timeout=5, max_bytes=1000)
+
+        output = probe.run_argv(['sh', '-c', 'yes'])
+
+        assert output is not None and len(output) == 1000
+
+    def test_best_ranked_source_wins(self, temp_dir):
+        """
+        Test that a slower man page beats faster builtin help.
+
+        The man probe is the best-ranked source, so its answer is used even
+        though the builtin help answered first.
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        man_file = os.path.join(temp_dir, 'cd.1')
+        write_file(man_file, 'source')
+        write_script(os.path.join(bin_dir, 'man'),
+                     f'if [ "$1" = -w ]; then echo {man_file}; exit 0; fi\nsleep 0.3\necho "CD(1) page"\n')
+
+        with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}):
+            text, source = man_retriever.retrieve_documentation('cd')
+
+        assert text == "CD(1) page\n"
+        assert source == {'kind': 'man', 'path': man_file}
+
+    def test_help_output_is_the_fallback(self, temp_dir):
+        """
+        Test that a binary without a man page is documented by its --help output.
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        write_script(os.path.join(bin_dir, 'man'), 'exit 16\n')
+        write_script(os.path.join(bin_dir, 'mytool'), 'echo "usage: mytool"\n')
+
+        with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}):
+            text, source = man_retriever.retrieve_documentation('mytool')
+
+        assert text == "COMMAND HELP OUTPUT:\nusage: mytool\n"
+        assert source == {'kind': 'help', 'path': os.path.join(bin_dir, 'mytool')}
+
+    def test_hanging_help_probe_is_bounded(self, temp_dir):
+        """
+        Test that a command which hangs on --help cannot hang retrieval.
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        write_script(os.path.join(bin_dir, 'man'), 'exit 16\n')
+        write_script(os.path.join(bin_dir, 'hangs'), 'sleep 30\n')
+
+        with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}), \
+             patch.object(man_retriever, 'HELP_PROBE_TIMEOUT', 0.5):
+            start = time.monotonic()
+            text, source = man_retriever.retrieve_documentation('hangs')
+
+        assert source['kind'] == 'none'
+        assert time.monotonic() - start < 5
+
+    def test_slow_man_page_is_not_cached(self, temp_dir, retrieval_cache):
+        """
+        Test that the answer used while a better-ranked source timed out is not cached.
+
+        Verifies that:
+        1. A man page slower than PROBE_TIMEOUT falls back to --help
+        2. The fallback is flagged and not stored, so the next lookup retries man
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        man_file = os.path.join(temp_dir, 'mytool.1')
+        write_file(man_file, 'source')
+        write_script(os.path.join(bin_dir, 'man'),
+                     f'if [ "$1" = -w ]; then echo {man_file}; exit 0; fi\nsleep 30\n')
+        write_script(os.path.join(bin_dir, 'mytool'), 'echo "usage: mytool"\n')
+
+        with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}), \
+             patch.object(man_retriever, 'PROBE_TIMEOUT', 0.5):
+            text, source = man_retriever.retrieve_documentation('mytool')
+            assert real_get_man_page('mytool') == text
+
+        assert source == {'kind': 'help', 'path': os.path.join(bin_dir, 'mytool'), 'timed_out': True}
+        assert retrieval_cache.lookup('mytool') is None
+
+    def test_man_file_is_rendered_directly(self, temp_dir):
+        """
+        Test that render_man_file renders the given file with `man -l`.
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        write_script(os.path.join(bin_dir, 'man'), 'echo "rendered $*"\n')
+
+        with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}):
+            assert man_retriever.render_man_file('/man/man8/mount.8.gz') == "rendered -l /man/man8/mount.8.gz\n"
+
+    def test_binary_is_not_run_when_man_page_resolves(self, temp_dir):
+        """
+        Test that a command with a man page is never executed to ask for --help.
+        """
+        bin_dir = os.path.join(temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        man_file = os.path.join(temp_dir, 'mytool.1')
+        marker = os.path.join(temp_dir, 'ran')
+        write_file(man_file, 'source')
+        write_script(os.path.join(bin_dir, 'man'),
+                     f'if [ "$1" = -w ]; then echo {man_file}; exit 0; fi\necho "MYTOOL(1) page"\n')
+        write_script(os.path.join(bin_dir, 'mytool'), f'touch {marker}\necho "usage: mytool"\n')
+
+        with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}):
+            text, source = man_retriever.retrieve_documentation('mytool')
+
+        assert source['kind'] == 'man'
+        assert not os.path.exists(marker)
+
+
+SAMPLE_MAN_PAGE = """LS(1)                            User Commands                           LS(1)
+
+NAME
+       ls - list directory contents
+
+SYNOPSIS
+       ls [OPTION]... [FILE]...
+
+DESCRIPTION
+       List  information  about  the FILEs (the current directory by default).
+       Sort entries alphabetically if none of -cftuvSUX nor --sort  is  speci‐
+       fied.
+
+       -a, --all
+              do not ignore entries starting with .
+
+       -A, --almost-all
+              do not list implied . and ..
+
+EXAMPLES
+       List everything, long format:
+           ls -la
+
+AUTHOR
+       Written by Richard M. Stallman and David MacKenzie.
+
+REPORTING BUGS
+       GNU coreutils online help: <https://www.gnu.org/software/coreutils/>
+
+SEE ALSO
+       Full documentation <https://www.gnu.org/software/coreutils/ls>
+
+GNU coreutils 9.1               September 2022                           LS(1)
+"""
+
+
+class TestManPageParser:
+    """Test suite for the section parser and token-budgeted prompt context."""
+
+    def test_parse_sections_and_options(self):
+        """
+        Test that a rendered page is split into sections and option entries.
+
+        Verifies that:
+        1. The title line is recognised and the footer dropped
+        2. Section headings are found in page order
+        3. Option entries are extracted with unwrapped descriptions
+        """
+        parsed = man_retriever.parse_man_page(SAMPLE_MAN_PAGE)
+
+        assert parsed['header'] == "LS(1) User Commands LS(1)"
+        assert list(parsed['sections']) == ['NAME', 'SYNOPSIS', 'DESCRIPTION', 'EXAMPLES',
+                                            'AUTHOR', 'REPORTING BUGS', 'SEE ALSO']
+        assert parsed['options'] == [
+            {'flags': '-a, --all', 'description': 'do not ignore entries starting with .'},
+            {'flags': '-A, --almost-all', 'description': 'do not list implied . and ..'},
+        ]
+
+    def test_overstrike_formatting_is_removed(self):
+        """
+        Test that bold/underline overstrike sequences don't leak into section names.
+        """
+        parsed = man_retriever.parse_man_page("N\bNA\bAM\bME\bE\n       ls - list\n")
+
+        assert list(parsed['sections']) == ['NAME']
+
+    def test_context_drops_boilerplate_and_padding(self):
+        """
+        Test that the prompt context keeps useful sections in a compact form.
+
+        Verifies that:
+        1. AUTHOR, REPORTING BUGS, SEE ALSO and the footer are dropped
+        2. Justified prose is unwrapped and hyphenation rejoined
+        3. Example code keeps its relative indentation
+        """
+        context = man_retriever.build_prompt_context(SAMPLE_MAN_PAGE)
+
+        assert "AUTHOR" not in context and "SEE ALSO" not in context and "REPORTING BUGS" not in context
+        assert "September 2022" not in context
+        assert "List information about the FILEs" in context
+        assert "--sort is specified." in context
+        assert "-a, --all: do not ignore entries starting with ." in context
+        assert "List everything, long format:\n    ls -la" in context
+        assert len(context) < len(SAMPLE_MAN_PAGE) / 2
+
+    def test_context_respects_token_budget_by_priority(self):
+        """
+        Test that a small budget keeps the highest-priority sections first.
+        """
+        context = man_retriever.build_prompt_context(SAMPLE_MAN_PAGE, token_budget=40)
+
+        assert "ls - list directory contents" in context
+        assert "ls [OPTION]... [FILE]..." in context
+        assert "EXAMPLES" not in context
+        assert man_retriever.estimate_tokens(context) <= 40
+
+    def test_help_output_keeps_marker(self):
+        """
+        Test that --help output keeps its marker and NO_DOCUMENTATION passes through untouched.
+        """
+        help_text = "COMMAND HELP OUTPUT:\nUsage: tool [OPTION]\n\n  -v   be verbose\n"
+        no_docs = "NO_DOCUMENTATION: nothing found"
+
+        assert man_retriever.build_prompt_context(help_text).startswith("COMMAND HELP OUTPUT:\n")
+        assert man_retriever.build_prompt_context(no_docs) == no_docs
+
+    def test_split_follows_section_boundaries(self):
+        """
+        Test that large pages are split into self-contained chunks.
+
+        Verifies that:
+        1. Every chunk starts with the page title and stays near the chunk size
+        2. A section split across chunks repeats its heading as continued
+        3. No rendered content is lost or duplicated
+        """
+        chunks = man_retriever.split_man_page(SAMPLE_MAN_PAGE, 60)
+
+        assert len(chunks) > 1
+        assert all(chunk.startswith("LS(1) User Commands LS(1)\n\n") for chunk in chunks)
+        assert all(man_retriever.estimate_tokens(chunk) <= 70 for chunk in chunks)
+        assert any("DESCRIPTION (continued)" in chunk for chunk in chunks)
+        joined = "\n".join(chunks)
+        for line in man_retriever.build_prompt_context(SAMPLE_MAN_PAGE, None).split("\n")[1:]:
+            if line and line != "DESCRIPTION":
+                assert joined.count(line) == 1, line
+        assert man_retriever.split_man_page("NO_DOCUMENTATION: nothing", 60) == ["NO_DOCUMENTATION: nothing"]
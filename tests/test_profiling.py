@@ -0,0 +1,109 @@
+"""
+Tests for the `--profile` timing breakdown.
+
+This module verifies that:
+1. Phases are charged their own time, excluding nested phases
+2. Nothing is recorded while profiling is off
+3. Streamed items are timed one by one
+4. `smartman --profile` prints the breakdown and writes JSON or cProfile output
+"""
+
+import json
+import time
+import pstats
+import pytest
+from smartman import profiling
+from smartman.main import cli
+
+
+@pytest.fixture(autouse=True)
+def clean_profile():
+    """Start and end every test with profiling off and nothing recorded."""
+    profiling.reset()
+    yield
+    profiling.reset()
+
+
+class TestPhases:
+    """Test suite for phase accounting."""
+
+    def test_nested_phases_are_exclusive(self):
+        """
+        Test that an outer phase is not charged for the time of an inner one.
+
+        Verifies that:
+        1. Each phase counts its calls
+        2. The outer phase's time excludes the nested phase
+        """
+        profiling.enable()
+        with profiling.phase('llm request'):
+            with profiling.phase('cache'):
+                time.sleep(0.05)
+            time.sleep(0.01)
+        phases = profiling.summary()['phases']
+
+        assert phases['cache']['calls'] == 1
+        assert phases['cache']['seconds'] >= 0.05
+        assert 0.01 <= phases['llm request']['seconds'] < 0.05
+
+    def test_disabled_records_nothing(self):
+        """Test that timed functions and phases are no-ops while profiling is off."""
+        double = profiling.timed('cache')(lambda value: value * 2)
+        with profiling.phase('render'):
+            assert double(21) == 42
+
+        assert set(profiling.summary()['phases']) <= {'imports', 'other'}
+
+    def test_iterate_times_each_item(self):
+        """Test that producing streamed items is charged to the phase, consuming them is not."""
+        def chunks():
+            for chunk in ("a", "b", "c"):
+                time.sleep(0.01)
+                yield chunk
+
+        profiling.enable()
+        with profiling.phase('render'):
+            assert "".join(profiling.iterate('llm request', chunks())) == "abc"
+        phases = profiling.summary()['phases']
+
+        assert phases['llm request']['calls'] == 4
+        assert phases['llm request']['seconds'] >= 0.03
+        assert phases['render']['seconds'] < phases['llm request']['seconds']
+
+
+class TestProfileFlag:
+    """Test suite for the --profile CLI option."""
+
+    def test_profile_prints_breakdown(self, cli_runner):
+        """Test that --profile reports the phases of a command after its output."""
+        result = cli_runner.invoke(cli, ['--profile', 'summary', 'ls'])
+
+        assert result.exit_code == 0
+        assert "smartman profile" in result.output
+        for phase in ('imports', 'config', 'render', 'total'):
+            assert phase in result.output
+
+    def test_environment_variable_enables_profile(self, cli_runner, monkeypatch):
+        """Test that SMARTMAN_PROFILE=1 works like --profile."""
+        monkeypatch.setenv('SMARTMAN_PROFILE', '1')
+        result = cli_runner.invoke(cli, ['summary', 'ls'])
+
+        assert "smartman profile" in result.output
+
+    def test_profile_output_json(self, cli_runner, tmp_path):
+        """Test that a .json output path receives the breakdown."""
+        path = tmp_path / "profile.json"
+        result = cli_runner.invoke(cli, ['--profile-output', str(path), 'generate', 'list files'])
+
+        assert result.exit_code == 0
+        data = json.loads(path.read_text())
+        assert data['total'] > 0
+        assert data['phases']['config']['calls'] == 1
+
+    def test_profile_output_cprofile(self, cli_runner, tmp_path):
+        """Test that any other output path receives cProfile stats."""
+        path = tmp_path / "smartman.prof"
+        result = cli_runner.invoke(cli, ['--profile-output', str(path), 'summary', 'ls'])
+
+        assert result.exit_code == 0
+        assert pstats.Stats(str(path)).total_calls > 0
@@ -0,0 +1,257 @@
+"""
+Tests for latency-aware routing and failover between backends.
+
+This module verifies that:
+1. Provider errors carry their status code and whether they are transient
+2. Transient failures are retried, other failures fail over at once
+3. Requests go to the fastest healthy backend and statistics persist
+4. A backend that keeps failing is skipped by the circuit breaker
+5. Importing the module does not import asyncio
+"""
+
+import os
+import json
+import time
+import asyncio
+import pytest
+import subprocess
+import sys
+from unittest.mock import patch, MagicMock
+from smartman.llm_interface import LLMInterface, AsyncLLMInterface, LLMAPIError, is_transient
+from smartman.routing import Router, load_stats
+
+
+class FakeBackend:
+    """Stand-in for an LLMInterface answering from a script of results and errors."""
+
+    def __init__(self, provider, outcomes, delay=0.0):
+        self.provider = provider
+        self.model = f"{provider}-model"
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+
+    def _call_direct(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def _stream_direct(self, prompt):
+        yield from self._call_direct(prompt).split()
+
+
+@pytest.fixture
+def make_router(tmp_path):
+    """Build a Router without backoff delays, persisting stats under tmp_path."""
+    def make(*backends, **options):
+        options.setdefault('backoff', 0)
+        return Router(backends, stats_path=str(tmp_path / "routing_stats.json"), **options)
+    return make
+
+
+class TestErrors:
+    """Test suite for the typed provider errors."""
+
+    @pytest.mark.parametrize("status_code,transient", [(429, True), (503, True), (408, True),
+                                                       (400, False), (401, False)])
+    def test_http_errors_carry_status(self, status_code, transient):
+        """
+        Test that an error response raises LLMAPIError with its status and retryability.
+        """
+        llm = LLMInterface(api_key="test", provider="custom", use_cache=False)
+        response = MagicMock(status_code=status_code)
+        response.json.return_value = {"error": {"message": "nope"}}
+
+        with pytest.raises(LLMAPIError, match=r"LLM API error \(custom\): nope") as error:
+            llm._fallback_text(response)
+        assert error.value.status_code == status_code
+        assert error.value.transient is transient
+
+    def test_sdk_errors_are_wrapped(self):
+        """
+        Test that SDK exceptions keep their status code and connection errors count as transient.
+        """
+        llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+        llm._client = MagicMock()
+
+        class APIConnectionError(Exception):
+            pass
+
+        llm._client.chat.completions.create.side_effect = APIConnectionError("connection reset")
+        with pytest.raises(LLMAPIError, match="OpenAI API error: connection reset") as error:
+            llm._call_openai("prompt")
+        assert error.value.status_code is None and error.value.transient
+
+        rate_limited = Exception("slow down")
+        rate_limited.status_code = 429
+        llm._client.chat.completions.create.side_effect = rate_limited
+        with pytest.raises(LLMAPIError) as error:
+            llm._call_openai("prompt")
+        assert error.value.status_code == 429 and error.value.transient
+
+    def test_timeouts_are_transient(self):
+        """Test that socket-level timeouts are retried and plain errors are not."""
+        assert is_transient(TimeoutError())
+        assert not is_transient(ValueError("bad"))
+
+
+class TestRouter:
+    """Test suite for retries, failover and backend selection."""
+
+    def test_transient_failure_is_retried(self, make_router):
+        """
+        Test that a 503 is retried on the same backend before it succeeds.
+        """
+        primary = FakeBackend("openai", [LLMAPIError("busy", status_code=503), "answer"])
+        secondary = FakeBackend("anthropic", ["other answer"])
+        router = make_router(primary, secondary)
+
+        assert router.call("prompt") == "answer"
+        assert primary.calls == 2
+        assert secondary.calls == 0
+
+    def test_permanent_failure_fails_over_at_once(self, make_router):
+        """
+        Test that a non-transient error moves straight to the next backend.
+        """
+        primary = FakeBackend("openai", [LLMAPIError("bad key", status_code=401)])
+        secondary = FakeBackend("anthropic", ["other answer"])
+        router = make_router(primary, secondary)
+
+        assert router.call("prompt") == "other answer"
+        assert primary.calls == 1
+
+    def test_exhausted_retries_fail_over(self, make_router):
+        """
+        Test that a backend failing on every retry is abandoned for the next one.
+        """
+        primary = FakeBackend("openai", [LLMAPIError("rate limited", status_code=429)])
+        secondary = FakeBackend("anthropic", ["other answer"])
+        router = make_router(primary, secondary, retries=2)
+
+        assert router.call("prompt") == "other answer"
+        assert primary.calls == 3
+
+    def test_all_failing_raises_first_error(self, make_router):
+        """Test that the first backend's error is raised when no backend answers."""
+        router = make_router(FakeBackend("openai", [LLMAPIError("openai down", status_code=500)]),
+                             FakeBackend("anthropic", [LLMAPIError("anthropic down", status_code=500)]))
+
+        with pytest.raises(LLMAPIError, match="openai down"):
+            router.call("prompt")
+
+    def test_fastest_backend_is_preferred_and_persisted(self, make_router, tmp_path):
+        """
+        Test that once measured, the faster backend is tried first, also by a new router.
+        """
+        slow = FakeBackend("openai", ["slow answer"], delay=0.05)
+        fast = FakeBackend("anthropic", ["fast answer"])
+        router = make_router(slow, fast)
+        router.record(fast, 0.01)
+
+        assert router.order() == [slow, fast]  # slow is still unmeasured
+        router.call("prompt")
+        assert router.order() == [fast, slow]
+
+        stats = load_stats(str(tmp_path / "routing_stats.json"))
+        assert set(stats) == {"openai/openai-model", "anthropic/anthropic-model"}
+        assert make_router(slow, fast).order() == [fast, slow]
+
+    def test_circuit_breaker_skips_failing_backend(self, make_router):
+        """
+        Test that repeated failures open the circuit and the cooldown lets the backend back in.
+        """
+        primary = FakeBackend("openai", [LLMAPIError("down", status_code=502)])
+        secondary = FakeBackend("anthropic", ["other answer"])
+        router = make_router(primary, secondary, retries=1, failure_threshold=2, cooldown=0.2)
+
+        assert router.call("prompt") == "other answer"
+        assert router.is_open(primary)
+        calls = primary.calls
+        router.call("prompt")
+        assert primary.calls == calls
+
+        time.sleep(0.25)
+        primary.outcomes = ["recovered"]
+        assert router.order()[-1] is primary  # it has never answered, so it ranks last
+        router.backends = [primary]
+        assert router.call("prompt") == "recovered"
+        assert not router.is_open(primary)
+
+    def test_stream_fails_over_before_first_chunk(self, make_router):
+        """Test that a stream failing to start is served by the next backend."""
+        router = make_router(FakeBackend("openai", [LLMAPIError("bad request", status_code=400)]),
+                             FakeBackend("anthropic", ["streamed answer"]))
+
+        assert list(router.stream("prompt")) == ["streamed", "answer"]
+
+    def test_stream_setup_errors_fail_over(self, make_router):
+        """Test that a backend failing while setting up its stream (before any generator runs) is failed over."""
+        primary = FakeBackend("custom", ["unused"])
+        primary._stream_direct = MagicMock(side_effect=ConnectionError("refused"))
+        router = make_router(primary, FakeBackend("anthropic", ["streamed answer"]), retries=1)
+
+        assert list(router.stream("prompt")) == ["streamed", "answer"]
+        assert primary._stream_direct.call_count == 2
+
+    def test_async_call_fails_over(self, make_router):
+        """Test the asyncio variant used by AsyncLLMInterface."""
+        async def failing(prompt):
+            raise LLMAPIError("overloaded", status_code=529)
+
+        async def answering(prompt):
+            return "async answer"
+
+        primary, secondary = FakeBackend("openai", []), FakeBackend("anthropic", [])
+        primary._call_direct, secondary._call_direct = failing, answering
+
+        assert asyncio.run(make_router(primary, secondary).acall("prompt")) == "async answer"
+
+
+class TestInterfaceRouting:
+    """Test suite for routing configured on LLMInterface."""
+
+    def test_routes_build_backends_and_fail_over(self, tmp_path):
+        """
+        Test that routes add backends with keys from the environment and requests fail over.
+        """
+        with patch.dict(os.environ, {'ANTH_API_KEY': 'test_anthropic_key'}, clear=True):
+            llm = LLMInterface(api_key="test", provider="openai", use_cache=False,
+                               routes=[{"provider": "anthropic"}, {"provider": "openai", "model": "gpt-4o"},
+                                       {"provider": "custom"}],
+                               routing_options={"stats_path": str(tmp_path / "stats.json"), "backoff": 0})
+
+        assert [(b.provider, b.model) for b in llm.router.backends] == \
+            [("openai", "gpt-4o"), ("anthropic", "claude-3-opus-20240229")]
+        assert "routes" in json.loads(llm._cache_text("prompt"))
+
+        llm._call_direct = MagicMock(side_effect=LLMAPIError("down", status_code=500))
+        llm.router.backends[1]._call_direct = MagicMock(return_value="from anthropic")
+        assert llm._call_provider("prompt") == "from anthropic"
+
+    def test_async_interface_builds_async_backends(self, tmp_path):
+        """Test that AsyncLLMInterface routes between async interfaces."""
+        with patch.dict(os.environ, {'ANTH_API_KEY': 'test_anthropic_key'}):
+            llm = AsyncLLMInterface(api_key="test", provider="openai", use_cache=False,
+                                    routes=[{"provider": "anthropic"}],
+                                    routing_options={"stats_path": str(tmp_path / "stats.json")})
+        assert all(isinstance(backend, AsyncLLMInterface) for backend in llm.router.backends)
+
+
+class TestImports:
+    """Test suite for the import cost of the routing module."""
+
+    def test_asyncio_is_imported_lazily(self):
+        """
+        Test that importing the routing module does not import asyncio.
+
+        Run in a fresh interpreter because the test session itself has it loaded.
+        """
+        script = "import sys, smartman.routing\nprint('asyncio' in sys.modules)\n"
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "False"
@@ -0,0 +1,116 @@
+"""
+Tests for the interactive session cache and prefetching.
+
+This module verifies that:
+1. The session LRU forgets its least recently used entries
+2. Pages and answers are retrieved once per session
+3. The examples of a summarized command are prefetched within the budget
+4. A prefetch in flight is waited for instead of being requested again
+5. `smartman interactive` answers a follow-up from the session
+"""
+
+import threading
+from unittest.mock import patch, MagicMock
+from smartman.main import cli
+from smartman.session import LRU, InteractiveSession
+
+
+def make_llm():
+    llm = MagicMock()
+    llm.generate_summary.side_effect = lambda text: f"summary of {text}"
+    llm.generate_example.side_effect = lambda text: f"examples of {text}"
+    llm.stream_summary.side_effect = lambda text: iter(["summary ", f"of {text}"])
+    return llm
+
+
+class TestSessionCache:
+    """Test suite for the in-memory session cache."""
+
+    def test_lru_evicts_least_recently_used(self):
+        """Test that reading an entry keeps it over older ones."""
+        lru = LRU(2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        assert lru.get('a') == 1
+        lru.put('c', 3)
+
+        assert lru.get('b') is None
+        assert (lru.get('a'), lru.get('c')) == (1, 3)
+
+    def test_pages_and_answers_are_reused(self):
+        """
+        Test that repeated questions in a session make no new retrieval or request.
+
+        Verifies that:
+        1. The page is retrieved once for both actions
+        2. A streamed answer is remembered once complete
+        """
+        llm = make_llm()
+        session = InteractiveSession(llm, prefetch=False)
+        with patch('smartman.man_retriever.get_man_page', return_value="LS PAGE") as get_man_page:
+            assert "".join(session.stream('summary', 'ls')) == "summary of LS PAGE"
+            assert session.answer('summary', 'ls') == "summary of LS PAGE"
+            assert session.answer('example', 'ls') == "examples of LS PAGE"
+
+        assert get_man_page.call_count == 1
+        llm.generate_summary.assert_not_called()
+
+
+class TestPrefetch:
+    """Test suite for speculative prefetching."""
+
+    def test_summary_prefetches_examples(self):
+        """Test that after a summary, the examples are requested in the background and served from memory."""
+        llm = make_llm()
+        session = InteractiveSession(llm)
+        with patch('smartman.man_retriever.get_man_page', return_value="LS PAGE"):
+            session.answer('summary', 'ls')
+            session.answered('summary', 'ls')
+            assert session.answer('example', 'ls') == "examples of LS PAGE"
+
+        assert llm.generate_example.call_count == 1
+        assert session.prefetches == 1
+
+    def test_budget_and_off_switch(self):
+        """Test that no prefetch starts once the budget is spent or when prefetching is off."""
+        llm = make_llm()
+        with patch('smartman.man_retriever.get_man_page', return_value="PAGE"):
+            session = InteractiveSession(llm, prefetch_budget=1)
+            assert session.prefetch('example', 'ls')
+            assert not session.prefetch('example', 'tar')
+            assert not InteractiveSession(llm, prefetch=False).prefetch('example', 'ls')
+
+    def test_pending_prefetch_is_awaited(self):
+        """Test that asking for an answer still being prefetched waits for it rather than requesting it again."""
+        release = threading.Event()
+        llm = make_llm()
+        llm.generate_example.side_effect = lambda text: release.wait(5) and "examples"
+        session = InteractiveSession(llm)
+        with patch('smartman.man_retriever.get_man_page', return_value="PAGE"):
+            session.prefetch('example', 'ls')
+            threading.Timer(0.05, release.set).start()
+            assert session.answer('example', 'ls') == "examples"
+
+        assert llm.generate_example.call_count == 1
+
+    def test_failed_prefetch_is_retried_on_demand(self):
+        """Test that a prefetch error is not shown; the answer is requested again when asked for."""
+        llm = make_llm()
+        llm.generate_example.side_effect = [Exception("rate limited"), "examples"]
+        session = InteractiveSession(llm)
+        with patch('smartman.man_retriever.get_man_page', return_value="PAGE"):
+            session.prefetch('example', 'ls')
+            assert session.answer('example', 'ls') == "examples"
+
+
+class TestInteractiveCommand:
+    """Test suite for the session in `smartman interactive`."""
+
+    def test_follow_up_is_answered_from_session(self, cli_runner, mock_llm_interface, mock_man_page):
+        """Test that `example X` after `summary X` reuses the page and the prefetched answer."""
+        result = cli_runner.invoke(cli, ['interactive'], input="summary ls\nexample ls\nexample ls\nexit\n")
+
+        assert result.exit_code == 0
+        assert "Summary of 'ls'" in result.output and "Examples for 'ls'" in result.output
+        assert mock_llm_interface.return_value.generate_example.call_count == 1
+        assert mock_man_page.call_count == 1
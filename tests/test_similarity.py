@@ -0,0 +1,155 @@
+"""
+Tests for the similarity cache of `generate` intents.
+
+This module verifies that:
+1. Intents are normalized so filler words, case and plurals don't matter
+2. Similar intents share a command while numbers, paths, negations, directions and verbs must match
+3. The index persists, expires and evicts entries
+4. generate_command reuses the command of a similar earlier intent
+"""
+
+import os
+import time
+import asyncio
+import pytest
+import tempfile
+from unittest.mock import MagicMock, AsyncMock
+from smartman.cache import ResponseCache
+from smartman.similarity import SimilarityIndex, normalize_intent
+from smartman.llm_interface import LLMInterface, AsyncLLMInterface
+
+
+@pytest.fixture
+def index(tmp_path):
+    """A SimilarityIndex in a temporary directory."""
+    index = SimilarityIndex(str(tmp_path / "intents.db"), threshold=0.8)
+    yield index
+    index.close()
+
+
+class TestNormalization:
+    """Test suite for intent normalization."""
+
+    def test_filler_words_case_and_plurals(self):
+        """Test that paraphrases differing only in filler words normalize identically."""
+        assert normalize_intent("Find all PDF files") == "find pdf file"
+        assert normalize_intent("find every pdf file, please!") == "find pdf file"
+
+    def test_paths_and_options_are_kept(self):
+        """Test that paths, globs and flags survive normalization."""
+        assert normalize_intent("list *.log files in /var/log") == "list *.log file /var/log"
+
+
+class TestSimilarityIndex:
+    """Test suite for lookups in the similarity index."""
+
+    def test_similar_intent_reuses_command(self, index):
+        """
+        Test that a reworded intent finds the stored command and an unrelated one doesn't.
+        """
+        index.add("scope", "count lines in all python files", "find . -name '*.py' | xargs wc -l")
+
+        assert index.lookup("scope", "count the lines of every python file") == "find . -name '*.py' | xargs wc -l"
+        assert index.lookup("scope", "delete all python files") is None
+        assert index.lookup("other scope", "count lines in all python files") is None
+
+    @pytest.mark.parametrize("stored,query", [
+        ("find pdf files modified in the last 7 days", "find pdf files modified in the last 30 days"),
+        ("list files owned by root", "list files not owned by root"),
+        ("archive the /tmp directory", "archive the /var directory"),
+        ("zip the project excluding node modules", "unzip the project excluding node modules"),
+        ("encrypt backup archive with gpg", "decrypt backup archive with gpg"),
+        ("mount the usb drive", "unmount the usb drive"),
+        ("show the last lines of the syslog continuously", "show the first lines of the syslog continuously"),
+        ("compress the log directory", "decompress the log directory"),
+        ("install the nginx package", "uninstall the nginx package"),
+        ("show the head of the file", "show the tail of the file"),
+        ("start the docker service", "stop the docker service"),
+    ])
+    def test_guard_words_must_match(self, index, stored, query):
+        """
+        Test that near-identical intents differing in a number, path, negation,
+        direction, un-/de- word or leading verb don't match.
+        """
+        index.add("scope", stored, "command")
+
+        assert index.lookup("scope", query) is None
+
+    def test_entries_persist_and_expire(self, tmp_path):
+        """
+        Test that entries survive reopening and are dropped once expired.
+        """
+        path = str(tmp_path / "intents.db")
+        SimilarityIndex(path).add("scope", "show disk usage", "du -sh .")
+        assert SimilarityIndex(path).lookup("scope", "show the disk usage") == "du -sh ."
+
+        short_lived = SimilarityIndex(path, ttl_seconds=0.05)
+        short_lived.add("scope", "show free memory", "free -h")
+        time.sleep(0.1)
+        assert short_lived.lookup("scope", "show free memory") is None
+
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        """Test that the index keeps at most max_entries intents."""
+        index = SimilarityIndex(str(tmp_path / "intents.db"), max_entries=2)
+        index.add("scope", "show disk usage", "du -sh .")
+        index.add("scope", "show free memory", "free -h")
+        index.lookup("scope", "show disk usage")
+        index.add("scope", "show kernel version", "uname -r")
+
+        assert len(index) == 2
+        assert index.lookup("scope", "show free memory") is None
+        assert index.lookup("scope", "show disk usage") == "du -sh ."
+
+
+class TestGenerateCommand:
+    """Test suite for similarity lookups in front of generate_command."""
+
+    @pytest.fixture
+    def llm(self):
+        """An LLMInterface with a temporary cache and a mock provider call."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            llm = LLMInterface(api_key="test", provider="openai", use_cache=False)
+            llm.use_cache = True
+            llm.cache = ResponseCache(cache_dir=temp_dir)
+            llm._call_direct = MagicMock(return_value="find . -name '*.pdf'")
+            yield llm
+            llm.close()
+
+    def test_paraphrase_is_answered_without_a_call(self, llm):
+        """
+        Test that a second, reworded intent reuses the first answer.
+        """
+        assert llm.generate_command("find all pdf files") == "find . -name '*.pdf'"
+        assert "".join(llm.stream_command("find every PDF file")) == "find . -name '*.pdf'"
+        assert llm._call_direct.call_count == 1
+
+        llm.generate_command("find pdf files larger than 10M")
+        assert llm._call_direct.call_count == 2
+
+    def test_threshold_none_disables_similarity(self, llm):
+        """Test that only exact prompts are reused when the threshold is None."""
+        llm.similarity_threshold = None
+        llm.generate_command("find all pdf files")
+        llm.generate_command("find every PDF file")
+
+        assert llm._call_direct.call_count == 2
+        assert not os.path.exists(os.path.join(llm.cache.cache_dir, "intents.db"))
+
+    def test_settings_scope_the_reuse(self, llm):
+        """Test that a command is not reused after switching model."""
+        llm.generate_command("find all pdf files")
+        llm.model = "gpt-4o-mini"
+        llm.generate_command("find every PDF file")
+
+        assert llm._call_direct.call_count == 2
+
+    def test_async_interface_shares_the_index(self, llm):
+        """Test that AsyncLLMInterface finds intents answered by the sync interface."""
+        llm.generate_command("find all pdf files")
+        async_llm = AsyncLLMInterface(api_key="test", provider="openai", use_cache=False)
+        async_llm.use_cache = True
+        async_llm.cache = llm.cache
+        async_llm._call_direct = AsyncMock(return_value="unused")
+
+        assert asyncio.run(async_llm.generate_command("find every PDF file")) == "find . -name '*.pdf'"
+        async_llm._call_direct.assert_not_called()
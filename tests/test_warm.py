@@ -0,0 +1,142 @@
+"""
+Tests for the cache warm-up behind `smartman warm`.
+
+This module verifies that:
+1. Pages are listed from the manpath with section and glob filters
+2. Only pages missing from the cache are sent to the LLM
+3. An interrupted run resumes from its checkpoint
+"""
+
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from smartman import warm, man_retriever
+from smartman.main import cli
+
+
+@pytest.fixture
+def manpath(tmp_path):
+    """A manpath with pages in sections 1, 3p and 8."""
+    for section, filenames in {'man1': ['ls.1.gz', 'tar.1', 'git-log.1.gz'],
+                               'man3p': ['printf.3p.gz'],
+                               'man8': ['mount.8.gz', 'ls.8']}.items():
+        os.makedirs(tmp_path / section)
+        for filename in filenames:
+            (tmp_path / section / filename).write_text("")
+    return str(tmp_path)
+
+
+def make_llm(cached=()):
+    """A mock LLMInterface whose cache already holds answers for the `cached` pages."""
+    llm = MagicMock()
+    llm.document_prompt.side_effect = lambda action, text: f"{action}:{text}"
+    llm.get_cached.side_effect = lambda action, prompt: "hit" if prompt.split(':', 1)[1] in cached else None
+    return llm
+
+
+class TestListPages:
+    """Test suite for listing pages in the manpath."""
+
+    def test_lists_names_once_per_page(self, manpath):
+        """
+        Test that compression and section suffixes are stripped and duplicates removed.
+        """
+        assert warm.list_pages(dirs=[manpath]) == ['git-log', 'ls', 'mount', 'tar']
+        assert warm.list_pages(sections=(), dirs=[manpath]) == ['git-log', 'ls', 'mount', 'printf', 'tar']
+
+    def test_section_and_glob_filters(self, manpath):
+        """
+        Test that section prefixes and include/exclude globs narrow the list.
+        """
+        assert warm.list_pages(sections=('3',), dirs=[manpath]) == ['printf']
+        assert warm.list_pages(include=('git-*', 't*'), dirs=[manpath]) == ['git-log', 'tar']
+        assert warm.list_pages(exclude=('git-*',), dirs=[manpath]) == ['ls', 'mount', 'tar']
+
+
+class TestWarmCache:
+    """Test suite for filling the response cache."""
+
+    def test_only_uncached_pages_are_generated(self, mock_man_page):
+        """
+        Test that cached pages are skipped and failures do not stop the run.
+
+        Verifies that:
+        1. Pages already cached make no LLM request
+        2. Pages whose file can't be rendered are reported as failed
+        3. Every other page is generated exactly once
+        4. Pages are rendered from their files, never by looking the command up
+        """
+        llm = make_llm(cached=["GREP(1) page"])
+        files = {'ls': '/man/man1/ls.1', 'grep': '/man/man1/grep.1', 'missing': '/man/man1/missing.1'}
+        pages = {'/man/man1/ls.1': "LS(1) page", '/man/man1/grep.1': "GREP(1) page"}
+        results = []
+
+        with patch.object(man_retriever, 'render_man_file', side_effect=pages.get):
+            counts = warm.warm_cache(llm, files, processes=1, concurrency=2,
+                                     on_result=lambda name, outcome, error: results.append((name, outcome)))
+
+        assert counts == {'warmed': 1, 'cached': 1, 'failed': 1}
+        assert sorted(results) == [('grep', 'cached'), ('ls', 'warmed'), ('missing', 'failed')]
+        llm.generate_summary.assert_called_once_with("LS(1) page")
+        mock_man_page.assert_not_called()
+
+    def test_rendered_page_is_cached_for_its_file(self, tmp_path):
+        """
+        Test that a warmed page is served from the retrieval cache while its file is unchanged.
+        """
+        path = tmp_path / "ls.1"
+        path.write_text("source")
+
+        with patch.object(man_retriever, 'render_man_file', return_value="LS(1) page"):
+            assert warm.render_page('ls', str(path)) == ('ls', "LS(1) page")
+
+        assert man_retriever.get_retrieval_cache().lookup('ls')['path'] == str(path)
+        assert man_retriever.get_retrieval_cache().get('ls') == "LS(1) page"
+
+    def test_checkpoint_resumes_matching_run(self, tmp_path):
+        """
+        Test that finished pages survive an interruption but not a settings change.
+        """
+        path = str(tmp_path / "warm_checkpoint.jsonl")
+        settings = {'provider': 'openai', 'model': 'gpt-4o', 'actions': ['summary']}
+
+        checkpoint = warm.WarmCheckpoint(path, settings)
+        assert checkpoint.start() == set()
+        checkpoint.record('ls')
+        checkpoint.record('tar')
+        with open(path, 'a') as f:
+            f.write('{"name": "gr')  # cut short by the interruption
+        checkpoint.close()
+
+        assert warm.WarmCheckpoint(path, settings).load() == {'ls', 'tar'}
+        assert warm.WarmCheckpoint(path, dict(settings, model='gpt-4')).load() == set()
+
+        resumed = warm.WarmCheckpoint(path, settings)
+        assert resumed.start() == {'ls', 'tar'}
+        resumed.close(finished=True)
+        assert not os.path.exists(path)
+
+    def test_warm_command_skips_checkpointed_pages(self, cli_runner, manpath, mock_llm_interface,
+                                                   monkeypatch, tmp_path):
+        """
+        Test the CLI end to end: checkpointed pages are not rendered again.
+        """
+        monkeypatch.setenv('HOME', str(tmp_path))
+        monkeypatch.setattr(warm, 'manpath_dirs', lambda: [manpath])
+        render = MagicMock(side_effect=lambda path: f"{os.path.basename(path)}\nNAME\n       a tool\n")
+        monkeypatch.setattr(man_retriever, 'render_man_file', render)
+        mock_llm_interface.return_value.get_cached.return_value = None
+        checkpoint = warm.WarmCheckpoint(str(tmp_path / ".smartman" / "warm_checkpoint.jsonl"),
+                                         {'provider': None, 'model': None, 'actions': ['summary']})
+        checkpoint.start()
+        checkpoint.record('ls')
+        checkpoint.close()
+
+        result = cli_runner.invoke(cli, ['warm', '--processes', '1'])
+
+        assert result.exit_code == 0, result.output
+        assert "Resuming: 1 of 4 pages already done." in result.output
+        assert "3 warmed" in result.output
+        assert sorted(os.path.basename(call.args[0]) for call in render.call_args_list) == [
+            'git-log.1.gz', 'mount.8.gz', 'tar.1']
+        assert not os.path.exists(checkpoint.path)